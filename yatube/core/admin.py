@@ -0,0 +1,48 @@
+from django.contrib import admin
+
+from .models import OutboxEmail, Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """Настройки отображения очереди фоновых задач в админ зоне.
+
+    Attributes:
+        list_display: "pk", "name", "queue", "status", "attempts", "run_at"
+        - отображаемые поля
+        list_filter: "status", "queue" - фильтры записей
+        search_fields: "name" - поле для поиска соответствий
+    """
+
+    list_display = (
+        "pk",
+        "name",
+        "queue",
+        "status",
+        "attempts",
+        "run_at",
+    )
+    list_filter = ("status", "queue")
+    search_fields = ("name",)
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """Настройки отображения исходящей почты в админ зоне.
+
+    Attributes:
+        list_display: "pk", "recipients", "status", "attempts", "run_at"
+        - отображаемые поля
+        list_filter: "status" - фильтр записей
+        exclude: "message" - сообщение MIME не редактируется
+    """
+
+    list_display = (
+        "pk",
+        "recipients",
+        "status",
+        "attempts",
+        "run_at",
+    )
+    list_filter = ("status",)
+    exclude = ("message",)
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = "core"
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        from . import checks, mail, signals  # noqa: F401
+
+        # Регистрирует задачи из модулей tasks всех приложений.
+        autodiscover_modules("tasks")
@@ -0,0 +1,90 @@
+"""Загрузка пользователя запроса из кеша.
+
+AuthenticationMiddleware читает строку auth_user при каждом запросе
+авторизованного пользователя. get_cached_user() повторяет
+django.contrib.auth.get_user(), но берёт пользователя из кеша по ключу
+с версией пользователя. Сохранение и удаление пользователя (смена
+пароля, правка профиля, блокировка через is_active) меняют версию
+(core.signals), поэтому запрос, прочитавший из базы старую строку, не
+может положить её под новый ключ. Изменения через QuerySet.update()
+сигналов не вызывают: после них нужен bump_user_version().
+"""
+import time
+from typing import Any, Optional
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model, load_backend)
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpRequest
+from django.utils.crypto import constant_time_compare
+
+
+def _version_key(user_id: Any) -> str:
+    return f"user:{user_id}:version"
+
+
+def get_user_version(user_id: Any) -> int:
+    """Версия кеша пользователя; начальное значение из времени, как
+    у версии кеша страниц.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_user_version(user_id: Any) -> None:
+    """Делает недействительным закешированного пользователя."""
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        get_user_version(user_id)
+
+
+def load_user(backend: Any, user_id: Any) -> Optional[Any]:
+    """Пользователь из кеша или, при промахе, из бэкенда
+    аутентификации.
+    """
+    key = f"user:{user_id}:{get_user_version(user_id)}"
+    user = cache.get(key)
+    if user is None:
+        user = backend.get_user(user_id)
+        if user is not None:
+            cache.set(
+                key,
+                user,
+                getattr(settings, "USER_CACHE_TIMEOUT", 60 * 60),
+            )
+
+    return user
+
+
+def get_cached_user(request: HttpRequest) -> Any:
+    """То же, что django.contrib.auth.get_user(), с пользователем из
+    кеша.
+    """
+    user = None
+    try:
+        user_id = get_user_model()._meta.pk.to_python(
+            request.session[SESSION_KEY]
+        )
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        pass
+    else:
+        if backend_path in settings.AUTHENTICATION_BACKENDS:
+            user = load_user(load_backend(backend_path), user_id)
+            if hasattr(user, "get_session_auth_hash"):
+                session_hash = request.session.get(HASH_SESSION_KEY)
+                if not (session_hash and constant_time_compare(
+                    session_hash, user.get_session_auth_hash()
+                )):
+                    request.session.flush()
+                    user = None
+
+    return user or AnonymousUser()
@@ -0,0 +1,231 @@
+"""Нагрузочный прогон страниц сайта внутри процесса.
+
+Запросы идут через WSGI-обработчик Django (тестовый клиент) без сети,
+поэтому измеряется только работа приложения: время ответа, число
+запросов к базе и размер ответа для каждого имени URL.
+"""
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, UserCounter
+
+User = get_user_model()
+
+# Доля запросов по именам URL. kwargs - какие аргументы URL подставить
+# из выборки существующих объектов, auth - запрос от имени пользователя.
+BENCHMARK_MIX = [
+    {"url": "posts:index", "weight": 20},
+    {"url": "posts:index", "weight": 5, "query": "page=2"},
+    {"url": "posts:group_list", "weight": 10, "kwargs": ["slug"]},
+    {"url": "posts:profile", "weight": 10, "kwargs": ["username"]},
+    {"url": "posts:post_detail", "weight": 15, "kwargs": ["post_id"]},
+    {"url": "posts:post_comments", "weight": 3, "kwargs": ["post_id"]},
+    {"url": "posts:index", "weight": 10, "auth": True},
+    {"url": "posts:follow_index", "weight": 15, "auth": True},
+    {"url": "posts:post_create", "weight": 2, "auth": True},
+    {"url": "about:author", "weight": 1},
+    {"url": "about:tech", "weight": 1},
+    {"url": "users:signup", "weight": 1},
+    {"url": "users:login", "weight": 2},
+    {"url": "users:reset_form", "weight": 1},
+    {"url": "users:reset_done", "weight": 1},
+    {"url": "users:reset_complete", "weight": 1},
+    {"url": "users:change_form", "weight": 1, "auth": True},
+    {"url": "users:change_done", "weight": 1, "auth": True},
+]
+SAMPLE_SIZE = 1000
+# Адрес вне INTERNAL_IPS, чтобы в ответы не встраивался debug toolbar.
+REMOTE_ADDR = "10.0.0.1"
+PERCENTILES = (50, 95, 99)
+
+Request = Tuple[str, str, bool]
+Sample = Tuple[str, float, int, int, int]
+
+
+def load_targets() -> Dict[str, List[Any]]:
+    """Выборка существующих объектов для аргументов URL."""
+    return {
+        "post_id": list(Post.objects.order_by("-id").values_list(
+            "id", flat=True
+        )[:SAMPLE_SIZE]),
+        "username": list(UserCounter.objects.filter(
+            posts_count__gt=0
+        ).order_by("-posts_count").values_list(
+            "user__username", flat=True
+        )[:SAMPLE_SIZE]),
+        "slug": list(Group.objects.values_list("slug", flat=True)[
+            :SAMPLE_SIZE
+        ]),
+    }
+
+
+def load_user_ids(count: int) -> List[int]:
+    """Пользователи, от имени которых идут запросы с авторизацией:
+    в первую очередь те, у кого больше подписок.
+    """
+    user_ids = list(UserCounter.objects.order_by(
+        "-following_count"
+    ).values_list("user_id", flat=True)[:count])
+    if len(user_ids) < count:
+        user_ids += User.objects.exclude(id__in=user_ids).values_list(
+            "id", flat=True
+        )[:count - len(user_ids)]
+
+    return user_ids
+
+
+def entry_name(entry: Dict[str, Any]) -> str:
+    """Имя строки отчёта: имя URL, параметры запроса и признак входа."""
+    name = entry["url"]
+    if entry.get("query"):
+        name += f"?{entry['query']}"
+    if entry.get("auth"):
+        name += " [auth]"
+
+    return name
+
+
+def build_plan(
+    mix: Sequence[Dict[str, Any]],
+    targets: Dict[str, List[Any]],
+    count: int,
+    seed: int,
+) -> List[Request]:
+    """Заранее сформированная последовательность запросов.
+
+    Зависит только от зерна, поэтому одинакова в прогонах, которые
+    сравниваются, и делится между процессами без повторов.
+    """
+    rng = random.Random(seed)
+    mix = [
+        entry for entry in mix
+        if all(targets.get(kwarg) for kwarg in entry.get("kwargs", ()))
+    ]
+    plan = []
+    for entry in rng.choices(
+        mix, weights=[entry["weight"] for entry in mix], k=count
+    ):
+        url = reverse(entry["url"], kwargs={
+            kwarg: rng.choice(targets[kwarg])
+            for kwarg in entry.get("kwargs", ())
+        })
+        if entry.get("query"):
+            url += f"?{entry['query']}"
+        plan.append((entry_name(entry), url, bool(entry.get("auth"))))
+
+    return plan
+
+
+def run_plan(
+    plan: Iterable[Request], user_ids: Sequence[int], warmup: int = 0
+) -> List[Sample]:
+    """Выполняет запросы плана; первые warmup запросов не учитываются.
+
+    Запросы с авторизацией по очереди распределяются между клиентами
+    пользователей user_ids.
+    """
+    anonymous = Client(REMOTE_ADDR=REMOTE_ADDR)
+    clients = []
+    for user in User.objects.filter(id__in=user_ids):
+        client = Client(REMOTE_ADDR=REMOTE_ADDR)
+        client.force_login(user)
+        clients.append(client)
+
+    samples = []
+    for number, (name, url, auth) in enumerate(plan):
+        if auth and not clients:
+            continue
+        client = clients[number % len(clients)] if auth else anonymous
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - started
+        if number >= warmup:
+            samples.append((
+                name,
+                elapsed,
+                len(queries.captured_queries),
+                len(response.content),
+                response.status_code,
+            ))
+
+    return samples
+
+
+def run_chunk(args: Tuple[List[Request], List[int], int]) -> List[Sample]:
+    """run_plan для процесса пула."""
+    django.setup()
+
+    return run_plan(*args)
+
+
+def percentile(values: Sequence[float], share: float) -> float:
+    """Процентиль по ближайшему рангу для отсортированных значений."""
+    rank = max(1, -(-len(values) * share // 100))
+
+    return values[int(rank) - 1]
+
+
+def summarize(samples: Iterable[Sample]) -> Dict[str, Dict[str, Any]]:
+    """Сводка по именам URL: процентили времени в миллисекундах,
+    среднее число запросов к базе и байт, число ошибок.
+    """
+    grouped = defaultdict(list)
+    for sample in samples:
+        grouped[sample[0]].append(sample)
+
+    report = {}
+    for name, rows in sorted(grouped.items()):
+        latencies = sorted(row[1] * 1000 for row in rows)
+        report[name] = {
+            "count": len(rows),
+            **{
+                f"p{share}_ms": round(percentile(latencies, share), 3)
+                for share in PERCENTILES
+            },
+            "queries": round(sum(row[2] for row in rows) / len(rows), 2),
+            "bytes": round(sum(row[3] for row in rows) / len(rows)),
+            "errors": sum(row[4] >= 400 for row in rows),
+        }
+
+    return report
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    threshold: float,
+    metrics: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Регрессии текущего прогона относительно базового.
+
+    Регрессия - рост метрики больше чем в (1 + threshold) раз или
+    появление ошибок. Число запросов к базе сравнивается точно.
+    """
+    metrics = metrics or ("p95_ms", "p99_ms", "bytes")
+    regressions = []
+    for name in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[name], current[name]
+        changes = [
+            (metric, before[metric], after[metric])
+            for metric in metrics
+            if after[metric] > before[metric] * (1 + threshold)
+        ]
+        for metric in ("queries", "errors"):
+            if after[metric] > before[metric]:
+                changes.append((metric, before[metric], after[metric]))
+        regressions.extend(
+            {"url": name, "metric": metric, "before": old, "after": new}
+            for metric, old, new in changes
+        )
+
+    return regressions
@@ -0,0 +1,98 @@
+import hashlib
+import time
+from functools import wraps
+from typing import Callable
+
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+
+from .holes import fill_holes
+from .routers import pinned_to_primary, primary_reads
+
+PAGES_VERSION_KEY = "pages:version"
+
+
+def get_pages_version() -> int:
+    """Текущая версия кеша страниц.
+
+    Начальное значение берётся из времени, поэтому после вытеснения ключа
+    версия не может вернуться к одному из прежних значений.
+    """
+    version = cache.get(PAGES_VERSION_KEY)
+    if version is None:
+        cache.add(PAGES_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(PAGES_VERSION_KEY)
+
+    return version
+
+
+def bump_pages_version() -> None:
+    """Делает недействительными все закешированные страницы."""
+    try:
+        cache.incr(PAGES_VERSION_KEY)
+    except ValueError:
+        get_pages_version()
+
+
+def get_page_cache_key(request: HttpRequest) -> str:
+    """Ключ страницы: версия и полный адрес запроса.
+
+    Пользователь в ключ не входит: зависящие от него фрагменты
+    подставляются в общую страницу при каждом ответе.
+    """
+    url = hashlib.md5(
+        request.build_absolute_uri().encode()
+    ).hexdigest()
+
+    return f"page:{get_pages_version()}:{url}"
+
+
+def versioned_cache_page(timeout: int) -> Callable:
+    """Кеширует ответ view до истечения timeout или смены версии кеша.
+
+    В отличие от cache_page, новые данные видны сразу после записи:
+    обработчики сигналов моделей вызывают bump_pages_version(). Страница
+    рендерится с метками вместо фрагментов пользователя ({% hole %}),
+    поэтому одна запись кеша обслуживает и гостей, и всех пользователей.
+
+    С репликами (core.routers) промах рендерится с основной базы:
+    страница с реплики могла не увидеть запись, которая уже сменила
+    версию, и осталась бы в кеше под новой версией. Запрос, закреплённый
+    за основной базой после записи, кеш не читает и видит свою запись,
+    даже если она не сменила версию (например, QuerySet.update()).
+    """
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(
+            request: HttpRequest, *args, **kwargs
+        ) -> HttpResponse:
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            key = get_page_cache_key(request)
+            cached = None if pinned_to_primary() else cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(
+                    fill_holes(request, content), content_type=content_type
+                )
+
+            request.punch_holes = True
+            try:
+                with primary_reads():
+                    response = view(request, *args, **kwargs)
+            finally:
+                request.punch_holes = False
+            if response.streaming:
+                return response
+
+            content = response.content.decode(response.charset)
+            if response.status_code == 200:
+                cache.set(key, (content, response["Content-Type"]), timeout)
+            response.content = fill_holes(request, content)
+
+            return response
+
+        return wrapper
+
+    return decorator
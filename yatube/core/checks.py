@@ -0,0 +1,22 @@
+"""Системные проверки настроек core."""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .sessions import shared_cache
+
+
+@register(Tags.caches, deploy=True)
+def check_session_cache(app_configs, **kwargs):
+    """Отложенная запись сессий (core.sessions) требует общего кеша
+    (check --deploy).
+    """
+    if settings.SESSION_ENGINE != "core.sessions" or shared_cache():
+        return []
+
+    return [Warning(
+        "Кеш сессий не общий для процессов: core.sessions пишет сессии "
+        "в базу сразу, как cached_db.",
+        hint="Укажите в CACHES общий кеш (memcached, redis, файлы), "
+        "чтобы включить отложенную запись.",
+        id="core.W001",
+    )]
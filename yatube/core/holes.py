@@ -0,0 +1,68 @@
+"""Пробивка "дыр" в закешированных страницах.
+
+Общая для всех пользователей часть страницы кешируется один раз,
+а небольшие зависящие от пользователя фрагменты (меню, переключатель
+лент, кнопка подписки) заменяются в кеше метками и дорисовываются
+для каждого запроса отдельно.
+"""
+import base64
+import json
+import re
+from typing import Any, Callable, Dict
+
+from django.http import HttpRequest
+from django.template.loader import render_to_string
+
+HOLE_PATTERN = re.compile(r"<!--hole:([A-Za-z0-9_\-]+)-->")
+
+_providers: Dict[str, Callable[..., Dict[str, Any]]] = {}
+
+
+def register_hole(template_name: str) -> Callable:
+    """Регистрирует функцию, которая добавляет в контекст фрагмента
+    данные текущего пользователя.
+    """
+    def decorator(provider: Callable[..., Dict[str, Any]]) -> Callable:
+        _providers[template_name] = provider
+        return provider
+
+    return decorator
+
+
+def punches_holes(request: HttpRequest) -> bool:
+    """Рендерится ли страница для общего кеша."""
+    return getattr(request, "punch_holes", False)
+
+
+def make_hole(template_name: str, params: Dict[str, Any]) -> str:
+    """Метка фрагмента. Текст пользователей экранируется шаблонами,
+    поэтому подделать метку через содержимое поста нельзя.
+    """
+    payload = json.dumps([template_name, params]).encode()
+    token = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+    return f"<!--hole:{token}-->"
+
+
+def render_hole(
+    request: HttpRequest, template_name: str, params: Dict[str, Any]
+) -> str:
+    """Рендер фрагмента для текущего пользователя."""
+    context = dict(params)
+    provider = _providers.get(template_name)
+    if provider is not None:
+        context.update(provider(request, **params))
+
+    return render_to_string(template_name, context, request=request)
+
+
+def fill_holes(request: HttpRequest, content: str) -> str:
+    """Подставляет в страницу фрагменты текущего пользователя."""
+    def fill(match) -> str:
+        token = match.group(1)
+        template_name, params = json.loads(
+            base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        )
+        return render_hole(request, template_name, params)
+
+    return HOLE_PATTERN.sub(fill, content)
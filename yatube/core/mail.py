@@ -0,0 +1,222 @@
+"""Исходящая почта через таблицу OutboxEmail.
+
+OutboxBackend (EMAIL_BACKEND) не отправляет письма, а сохраняет их
+в текущей транзакции и после её фиксации ставит в таблицу задачу
+отправки (даже при TASKS_ALWAYS_EAGER), поэтому запрос не ждёт
+почтовый сервер, а письмо уходит, только если зафиксирована
+транзакция, в которой оно создано. Отправляет письма
+deliver(): пачками по EMAIL_OUTBOX_BATCH_SIZE, не более чем
+EMAIL_OUTBOX_CONCURRENCY соединениями через EMAIL_OUTBOX_BACKEND,
+каждое соединение открывается один раз на пачку. Неотправленное письмо
+повторяется с экспоненциальной задержкой (задача отправки ставится
+заново на время ближайшего повтора) и после EMAIL_OUTBOX_MAX_ATTEMPTS
+попыток остаётся со статусом failed.
+
+Отправлять почту может задача send_outbox на воркерах run_workers или
+отдельный процесс - команда send_outbox.
+"""
+import email
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.message import Message
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from .models import OutboxEmail, Task
+from .tasks import retry_delay, task
+
+logger = logging.getLogger("core.mail")
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Сохраняет письма в OutboxEmail вместо отправки."""
+
+    def send_messages(self, email_messages: Sequence[EmailMessage]) -> int:
+        now = timezone.now()
+        rows = [
+            OutboxEmail(
+                from_email=message.from_email,
+                recipients=json.dumps(message.recipients()),
+                message=message.message().as_bytes(),
+                run_at=now,
+            )
+            for message in email_messages
+            if message.recipients()
+        ]
+        if not rows:
+            return 0
+
+        OutboxEmail.objects.bulk_create(rows)
+        transaction.on_commit(schedule)
+
+        return len(rows)
+
+
+def schedule(run_at: Optional[datetime] = None) -> None:
+    """Ставит задачу отправки на run_at (по умолчанию - сейчас), если
+    в очереди нет ещё не начатой задачи на это время или раньше.
+    """
+    run_at = run_at or timezone.now()
+    if not Task.objects.filter(
+        name=send_outbox.task_name,
+        status=Task.QUEUED,
+        attempts=0,
+        run_at__lte=run_at,
+    ).exists():
+        send_outbox.enqueue_at(run_at)
+
+
+class StoredMessage(Message):
+    """Сохранённое сообщение MIME с интерфейсом сообщений Django
+    (as_bytes с linesep, который передаёт бэкенд SMTP).
+    """
+
+    def as_bytes(self, unixfrom: bool = False, linesep: str = "\n") -> bytes:
+        return super().as_bytes(
+            unixfrom, policy=self.policy.clone(linesep=linesep)
+        )
+
+
+class StoredEmail(EmailMessage):
+    """Письмо из OutboxEmail: бэкенды отправляют его без повторной
+    сборки.
+    """
+
+    def __init__(self, row: OutboxEmail) -> None:
+        super().__init__(
+            from_email=row.from_email, to=json.loads(row.recipients)
+        )
+        self.stored = email.message_from_bytes(
+            bytes(row.message), _class=StoredMessage
+        )
+
+    def message(self) -> StoredMessage:
+        return self.stored
+
+
+def claim(batch_size: int) -> List[OutboxEmail]:
+    """Забирает пачку писем, готовых к отправке. Забранные письма
+    скрыты от других отправителей на TASK_VISIBILITY_TIMEOUT.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    ready = OutboxEmail.objects.filter(
+        status=OutboxEmail.QUEUED, run_at__lte=now
+    )
+    ids = list(
+        ready.order_by("run_at", "pk").values_list("pk", flat=True)[
+            :batch_size
+        ]
+    )
+    ready.filter(pk__in=ids).update(
+        claim=token,
+        attempts=F("attempts") + 1,
+        run_at=now + timedelta(
+            seconds=getattr(settings, "TASK_VISIBILITY_TIMEOUT", 300)
+        ),
+    )
+
+    return list(OutboxEmail.objects.filter(claim=token).order_by("pk"))
+
+
+def send_chunk(rows: List[OutboxEmail]) -> Dict[int, Optional[str]]:
+    """Отправляет письма через одно соединение; для каждого письма
+    возвращает ошибку или None.
+    """
+    backend = getattr(
+        settings,
+        "EMAIL_OUTBOX_BACKEND",
+        "django.core.mail.backends.smtp.EmailBackend",
+    )
+    results: Dict[int, Optional[str]] = {}
+    try:
+        with get_connection(backend) as connection:
+            for row in rows:
+                try:
+                    connection.send_messages([StoredEmail(row)])
+                    results[row.pk] = None
+                except Exception as error:
+                    results[row.pk] = repr(error)
+    except Exception as error:
+        # Соединение не открылось или закрылось с ошибкой.
+        for row in rows:
+            results.setdefault(row.pk, repr(error))
+
+    return results
+
+
+def deliver(
+    batch_size: Optional[int] = None, concurrency: Optional[int] = None
+) -> Tuple[int, int]:
+    """Отправляет одну пачку писем; возвращает число отправленных
+    и неотправленных.
+
+    Потоки только отправляют письма, таблица меняется в вызывающем
+    потоке.
+    """
+    rows = claim(
+        batch_size or getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 100)
+    )
+    if not rows:
+        return 0, 0
+
+    concurrency = min(
+        concurrency or getattr(settings, "EMAIL_OUTBOX_CONCURRENCY", 2),
+        len(rows),
+    )
+    chunks = [rows[number::concurrency] for number in range(concurrency)]
+    results: Dict[int, Optional[str]] = {}
+    if concurrency == 1:
+        results.update(send_chunk(rows))
+    else:
+        with ThreadPoolExecutor(concurrency) as executor:
+            for chunk_results in executor.map(send_chunk, chunks):
+                results.update(chunk_results)
+
+    sent = [pk for pk, error in results.items() if error is None]
+    OutboxEmail.objects.filter(pk__in=sent).delete()
+    max_attempts = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+    for row in rows:
+        error = results[row.pk]
+        if error is None:
+            continue
+        logger.warning(
+            "Письмо %s не отправлено (попытка %s): %s",
+            row, row.attempts, error,
+        )
+        OutboxEmail.objects.filter(pk=row.pk).update(
+            status=(
+                OutboxEmail.FAILED
+                if row.attempts >= max_attempts else OutboxEmail.QUEUED
+            ),
+            run_at=timezone.now() + timedelta(
+                seconds=retry_delay(row.attempts)
+            ),
+            claim="",
+            last_error=error,
+        )
+
+    return len(sent), len(rows) - len(sent)
+
+
+@task(queue="high", atomic=False)
+def send_outbox() -> None:
+    """Отправляет все готовые письма и ставит себя на время ближайшего
+    повтора неотправленных.
+    """
+    while any(deliver()):
+        pass
+    retry_at = OutboxEmail.objects.filter(
+        status=OutboxEmail.QUEUED
+    ).aggregate(run_at=Min("run_at"))["run_at"]
+    if retry_at is not None:
+        schedule(retry_at)
@@ -0,0 +1,108 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.benchmark import (BENCHMARK_MIX, build_plan, compare,
+                            load_targets, load_user_ids, run_chunk,
+                            run_plan, summarize)
+
+
+class Command(BaseCommand):
+    """Нагрузочный прогон страниц с отчётом о задержках."""
+
+    help = (
+        "Выполняет смесь запросов к страницам сайта внутри процесса "
+        "и выводит JSON-отчёт: p50/p95/p99, запросы к базе и байты "
+        "по каждому имени URL. С --baseline сравнивает с прошлым "
+        "отчётом и завершается с ошибкой при регрессиях."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=100,
+            help="Запросы для прогрева кешей, в отчёт не входят.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Число процессов, между которыми делятся запросы.",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=20,
+            help="Сколько пользователей отправляют запросы с авторизацией.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--mix", help="JSON-файл со смесью запросов вместо стандартной."
+        )
+        parser.add_argument("--output", help="Файл для JSON-отчёта.")
+        parser.add_argument("--baseline", help="Отчёт для сравнения.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Допустимый относительный рост задержек и размера ответа.",
+        )
+
+    def handle(self, *args, **options):
+        mix = BENCHMARK_MIX
+        if options["mix"]:
+            with open(options["mix"], encoding="utf-8") as file:
+                mix = json.load(file)
+
+        warmup = options["warmup"]
+        plan = build_plan(
+            mix, load_targets(), options["requests"] + warmup, options["seed"]
+        )
+        warmup_plan, plan = plan[:warmup], plan[warmup:]
+        user_ids = load_user_ids(options["users"])
+        processes = options["processes"]
+        if processes > 1:
+            chunks = [
+                (warmup_plan + plan[number::processes], user_ids, warmup)
+                for number in range(processes)
+            ]
+            # Дочерние процессы открывают свои соединения с базой.
+            connections.close_all()
+            with ProcessPoolExecutor(processes) as executor:
+                samples = [
+                    sample
+                    for chunk in executor.map(run_chunk, chunks)
+                    for sample in chunk
+                ]
+        else:
+            samples = run_plan(warmup_plan + plan, user_ids, warmup)
+
+        report = {
+            "meta": {
+                "requests": len(samples),
+                "processes": processes,
+                "seed": options["seed"],
+            },
+            "urls": summarize(samples),
+        }
+        regressions = []
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as file:
+                baseline = json.load(file)
+            regressions = compare(
+                baseline["urls"], report["urls"], options["threshold"]
+            )
+            report["regressions"] = regressions
+
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(content)
+        else:
+            self.stdout.write(content)
+        if regressions:
+            raise CommandError(f"Найдено регрессий: {len(regressions)}")
@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import compare
+
+
+class Command(BaseCommand):
+    """Сравнение двух отчётов команды benchmark."""
+
+    help = (
+        "Выводит в JSON регрессии второго отчёта относительно первого "
+        "и завершается с ошибкой, если они есть."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("baseline")
+        parser.add_argument("current")
+        parser.add_argument("--threshold", type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        reports = []
+        for path in (options["baseline"], options["current"]):
+            with open(path, encoding="utf-8") as file:
+                reports.append(json.load(file)["urls"])
+        regressions = compare(*reports, options["threshold"])
+        self.stdout.write(json.dumps(
+            {"regressions": regressions}, ensure_ascii=False, indent=2
+        ))
+        if regressions:
+            raise CommandError(f"Найдено регрессий: {len(regressions)}")
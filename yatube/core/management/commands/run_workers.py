@@ -0,0 +1,87 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.tasks import QUEUES, run_process, run_worker_process
+
+
+class Command(BaseCommand):
+    """Запуск воркеров очереди фоновых задач."""
+
+    help = (
+        "Выполняет задачи core.tasks в --processes процессах по --threads "
+        "потоков. Очереди опрашиваются в порядке приоритета; SIGTERM и "
+        "SIGINT останавливают воркеры после текущих задач."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1)
+        parser.add_argument("--threads", type=int, default=1)
+        parser.add_argument(
+            "--queues",
+            nargs="+",
+            choices=QUEUES,
+            default=list(QUEUES),
+            help="Очереди в порядке приоритета.",
+        )
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=1.0,
+            help="Пауза в секундах, когда очереди пусты.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Выполнить доступные задачи и завершиться.",
+        )
+
+    def handle(self, *args, **options):
+        if options["processes"] < 1 or options["threads"] < 1:
+            raise CommandError("Нужен хотя бы один процесс и один поток.")
+        worker_args = (
+            options["queues"],
+            options["threads"],
+            options["poll"],
+            options["burst"],
+        )
+        if options["processes"] == 1:
+            done = run_process(*worker_args)
+        else:
+            done = self._run_processes(options["processes"], worker_args)
+        self.stdout.write(f"Выполнено задач: {done}")
+
+    def _run_processes(self, count, worker_args):
+        """Дочерние процессы получают SIGTERM, когда его получает
+        основной процесс.
+        """
+        connections.close_all()
+        done = multiprocessing.Value("i", 0)
+        processes = [
+            multiprocessing.Process(
+                target=run_worker_process, args=(*worker_args, done)
+            )
+            for _ in range(count)
+        ]
+        for process in processes:
+            process.start()
+
+        def stop(*args):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        handlers = {
+            signum: signal.signal(signum, stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            for process in processes:
+                process.join()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+        return done.value
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.mail import deliver
+
+
+class Command(BaseCommand):
+    """Отправка писем из таблицы исходящей почты."""
+
+    help = (
+        "Отправляет письма OutboxEmail пачками через EMAIL_OUTBOX_BACKEND, "
+        "с --interval - работает постоянно, проверяя очередь каждые N "
+        "секунд."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            help="Сколько соединений с почтовым сервером открыть.",
+        )
+        parser.add_argument("--interval", type=float)
+
+    def handle(self, *args, **options):
+        sent = failed = 0
+        while True:
+            batch_sent, batch_failed = deliver(
+                options["batch_size"], options["concurrency"]
+            )
+            sent += batch_sent
+            failed += batch_failed
+            if batch_sent or batch_failed:
+                continue
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(f"Отправлено писем: {sent}, ошибок: {failed}")
@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.slow_queries import aggregate, parse_line
+
+
+class Command(BaseCommand):
+    """Сводка журнала медленных запросов по формам запросов."""
+
+    help = (
+        "Читает логи core.slow_queries и выводит в JSON самые дорогие "
+        "формы запросов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("logs", nargs="+")
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument(
+            "--order",
+            choices=("total_ms", "count", "max_ms"),
+            default="total_ms",
+        )
+
+    def handle(self, *args, **options):
+        records = []
+        for path in options["logs"]:
+            try:
+                with open(path, encoding="utf-8") as file:
+                    records.extend(filter(None, map(parse_line, file)))
+            except OSError as error:
+                raise CommandError(error)
+        rows = aggregate(records, options["top"], options["order"])
+        for row in rows:
+            row["total_ms"] = round(row["total_ms"], 1)
+            row["avg_ms"] = round(row["avg_ms"], 1)
+            row["max_ms"] = round(row["max_ms"], 1)
+        self.stdout.write(json.dumps(
+            {"records": len(records), "shapes": rows},
+            ensure_ascii=False,
+            indent=2,
+        ))
@@ -0,0 +1,44 @@
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.sqlite_benchmark import compare_pragmas
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """Сравнение чтения SQLite под записью без настроек и с ними."""
+
+    help = (
+        "Нагружает копии базы читателями и писателями без настроек "
+        "SQLite и с SQLITE_PRAGMAS и выводит JSON-отчёт."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=1)
+        parser.add_argument(
+            "--seconds",
+            type=float,
+            default=5,
+            help="Длительность каждого прогона.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Команда работает только с SQLite.")
+        target = Post.objects.values_list("id", "author_id").first()
+        if target is None:
+            raise CommandError("В базе нет постов, запустите seed_scale.")
+
+        with tempfile.TemporaryDirectory() as directory:
+            report = compare_pragmas(
+                directory,
+                options["readers"],
+                options["writers"],
+                options["seconds"],
+                target,
+            )
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
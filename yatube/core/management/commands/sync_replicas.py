@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.routers import get_replicas, sync_replicas
+
+
+class Command(BaseCommand):
+    """Копирование основной базы SQLite в реплики."""
+
+    help = (
+        "Заменяет репликацию при локальной разработке: копирует основную "
+        "базу в базы DATABASE_REPLICAS, с --interval - периодически."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("aliases", nargs="*")
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Повторять каждые N секунд (имитация отставания реплик).",
+        )
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or get_replicas()
+        while True:
+            synced = sync_replicas(aliases)
+            self.stdout.write(f"Синхронизированы реплики: {', '.join(synced)}")
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
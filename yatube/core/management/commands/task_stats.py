@@ -0,0 +1,17 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.tasks import queue_stats
+
+
+class Command(BaseCommand):
+    """Глубина очередей фоновых задач."""
+
+    help = (
+        "Выводит в JSON по каждой очереди число готовых, отложенных и "
+        "отказавших задач и возраст самой старой готовой задачи."
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(queue_stats(), indent=2))
@@ -0,0 +1,233 @@
+"""Метрики в текстовом формате Prometheus.
+
+Каждый процесс копит значения в памяти и не чаще раза в FLUSH_INTERVAL
+секунд сохраняет их в свой файл в каталоге METRICS_DIR: изменения,
+пропущенные из-за этого ограничения, дописывает фоновый таймер, поэтому
+файл простаивающего процесса не отстаёт от памяти. Эндпоинт
+/metrics складывает файлы всех процессов, поэтому при нескольких
+воркерах отдаётся общая картина. Файлы завершившихся процессов
+остаются (счётчики не должны уменьшаться); каталог очищается при
+развёртывании.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UPLOAD_BUCKETS = (
+    1024, 10 * 1024, 100 * 1024, 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2
+)
+FLUSH_INTERVAL = 1.0
+FILE_PREFIX = "metrics-"
+
+# Имя метрики: тип, описание и границы корзин гистограммы.
+METRICS = {
+    "http_request_duration_seconds": (
+        "histogram", "Время обработки запроса.", LATENCY_BUCKETS
+    ),
+    "http_responses_total": ("counter", "Ответы по статусам.", None),
+    "db_queries_total": ("counter", "Запросы к базе данных.", None),
+    "cache_hits_total": ("counter", "Попадания в кеш.", None),
+    "cache_misses_total": ("counter", "Промахи кеша.", None),
+    "http_upload_bytes": (
+        "histogram", "Размер загруженных файлов.", UPLOAD_BUCKETS
+    ),
+}
+
+Labels = Dict[str, str]
+Values = Dict[str, Dict[str, Any]]
+
+
+def _labels_key(labels: Labels) -> str:
+    return json.dumps(sorted(labels.items()), ensure_ascii=False)
+
+
+class Registry:
+    """Значения метрик процесса.
+
+    Для счётчика хранится число, для гистограммы - список
+    [число в каждой корзине..., сумма, количество].
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def _reset(self) -> None:
+        """Пустые значения, новые блокировки и свой файл процесса.
+
+        Вызывается и в дочернем процессе после fork (сервер, загрузивший
+        приложение до запуска воркеров): иначе воркеры унаследуют имя
+        файла родителя и будут перезаписывать снимки друг друга, а
+        таймер родителя в дочерний процесс не переходит.
+        """
+        self.values: Values = defaultdict(dict)
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.flushed = 0.0
+        self.dirty = False
+        self.timer: Optional[threading.Timer] = None
+        self.file_name = f"{FILE_PREFIX}{os.getpid()}-{uuid.uuid4().hex}.json"
+
+    def inc(self, name: str, labels: Labels, amount: float = 1) -> None:
+        key = _labels_key(labels)
+        with self.lock:
+            series = self.values[name]
+            series[key] = series.get(key, 0) + amount
+            self.dirty = True
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        buckets = METRICS[name][2]
+        key = _labels_key(labels)
+        with self.lock:
+            series = self.values[name]
+            row = series.setdefault(key, [0] * (len(buckets) + 2))
+            for number, bound in enumerate(buckets):
+                if value <= bound:
+                    row[number] += 1
+            row[-2] += value
+            row[-1] += 1
+            self.dirty = True
+
+    def snapshot(self) -> Values:
+        with self.lock:
+            return json.loads(json.dumps(self.values))
+
+    def flush(self, directory: Optional[str], force: bool = False) -> None:
+        """Сохраняет значения в файл процесса, не чаще FLUSH_INTERVAL.
+
+        Пропущенную запись изменённых значений выполнит таймер по
+        истечении интервала.
+        """
+        now = time.monotonic()
+        if not directory:
+            return
+        if not force and now - self.flushed < FLUSH_INTERVAL:
+            self._schedule(directory, FLUSH_INTERVAL - (now - self.flushed))
+            return
+
+        # Запрос и таймер не пишут файл одновременно, и более старый
+        # снимок не заменяет более новый.
+        with self.write_lock:
+            with self.lock:
+                self.flushed = now
+                snapshot = json.loads(json.dumps(self.values))
+                self.dirty = False
+            path = os.path.join(directory, self.file_name)
+            temporary = f"{path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                json.dump(snapshot, file)
+            os.replace(temporary, path)
+
+    def _schedule(self, directory: str, delay: float) -> None:
+        """Запускает таймер записи, если он ещё не запущен."""
+        with self.lock:
+            if self.timer is not None:
+                return
+            self.timer = threading.Timer(
+                delay, self._flush_dirty, args=(directory,)
+            )
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _flush_dirty(self, directory: str) -> None:
+        with self.lock:
+            self.timer = None
+            dirty = self.dirty
+        if dirty:
+            self.flush(directory, force=True)
+
+
+registry = Registry()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry._reset)
+
+
+def merge(snapshots: Iterable[Values]) -> Values:
+    """Сумма значений нескольких процессов."""
+    merged: Values = defaultdict(dict)
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            for key, value in series.items():
+                current = merged[name].get(key)
+                if current is None:
+                    merged[name][key] = value
+                elif isinstance(value, list):
+                    merged[name][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged[name][key] = current + value
+
+    return merged
+
+
+def collect(directory: Optional[str]) -> Values:
+    """Значения всех процессов: файлы остальных и память текущего."""
+    snapshots = [registry.snapshot()]
+    if directory and os.path.isdir(directory):
+        for file_name in os.listdir(directory):
+            if (
+                not file_name.startswith(FILE_PREFIX)
+                or not file_name.endswith(".json")
+                or file_name == registry.file_name
+            ):
+                continue
+            try:
+                with open(
+                    os.path.join(directory, file_name), encoding="utf-8"
+                ) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+
+    return merge(snapshots)
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    )
+
+
+def _format_labels(pairs: List[Tuple[str, Any]]) -> str:
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in pairs
+    ) + "}"
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(values: Values) -> str:
+    """Текст в формате экспозиции Prometheus 0.0.4."""
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, value in sorted(values.get(name, {}).items()):
+            pairs = [tuple(pair) for pair in json.loads(key)]
+            if kind == "counter":
+                lines.append(
+                    f"{name}{_format_labels(pairs)} {_format_number(value)}"
+                )
+                continue
+            for bound, count in zip(buckets, value[:-2]):
+                labels = _format_labels(pairs + [("le", float(bound))])
+                lines.append(f"{name}_bucket{labels} {count}")
+            lines.append(
+                f"{name}_bucket{_format_labels(pairs + [('le', '+Inf')])} "
+                f"{value[-1]}"
+            )
+            lines.append(
+                f"{name}_sum{_format_labels(pairs)} "
+                f"{_format_number(value[-2])}"
+            )
+            lines.append(f"{name}_count{_format_labels(pairs)} {value[-1]}")
+
+    return "\n".join(lines) + "\n"
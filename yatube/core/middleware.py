@@ -0,0 +1,150 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+from typing import Callable
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.utils.functional import SimpleLazyObject
+
+from . import metrics
+from .auth import get_cached_user
+from .routers import PRIMARY_COOKIE, get_replicas, pin_request
+from .slow_queries import SlowQueryLogger
+from .timing import track_request
+
+logger = logging.getLogger("core.timing")
+
+
+class ServerTimingMiddleware:
+    """Время SQL, шаблонов и кеша в заголовке Server-Timing и в логе.
+
+    Включается настройкой SERVER_TIMING; если она выключена, Django
+    исключает middleware из цепочки и накладных расходов нет.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        if not getattr(settings, "SERVER_TIMING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with track_request() as timing:
+            response = self.get_response(request)
+
+        response["Server-Timing"] = timing.as_header()
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            **timing.as_dict(),
+        }))
+
+        return response
+
+
+class MetricsMiddleware:
+    """Метрики запросов для Prometheus по имени view (core.metrics).
+
+    Включается настройкой METRICS. При заданном METRICS_DIR значения
+    процесса сохраняются в общий каталог для сложения с остальными
+    процессами.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        if not getattr(settings, "METRICS", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        started = time.perf_counter()
+        with track_request() as timing:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        labels = {"view": match.view_name if match else "unmatched"}
+        registry = metrics.registry
+        registry.observe("http_request_duration_seconds", labels, elapsed)
+        registry.inc(
+            "http_responses_total",
+            {**labels, "status": str(response.status_code)},
+        )
+        registry.inc("db_queries_total", labels, timing.sql_count)
+        registry.inc("cache_hits_total", labels, timing.cache_hits)
+        registry.inc("cache_misses_total", labels, timing.cache_misses)
+        # Файлы учитываются, только если view уже разобрал тело запроса.
+        for upload in getattr(request, "_files", {}).values():
+            registry.observe("http_upload_bytes", labels, upload.size)
+        registry.flush(getattr(settings, "METRICS_DIR", None))
+
+        return response
+
+
+class SlowQueryMiddleware:
+    """Журнал запросов к базе дольше SLOW_QUERY_MS (core.slow_queries).
+
+    Включается настройкой SLOW_QUERY_MS; при None middleware исключается
+    из цепочки.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        if getattr(settings, "SLOW_QUERY_MS", None) is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(
+                    SlowQueryLogger(connection, request)
+                ))
+            return self.get_response(request)
+
+
+class PrimaryStickinessMiddleware:
+    """Маршрутизация чтения на реплики (core.routers.ReplicaRouter).
+
+    GET-запросы читают с реплик, остальные - с основной базы. После
+    записи ответ ставит cookie, и следующие REPLICA_LAG_SECONDS браузер
+    читает с основной базы. Без DATABASE_REPLICAS middleware исключается
+    из цепочки.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        if not get_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        primary = (
+            request.method not in ("GET", "HEAD", "OPTIONS")
+            or PRIMARY_COOKIE in request.COOKIES
+        )
+        with pin_request(primary) as pin:
+            response = self.get_response(request)
+
+        if pin.wrote:
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                "1",
+                max_age=getattr(settings, "REPLICA_LAG_SECONDS", 5),
+                httponly=True,
+                samesite="Lax",
+            )
+
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, который берёт пользователя из кеша
+    (core.auth): при тёплом кеше запрос не читает auth_user.
+    """
+
+    def process_request(self, request: HttpRequest) -> None:
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
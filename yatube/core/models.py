@@ -19,3 +19,103 @@ class PubDateModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Task(models.Model):
+    """Модель таблицы очереди фоновых задач (core.tasks).
+
+    Выполняемая задача остаётся в таблице: воркер сдвигает run_at на
+    TASK_VISIBILITY_TIMEOUT, и если он не успел (упал), задачу берёт
+    другой воркер. Выполненные задачи удаляются.
+
+    Attributes:
+        name: CharField - имя зарегистрированной функции
+        payload: TextField - аргументы в JSON
+        queue: CharField - очередь (приоритет)
+        status: CharField - в очереди или отказ после всех попыток
+        attempts: PositiveIntegerField - сделано попыток
+        max_attempts: PositiveIntegerField - допустимо попыток
+        run_at: DateTimeField - когда задача доступна воркерам
+        created: DateTimeField - дата постановки в очередь
+        last_error: TextField - ошибка последней попытки
+    """
+    QUEUED = "queued"
+    FAILED = "failed"
+
+    name = models.CharField(verbose_name="Задача", max_length=200)
+    payload = models.TextField(verbose_name="Аргументы")
+    queue = models.CharField(verbose_name="Очередь", max_length=20)
+    status = models.CharField(
+        verbose_name="Статус",
+        max_length=10,
+        default=QUEUED,
+        choices=((QUEUED, "В очереди"), (FAILED, "Отказ")),
+    )
+    attempts = models.PositiveIntegerField(verbose_name="Попыток", default=0)
+    max_attempts = models.PositiveIntegerField(verbose_name="Макс. попыток")
+    run_at = models.DateTimeField(verbose_name="Выполнить после")
+    created = models.DateTimeField(
+        verbose_name="Поставлена", auto_now_add=True
+    )
+    last_error = models.TextField(verbose_name="Ошибка", blank=True)
+
+    class Meta:
+        verbose_name = "Задача"
+        verbose_name_plural = "Задачи"
+        indexes = [
+            models.Index(
+                fields=["status", "queue", "run_at"], name="task_ready_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} #{self.pk}"
+
+
+class OutboxEmail(models.Model):
+    """Модель исходящего письма (core.mail).
+
+    Письмо сохраняется готовым MIME-сообщением в транзакции запроса и
+    удаляется после отправки. Отправитель забирает пачку писем, помечая
+    их своим claim, и скрывает их до run_at.
+
+    Attributes:
+        from_email: CharField - адрес отправителя
+        recipients: TextField - адреса получателей в JSON
+        message: BinaryField - сообщение MIME
+        status: CharField - в очереди или отказ после всех попыток
+        attempts: PositiveIntegerField - сделано попыток
+        run_at: DateTimeField - когда письмо доступно отправителю
+        claim: CharField - метка забравшего письмо отправителя
+        created: DateTimeField - дата постановки в очередь
+        last_error: TextField - ошибка последней попытки
+    """
+    QUEUED = "queued"
+    FAILED = "failed"
+
+    from_email = models.CharField(verbose_name="Отправитель", max_length=254)
+    recipients = models.TextField(verbose_name="Получатели")
+    message = models.BinaryField(verbose_name="Сообщение")
+    status = models.CharField(
+        verbose_name="Статус",
+        max_length=10,
+        default=QUEUED,
+        choices=((QUEUED, "В очереди"), (FAILED, "Отказ")),
+    )
+    attempts = models.PositiveIntegerField(verbose_name="Попыток", default=0)
+    run_at = models.DateTimeField(verbose_name="Отправить после")
+    claim = models.CharField(verbose_name="Метка", max_length=32, blank=True)
+    created = models.DateTimeField(
+        verbose_name="Поставлено", auto_now_add=True
+    )
+    last_error = models.TextField(verbose_name="Ошибка", blank=True)
+
+    class Meta:
+        verbose_name = "Исходящее письмо"
+        verbose_name_plural = "Исходящие письма"
+        indexes = [
+            models.Index(fields=["status", "run_at"], name="outbox_ready_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.recipients} #{self.pk}"
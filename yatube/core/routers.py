@@ -0,0 +1,159 @@
+"""Чтение с реплик базы данных и запись в основную базу.
+
+Запросы на чтение моделей ROUTED_APPS уходят на реплики из
+DATABASE_REPLICAS только внутри GET-запросов, которые обрабатывает
+PrimaryStickinessMiddleware. Запись и всё, что выполняется вне запроса
+(команды, сигналы при импорте), работает с основной базой.
+
+Реплики отстают от основной базы, поэтому после записи чтение
+закрепляется за основной базой: до конца текущего запроса и на
+REPLICA_LAG_SECONDS для следующих запросов того же браузера (cookie).
+Так после post_create редирект на profile уже показывает новый пост.
+Общие закешированные страницы рендерятся с основной базы (core.cache).
+"""
+import random
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ROUTED_APPS = {"posts", "users", "auth"}
+PRIMARY_COOKIE = "use_primary"
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+class Pin:
+    """Состояние запроса: читать ли с основной базы, была ли запись
+    и было ли чтение с реплики.
+    """
+
+    def __init__(self, primary: bool) -> None:
+        self.primary = primary
+        self.wrote = False
+        self.replica_read = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка запросов к основной базе (execute_wrapper): после
+        изменения данных чтение переходит на основную базу.
+
+        db_for_write для этого не подходит: Django вызывает его и без
+        записи, например при присваивании связанного объекта.
+        """
+        result = execute(sql, params, many, context)
+        if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+            self.primary = True
+            self.wrote = True
+
+        return result
+
+
+current_pin = ContextVar("current_pin", default=None)
+
+
+def get_replicas() -> List[str]:
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+@contextmanager
+def pin_request(primary: bool) -> Iterator[Pin]:
+    """Маршрутизация внутри запроса; primary - читать с основной базы."""
+    pin = Pin(primary)
+    token = current_pin.set(pin)
+    try:
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(pin):
+            yield pin
+    finally:
+        current_pin.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        if model._meta.app_label not in ROUTED_APPS:
+            return None
+        pin = current_pin.get()
+        replicas = get_replicas()
+        if pin is None or pin.primary or not replicas:
+            return DEFAULT_DB_ALIAS
+
+        pin.replica_read = True
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+
+        return None
+
+    def allow_migrate(self, db, app_label, **hints) -> Optional[bool]:
+        if db in get_replicas():
+            return False
+
+        return None
+
+
+@contextmanager
+def primary_reads() -> Iterator[None]:
+    """Чтение с основной базы внутри блока, даже если запрос читает
+    с реплик.
+    """
+    pin = current_pin.get()
+    if pin is None or pin.primary:
+        yield
+        return
+
+    pin.primary = True
+    try:
+        yield
+    finally:
+        pin.primary = pin.wrote
+
+
+def pinned_to_primary() -> bool:
+    """Читает ли текущий запрос с основной базы из-за недавней записи
+    (запись в запросе или cookie PRIMARY_COOKIE).
+    """
+    pin = current_pin.get()
+
+    return pin is not None and pin.primary
+
+
+def replica_read() -> bool:
+    """Читал ли текущий запрос данные с реплики."""
+    pin = current_pin.get()
+
+    return pin is not None and pin.replica_read
+
+
+def sync_replicas(aliases: Optional[Iterable[str]] = None) -> List[str]:
+    """Замена реплик SQLite копией основной базы.
+
+    Заменяет репликацию при локальной разработке: реплика отстаёт
+    от основной базы до следующего вызова (команда sync_replicas).
+    """
+    aliases = list(get_replicas() if aliases is None else aliases)
+    source = sqlite3.connect(
+        connections[DEFAULT_DB_ALIAS].settings_dict["NAME"], uri=True
+    )
+    try:
+        for alias in aliases:
+            # Копирование идёт в транзакции: открытые соединения реплики
+            # видят либо прежние данные, либо новые целиком.
+            target = sqlite3.connect(
+                connections[alias].settings_dict["NAME"], uri=True
+            )
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+    finally:
+        source.close()
+
+    return aliases
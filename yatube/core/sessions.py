@@ -0,0 +1,210 @@
+"""Сессии в кеше с отложенной записью в базу (SESSION_ENGINE).
+
+Как и cached_db, сессия читается из кеша, а при промахе - из таблицы
+django_session, поэтому прежние сессии остаются действительными.
+Сохранение же не пишет в базу сразу: сессия кладётся в кеш и в буфер
+процесса, который одной транзакцией сбрасывается в базу не чаще раза в
+SESSION_WRITE_BEHIND_SECONDS (после запроса, см. core.signals) или при
+SESSION_WRITE_BEHIND_MAX_PENDING сессиях в буфере. Так вход в систему
+не ждёт блокировку записи SQLite.
+
+Сессия больше SESSION_CACHE_MAX_SIZE байт не кешируется и пишется
+в базу сразу, сессия, сохраняемая внутри транзакции, пишется в её
+составе. Выход из системы удаляет сессию из буфера, кеша и базы
+немедленно.
+
+Пока сессия в буфере, другие процессы видят её только через кеш,
+поэтому отложенная запись включается только с общим кешем (не
+locmem и не dummy, см. проверку core.checks). С кешем процесса сессии
+пишутся в базу сразу, как в cached_db. Если запросов больше нет, буфер
+сбрасывает фоновый таймер, а при выходе из процесса - atexit. Буфер
+упавшего процесса теряется, но сессии остаются в общем кеше до
+истечения срока.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.cached_db import \
+    SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+logger = logging.getLogger("core.sessions")
+
+# Ключ сессии: закодированные данные и срок действия.
+_pending: Dict[str, Tuple[str, datetime]] = {}
+_lock = threading.RLock()
+_flushed = time.monotonic()
+_timer: Optional[threading.Timer] = None
+
+
+def shared_cache() -> bool:
+    """Общий ли для процессов кеш сессий (SESSION_CACHE_ALIAS)."""
+    return not isinstance(
+        caches[settings.SESSION_CACHE_ALIAS], (LocMemCache, DummyCache)
+    )
+
+
+def flush_pending() -> int:
+    """Записывает сессии из буфера в базу; возвращает их число.
+
+    Блокировка держится до конца транзакции, чтобы удалённая за это
+    время сессия не вернулась в базу.
+    """
+    global _flushed
+    with _lock:
+        _flushed = time.monotonic()
+        if not _pending:
+            return 0
+
+        model = SessionStore.get_model_class()
+        rows = [
+            model(session_key=key, session_data=data, expire_date=expire)
+            for key, (data, expire) in _pending.items()
+        ]
+        with transaction.atomic(using=router.db_for_write(model)):
+            existing = set(model.objects.filter(
+                session_key__in=list(_pending)
+            ).values_list("session_key", flat=True))
+            model.objects.bulk_update(
+                [row for row in rows if row.pk in existing],
+                ["session_data", "expire_date"],
+            )
+            model.objects.bulk_create(
+                [row for row in rows if row.pk not in existing]
+            )
+        _pending.clear()
+
+        return len(rows)
+
+
+def _flush_in_background() -> None:
+    """Сброс буфера по таймеру: процесс без запросов тоже пишет
+    сессии в базу.
+    """
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush_pending()
+    except Exception:
+        logger.exception("Сессии не записаны в базу")
+    finally:
+        connections.close_all()
+
+
+def _start_timer() -> None:
+    """Запускает таймер сброса буфера, если он ещё не запущен."""
+    global _timer
+    with _lock:
+        if _timer is not None:
+            return
+        _timer = threading.Timer(
+            getattr(settings, "SESSION_WRITE_BEHIND_SECONDS", 5),
+            _flush_in_background,
+        )
+        _timer.daemon = True
+        _timer.start()
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    """Сбрасывает буфер при завершении процесса."""
+    if not _pending:
+        return
+    try:
+        flush_pending()
+    except Exception:
+        logger.exception("Сессии не записаны в базу")
+
+
+def flush_if_due() -> None:
+    """Сбрасывает буфер, если с прошлой записи прошло
+    SESSION_WRITE_BEHIND_SECONDS.
+    """
+    if _pending and time.monotonic() - _flushed >= getattr(
+        settings, "SESSION_WRITE_BEHIND_SECONDS", 5
+    ):
+        flush_pending()
+
+
+class SessionStore(CachedDBStore):
+    """Сессии в кеше с отложенной записью в базу."""
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            data = None
+        if data is not None:
+            return data
+
+        with _lock:
+            pending = _pending.get(self.session_key)
+        if pending is None or pending[1] <= timezone.now():
+            return super().load()
+
+        data = self.decode(pending[0])
+        self._cache.set(
+            self.cache_key, data, self.get_expiry_age(expiry=pending[1])
+        )
+
+        return data
+
+    def exists(self, session_key):
+        return session_key in _pending or super().exists(session_key)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+
+        data = self._get_session(no_load=must_create)
+        encoded = self.encode(data)
+        if len(encoded) > getattr(settings, "SESSION_CACHE_MAX_SIZE", 4096):
+            with _lock:
+                _pending.pop(self.session_key, None)
+            self._cache.delete(self.cache_key)
+            DBStore.save(self, must_create)
+            return
+        if not shared_cache() or transaction.get_connection(
+            router.db_for_write(self.model)
+        ).in_atomic_block:
+            # С кешем процесса другие процессы не увидят сессию из
+            # буфера. Внутри транзакции сессия пишется вместе с ней и
+            # откатывается вместе с ней.
+            with _lock:
+                _pending.pop(self.session_key, None)
+            super().save(must_create)
+            return
+
+        expiry = self.get_expiry_age()
+        if must_create:
+            if not self._cache.add(self.cache_key, data, expiry):
+                raise CreateError
+        else:
+            self._cache.set(self.cache_key, data, expiry)
+        with _lock:
+            _pending[self.session_key] = (encoded, self.get_expiry_date())
+            full = len(_pending) >= getattr(
+                settings, "SESSION_WRITE_BEHIND_MAX_PENDING", 100
+            )
+        if full:
+            flush_pending()
+        else:
+            _start_timer()
+
+    def delete(self, session_key=None):
+        key = session_key or self.session_key
+        with _lock:
+            _pending.pop(key, None)
+            super().delete(session_key)
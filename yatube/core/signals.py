@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import sessions
+from .auth import bump_user_version
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Настройки SQLite (SQLITE_PRAGMAS) для каждого нового соединения.
+
+    journal_mode=WAL сохраняется в файле базы, остальные PRAGMA
+    действуют только в рамках соединения.
+    """
+    if connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_cache_changed(sender, instance, **kwargs):
+    """Смена пароля, профиля или is_active сбрасывает кеш пользователя."""
+    bump_user_version(instance.pk)
+
+
+@receiver(request_finished)
+def write_behind_sessions(sender, **kwargs):
+    """Отложенная запись сессий (core.sessions) после ответа."""
+    sessions.flush_if_due()
@@ -0,0 +1,208 @@
+"""Журнал медленных запросов к базе.
+
+Запрос дольше SLOW_QUERY_MS записывается в лог core.slow_queries одной
+JSON-строкой: SQL, параметры, view, стек вызова в коде проекта и план
+запроса. Параметры запросов к таблицам SLOW_QUERY_REDACTED_TABLES
+(хеши паролей, данные сессий, письма) не пишутся, остаётся только их
+число. Записи выбираются с вероятностью SLOW_QUERY_SAMPLE_RATE,
+и для каждой формы запроса их не больше SLOW_QUERY_RATE_LIMIT в минуту.
+Команда slow_queries собирает из лога самые дорогие формы запросов.
+"""
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpRequest
+
+logger = logging.getLogger("core.slow_queries")
+
+RATE_WINDOW = 60
+STACK_LIMIT = 10
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SQL_STRINGS = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+SQL_PLACEHOLDERS = re.compile(r"%s|\?")
+SQL_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+SQL_SPACES = re.compile(r"\s+")
+# Таблицы, из которых читает или в которые пишет запрос; присоединённые
+# (JOIN) таблицы в условия обычно не попадают.
+SQL_TABLES = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+["`]?(\w+)', re.I)
+REDACTED_TABLES = ("auth_user", "django_session", "core_outboxemail")
+
+
+def normalize(sql: str) -> str:
+    """Форма запроса: значения заменены на ?, списки IN свёрнуты."""
+    shape = SQL_STRINGS.sub("?", sql)
+    shape = SQL_NUMBERS.sub("?", shape)
+    shape = SQL_PLACEHOLDERS.sub("?", shape)
+    shape = SQL_LISTS.sub("(...)", shape)
+
+    return SQL_SPACES.sub(" ", shape).strip()
+
+
+def redact(sql: str, params: Any) -> Tuple[Any, Optional[int]]:
+    """Параметры для журнала и их число; для запросов к
+    SLOW_QUERY_REDACTED_TABLES вместо параметров - None.
+    """
+    count = None if params is None else len(params)
+    redacted = set(
+        getattr(settings, "SLOW_QUERY_REDACTED_TABLES", REDACTED_TABLES)
+    )
+    if redacted & {table.lower() for table in SQL_TABLES.findall(sql)}:
+        return None, count
+
+    return params, count
+
+
+def project_stack() -> List[str]:
+    """Последние кадры стека из кода проекта, без Django и библиотек."""
+    frames = [
+        f"{os.path.relpath(frame.filename, PROJECT_ROOT)}:{frame.lineno} "
+        f"in {frame.name}"
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(PROJECT_ROOT)
+        and "site-packages" not in frame.filename
+        and frame.filename != __file__
+    ]
+
+    return frames[-STACK_LIMIT:]
+
+
+class RateLimiter:
+    """Не больше limit записей одной формы запроса за RATE_WINDOW секунд."""
+
+    def __init__(self) -> None:
+        self.windows: Dict[str, Tuple[float, int]] = {}
+        self.lock = threading.Lock()
+
+    def allow(self, shape: str, limit: int) -> bool:
+        now = time.monotonic()
+        with self.lock:
+            started, count = self.windows.get(shape, (now, 0))
+            if now - started >= RATE_WINDOW:
+                started, count = now, 0
+            if count >= limit:
+                return False
+            self.windows[shape] = (started, count + 1)
+
+        return True
+
+
+rate_limiter = RateLimiter()
+
+
+class SlowQueryLogger:
+    """Обёртка выполнения запросов (execute_wrapper) одного запроса."""
+
+    def __init__(self, connection, request: HttpRequest) -> None:
+        self.connection = connection
+        self.request = request
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= settings.SLOW_QUERY_MS:
+                self.log(sql, params, many, duration_ms)
+
+    def log(self, sql: str, params: Any, many: bool, duration_ms: float):
+        if random.random() >= getattr(settings, "SLOW_QUERY_SAMPLE_RATE", 1):
+            return
+        shape = normalize(sql)
+        if not rate_limiter.allow(
+            shape, getattr(settings, "SLOW_QUERY_RATE_LIMIT", 10)
+        ):
+            return
+
+        match = self.request.resolver_match
+        logged_params, params_count = redact(sql, params)
+        logger.warning(json.dumps({
+            "duration_ms": round(duration_ms, 3),
+            "view": match.view_name if match else None,
+            "path": self.request.path,
+            "shape": shape,
+            "sql": sql,
+            "params": logged_params,
+            "params_count": params_count,
+            "plan": None if many else self.explain(sql, params),
+            "stack": project_stack(),
+        }, ensure_ascii=False, default=str))
+
+    def explain(self, sql: str, params: Any) -> Optional[List[str]]:
+        """План запроса на чтение; для остальных запросов - None."""
+        if not sql.lstrip().upper().startswith("SELECT"):
+            return None
+        prefix = {
+            "sqlite": "EXPLAIN QUERY PLAN",
+            "postgresql": "EXPLAIN",
+            "mysql": "EXPLAIN",
+        }.get(self.connection.vendor)
+        if prefix is None:
+            return None
+
+        self.explaining = True
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"{prefix} {sql}", params)
+                return [
+                    " ".join(str(column) for column in row)
+                    for row in cursor.fetchall()
+                ]
+        except Exception as error:
+            return [f"EXPLAIN не выполнен: {error}"]
+        finally:
+            self.explaining = False
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    """Запись журнала из строки лога; префикс форматтера пропускается."""
+    start = line.find("{")
+    if start == -1:
+        return None
+    try:
+        record = json.loads(line[start:])
+    except ValueError:
+        return None
+
+    return record if isinstance(record, dict) and "shape" in record else None
+
+
+def aggregate(
+    records: List[Dict[str, Any]], top: int, order: str = "total_ms"
+) -> List[Dict[str, Any]]:
+    """Формы запросов с суммарным, средним и максимальным временем."""
+    shapes: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        row = shapes.setdefault(record["shape"], {
+            "shape": record["shape"],
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "views": set(),
+        })
+        row["count"] += 1
+        row["total_ms"] += record["duration_ms"]
+        row["max_ms"] = max(row["max_ms"], record["duration_ms"])
+        if record.get("view"):
+            row["views"].add(record["view"])
+
+    rows = sorted(shapes.values(), key=lambda row: -row[order])[:top]
+    for row in rows:
+        row["avg_ms"] = row["total_ms"] / row["count"]
+        row["views"] = sorted(row["views"])
+
+    return rows
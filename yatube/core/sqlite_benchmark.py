@@ -0,0 +1,130 @@
+"""Чтение SQLite под одновременной записью.
+
+Копия базы нагружается несколькими процессами: читатели запрашивают
+первую страницу главной, писатели добавляют комментарии, как
+add_comment. Прогон повторяется без настроек (журнал отката, как у
+SQLite по умолчанию) и с SQLITE_PRAGMAS, чтобы сравнить пропускную
+способность чтения и число ошибок «database is locked».
+"""
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import django
+from django.conf import settings
+from django.db import OperationalError, connections
+
+from posts.constants import FIRST_PAGE_POSTS
+from posts.models import Comment, Post
+
+# Журнал отката и настройки соединения SQLite по умолчанию.
+DEFAULT_PRAGMAS = {"journal_mode": "DELETE"}
+
+Worker = Tuple[str, str, Dict[str, Any], float, Tuple[int, int]]
+
+
+def copy_database(path: str) -> None:
+    """Согласованная копия базы default через backup API SQLite.
+
+    Копируются только зафиксированные данные: используется отдельное
+    соединение.
+    """
+    source = sqlite3.connect(
+        connections["default"].settings_dict["NAME"], uri=True
+    )
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def run_worker(args: Worker) -> Dict[str, int]:
+    """Чтение или запись в копию базы в течение seconds секунд."""
+    role, path, pragmas, seconds, (post_id, author_id) = args
+    django.setup()
+    connections.close_all()
+    settings.SQLITE_PRAGMAS = pragmas
+    connections["default"].settings_dict["NAME"] = path
+    done = errors = 0
+    stop = time.monotonic() + seconds
+    while time.monotonic() < stop:
+        try:
+            if role == "read":
+                list(Post.objects.for_list()[:FIRST_PAGE_POSTS])
+            else:
+                Comment.objects.create(
+                    post_id=post_id, author_id=author_id, text="benchmark"
+                )
+            done += 1
+        except OperationalError:
+            errors += 1
+    connections.close_all()
+
+    return {"role": role, "done": done, "errors": errors}
+
+
+def run(
+    path: str,
+    pragmas: Dict[str, Any],
+    readers: int,
+    writers: int,
+    seconds: float,
+    target: Tuple[int, int],
+) -> Dict[str, Any]:
+    """Один прогон на копии базы path с настройками pragmas."""
+    jobs: List[Worker] = [
+        ("read", path, pragmas, seconds, target)
+    ] * readers + [("write", path, pragmas, seconds, target)] * writers
+    # Процессы пула открывают свои соединения с копией базы.
+    connections.close_all()
+    with ProcessPoolExecutor(len(jobs)) as executor:
+        results = list(executor.map(run_worker, jobs))
+
+    totals = {"reads": 0, "read_errors": 0, "writes": 0, "write_errors": 0}
+    for result in results:
+        name = "reads" if result["role"] == "read" else "writes"
+        totals[name] += result["done"]
+        totals[f"{name[:-1]}_errors"] += result["errors"]
+    totals["reads_per_s"] = round(totals["reads"] / seconds, 1)
+    totals["writes_per_s"] = round(totals["writes"] / seconds, 1)
+
+    return totals
+
+
+def compare_pragmas(
+    directory: str,
+    readers: int,
+    writers: int,
+    seconds: float,
+    target: Tuple[int, int],
+) -> Dict[str, Any]:
+    """Прогоны без настроек и с SQLITE_PRAGMAS на отдельных копиях."""
+    report: Dict[str, Any] = {}
+    configs = (
+        ("default", DEFAULT_PRAGMAS),
+        ("tuned", getattr(settings, "SQLITE_PRAGMAS", {})),
+    )
+    for name, pragmas in configs:
+        path = os.path.join(directory, f"{name}.sqlite3")
+        copy_database(path)
+        # Режим журнала хранится в файле, копия наследует режим исходной.
+        copy = sqlite3.connect(path)
+        copy.execute(
+            f"PRAGMA journal_mode = {pragmas.get('journal_mode', 'DELETE')}"
+        )
+        copy.close()
+        report[name] = {
+            "pragmas": pragmas,
+            **run(path, pragmas, readers, writers, seconds, target),
+        }
+    default = report["default"]["reads_per_s"]
+    if default:
+        report["read_speedup"] = round(
+            report["tuned"]["reads_per_s"] / default, 2
+        )
+
+    return report
@@ -0,0 +1,283 @@
+"""Очередь фоновых задач в базе данных проекта.
+
+Функция регистрируется декоратором @task и ставится в очередь через
+func.enqueue(*args, **kwargs): строка Task вставляется в текущей
+транзакции, поэтому задача появляется, только если зафиксированы
+данные, ради которых она поставлена. Воркеры (команда run_workers)
+забирают задачи по очередям в порядке приоритета QUEUES.
+
+Гарантия - хотя бы одно выполнение: задача удаляется только после
+успеха, а упавший воркер отпускает её по истечении
+TASK_VISIBILITY_TIMEOUT. Поэтому задачи должны быть идемпотентными.
+Ошибка откладывает повтор с экспоненциальной задержкой; после
+max_attempts попыток задача остаётся в таблице со статусом failed.
+
+При TASKS_ALWAYS_EAGER задачи выполняются сразу при постановке, как
+если бы вызывались напрямую, - только для разработки без запущенных
+воркеров: побочные эффекты тогда снова выполняются внутри запроса.
+"""
+import json
+import logging
+import random
+import signal
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import django
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger("core.tasks")
+
+# Очереди в порядке приоритета.
+QUEUES = ("high", "default", "low")
+CLAIM_BATCH = 10
+RETRY_DELAY_LIMIT = 60 * 60
+
+TASKS: Dict[str, Callable] = {}
+
+
+def task(
+    queue: str = "default",
+    max_attempts: Optional[int] = None,
+    atomic: bool = True,
+):
+    """Регистрирует функцию как задачу и добавляет ей метод enqueue.
+
+    Задача выполняется в транзакции, если не указано atomic=False
+    (например, когда она ждёт внешний сервис и не должна держать
+    блокировку записи SQLite).
+    """
+    if queue not in QUEUES:
+        raise ValueError(f"Неизвестная очередь: {queue}")
+
+    def decorator(func: Callable) -> Callable:
+        name = f"{func.__module__}.{func.__name__}"
+        TASKS[name] = func
+
+        def enqueue(*args, **kwargs) -> Optional[Task]:
+            return _enqueue(name, queue, max_attempts, args, kwargs)
+
+        def enqueue_at(run_at: datetime, *args, **kwargs) -> Task:
+            return _enqueue(name, queue, max_attempts, args, kwargs, run_at)
+
+        func.enqueue = enqueue
+        func.enqueue_at = enqueue_at
+        func.task_name = name
+        func.atomic = atomic
+        return func
+
+    return decorator
+
+
+def _enqueue(
+    name: str,
+    queue: str,
+    max_attempts: Optional[int],
+    args: Sequence[Any],
+    kwargs: Dict[str, Any],
+    run_at: Optional[datetime] = None,
+) -> Optional[Task]:
+    """Ставит задачу в очередь. Задача с run_at (enqueue_at) всегда
+    попадает в таблицу, даже при TASKS_ALWAYS_EAGER.
+    """
+    # Аргументы проходят через JSON и при немедленном выполнении, чтобы
+    # задача получала те же значения, что и от воркера.
+    payload = json.dumps(
+        {"args": list(args), "kwargs": kwargs}, cls=DjangoJSONEncoder
+    )
+    if run_at is None and getattr(settings, "TASKS_ALWAYS_EAGER", False):
+        data = json.loads(payload)
+        TASKS[name](*data["args"], **data["kwargs"])
+        return None
+
+    return Task.objects.create(
+        name=name,
+        payload=payload,
+        queue=queue,
+        max_attempts=(
+            max_attempts or getattr(settings, "TASK_MAX_ATTEMPTS", 5)
+        ),
+        run_at=run_at or timezone.now(),
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """Задержка перед повтором: удвоение с разбросом до 10%."""
+    delay = min(
+        getattr(settings, "TASK_RETRY_DELAY", 10) * 2 ** (attempts - 1),
+        RETRY_DELAY_LIMIT,
+    )
+
+    return delay * (1 + random.random() / 10)
+
+
+def claim(queues: Sequence[str] = QUEUES) -> Optional[Task]:
+    """Забирает доступную задачу из первой непустой очереди.
+
+    Задача скрывается от других воркеров сдвигом run_at; условный
+    UPDATE гарантирует, что её получит только один воркер.
+    """
+    now = timezone.now()
+    hidden_until = now + timedelta(
+        seconds=getattr(settings, "TASK_VISIBILITY_TIMEOUT", 300)
+    )
+    for queue in queues:
+        candidates = Task.objects.filter(
+            status=Task.QUEUED, queue=queue, run_at__lte=now
+        ).order_by("run_at", "pk").values_list("pk", flat=True)
+        for pk in candidates[:CLAIM_BATCH]:
+            claimed = Task.objects.filter(
+                pk=pk, status=Task.QUEUED, run_at__lte=now
+            ).update(run_at=hidden_until, attempts=F("attempts") + 1)
+            if claimed:
+                return Task.objects.get(pk=pk)
+
+    return None
+
+
+def execute(task_row: Task) -> bool:
+    """Выполняет забранную задачу; True, если успешно."""
+    try:
+        func = TASKS[task_row.name]
+        data = json.loads(task_row.payload)
+        if func.atomic:
+            with transaction.atomic():
+                func(*data["args"], **data["kwargs"])
+        else:
+            func(*data["args"], **data["kwargs"])
+    except Exception as error:
+        failed = task_row.attempts >= task_row.max_attempts
+        logger.warning(
+            "Задача %s не выполнена (попытка %s из %s): %r",
+            task_row, task_row.attempts, task_row.max_attempts, error,
+        )
+        Task.objects.filter(pk=task_row.pk).update(
+            status=Task.FAILED if failed else Task.QUEUED,
+            run_at=timezone.now() + timedelta(
+                seconds=retry_delay(task_row.attempts)
+            ),
+            last_error=repr(error),
+        )
+        return False
+
+    Task.objects.filter(pk=task_row.pk).delete()
+    return True
+
+
+def work(
+    queues: Sequence[str],
+    stop: threading.Event,
+    poll: float,
+    burst: bool = False,
+) -> int:
+    """Цикл воркера; с burst - до опустошения очередей. Возвращает
+    число выполненных задач.
+    """
+    done = 0
+    try:
+        while not stop.is_set():
+            task_row = claim(queues)
+            if task_row is None:
+                if burst:
+                    break
+                stop.wait(poll)
+                continue
+            done += execute(task_row)
+    finally:
+        connections.close_all()
+
+    return done
+
+
+def run_process(
+    queues: Sequence[str], threads: int, poll: float, burst: bool
+) -> int:
+    """Воркеры одного процесса: threads потоков, остановка по
+    SIGTERM/SIGINT после текущих задач. Возвращает число выполненных
+    задач.
+    """
+    stop = threading.Event()
+    handlers = {
+        signum: signal.signal(signum, lambda *args: stop.set())
+        for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+    try:
+        if threads == 1:
+            return work(queues, stop, poll, burst)
+
+        results: List[int] = []
+        workers = [
+            threading.Thread(
+                target=lambda: results.append(
+                    work(queues, stop, poll, burst)
+                )
+            )
+            for _ in range(threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        return sum(results)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+
+
+def run_worker_process(
+    queues: Sequence[str],
+    threads: int,
+    poll: float,
+    burst: bool,
+    done: Any,
+) -> None:
+    """Точка входа дочернего процесса run_workers; done - общий
+    счётчик выполненных задач (multiprocessing.Value).
+    """
+    django.setup()
+    connections.close_all()
+    count = run_process(queues, threads, poll, burst)
+    with done.get_lock():
+        done.value += count
+
+
+def queue_stats() -> Dict[str, Dict[str, Any]]:
+    """Глубина очередей: готовые, отложенные (в том числе выполняемые)
+    и отказавшие задачи, возраст самой старой готовой задачи.
+    """
+    now = timezone.now()
+    stats = {
+        queue: {"ready": 0, "delayed": 0, "failed": 0, "oldest_ready_s": 0}
+        for queue in QUEUES
+    }
+    rows = Task.objects.order_by().values("queue", "status").annotate(
+        total=Count("pk"),
+    )
+    for row in rows:
+        if row["status"] == Task.FAILED:
+            stats[row["queue"]]["failed"] = row["total"]
+    ready = Task.objects.filter(
+        status=Task.QUEUED, run_at__lte=now
+    ).order_by().values("queue").annotate(
+        total=Count("pk"), oldest=Min("created")
+    )
+    for row in ready:
+        stats[row["queue"]]["ready"] = row["total"]
+        stats[row["queue"]]["oldest_ready_s"] = round(
+            (now - row["oldest"]).total_seconds(), 1
+        )
+    delayed = Task.objects.filter(
+        status=Task.QUEUED, run_at__gt=now
+    ).order_by().values("queue").annotate(total=Count("pk"))
+    for row in delayed:
+        stats[row["queue"]]["delayed"] = row["total"]
+
+    return stats
@@ -0,0 +1,22 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.holes import make_hole, punches_holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context: template.Context, template_name: str, **params) -> str:
+    """Фрагмент, зависящий от пользователя.
+
+    При рендере для общего кеша выводит метку, иначе - сам фрагмент
+    с текущим контекстом.
+    """
+    request = context.get("request")
+    if request is not None and punches_holes(request):
+        return mark_safe(make_hole(template_name, params))
+
+    fragment = context.template.engine.get_template(template_name)
+    with context.push(**params):
+        return fragment.render(context)
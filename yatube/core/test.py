@@ -1,6 +1,57 @@
+import json
+import logging
+import os
+import tempfile
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock, skipUnless
 
-from django.test import TestCase
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.contrib.sessions.models import Session
+from django.db import connection, connections
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import feed
+from posts.models import FeedEntry, Follow, Group, Post, User
+
+from . import metrics, sessions
+from .benchmark import compare, percentile
+from .cache import PAGES_VERSION_KEY, bump_pages_version, get_pages_version
+from .checks import check_session_cache
+from .models import OutboxEmail, Task
+from .routers import PRIMARY_COOKIE, ReplicaRouter, pin_request, sync_replicas
+from .slow_queries import normalize, parse_line, rate_limiter
+from .sqlite_benchmark import DEFAULT_PRAGMAS
+from .tasks import claim, execute, queue_stats, task
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("Сервер недоступен")
+
+
+@task(queue="low", max_attempts=2)
+def failing():
+    raise ValueError("Ошибка задачи")
+
+
+@task(queue="high")
+def succeeding():
+    pass
 
 
 class PostsURLTests(TestCase):
@@ -9,3 +60,789 @@ class PostsURLTests(TestCase):
         response = self.client.get("/unexisting_page/")
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, "core/404.html")
+
+
+class PagesCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_version(self):
+        """Сброс кеша страниц меняет версию."""
+        version = get_pages_version()
+        bump_pages_version()
+        self.assertEqual(get_pages_version(), version + 1)
+
+    def test_version_not_reused_after_eviction(self):
+        """После вытеснения ключа версия не возвращается к прежней."""
+        cache.set(PAGES_VERSION_KEY, 1, None)
+        cache.delete(PAGES_VERSION_KEY)
+        bump_pages_version()
+        self.assertGreater(get_pages_version(), 1)
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user("Author")
+        follower = User.objects.create_user("Follower")
+        group = Group.objects.create(title="Тест", slug="slug")
+        Post.objects.create(text="Тестовый текст", author=author, group=group)
+        Follow.objects.create(user=follower, author=author)
+
+    def test_report_per_url_name(self):
+        """Отчёт содержит метрики по именам URL без ошибок."""
+        out = StringIO()
+        call_command("benchmark", requests=60, warmup=5, users=2, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["meta"]["requests"], 60)
+        self.assertIn("posts:index", report["urls"])
+        self.assertIn("posts:follow_index [auth]", report["urls"])
+        for name, row in report["urls"].items():
+            with self.subTest(name=name):
+                self.assertLessEqual(row["p50_ms"], row["p95_ms"])
+                self.assertLessEqual(row["p95_ms"], row["p99_ms"])
+                self.assertEqual(row["errors"], 0)
+
+    def test_percentile(self):
+        """Процентиль по ближайшему рангу."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_compare_flags_regressions(self):
+        """Рост задержки сверх порога и лишние запросы - регрессии."""
+        row = {
+            "p95_ms": 10, "p99_ms": 20, "bytes": 1000,
+            "queries": 3, "errors": 0,
+        }
+        slower = dict(row, p95_ms=13, queries=4)
+        self.assertEqual(compare({"url": row}, {"url": row}, 0.2), [])
+        self.assertEqual(
+            [item["metric"] for item in compare(
+                {"url": row}, {"url": slower}, 0.2
+            )],
+            ["p95_ms", "queries"],
+        )
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(SERVER_TIMING=True)
+    def test_header_and_log(self):
+        """Время SQL, шаблонов и кеша выводится в заголовке и в логе."""
+        with self.assertLogs("core.timing", "INFO") as logs:
+            header = self.client.get("/")["Server-Timing"]
+            cached = self.client.get("/")["Server-Timing"]
+        self.assertRegex(header, r'^sql;dur=[\d.]+;desc="\d+ queries", ')
+        self.assertIn("tpl;dur=", header)
+        self.assertIn("total;dur=", header)
+        self.assertRegex(cached, r'desc="[1-9]\d* hits, 0 misses"')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["path"], "/")
+        self.assertEqual(line["status"], HTTPStatus.OK)
+        self.assertGreater(line["sql_count"], 0)
+        self.assertGreater(line["template_ms"], 0)
+
+    def test_log_enabled(self):
+        """LOGGING выводит строки core.timing уровня INFO."""
+        logger = logging.getLogger("core.timing")
+        self.assertTrue(logger.isEnabledFor(logging.INFO))
+        self.assertTrue(logger.handlers)
+
+    def test_disabled_by_default(self):
+        """Без настройки заголовок не добавляется."""
+        self.assertNotIn("Server-Timing", self.client.get("/"))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.values.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.addCleanup(self._stop_timer)
+
+    def _stop_timer(self):
+        if metrics.registry.timer is not None:
+            metrics.registry.timer.cancel()
+            metrics.registry.timer = None
+
+    def _scrape(self):
+        with override_settings(METRICS=True, METRICS_DIR=self.directory.name):
+            return self.client.get("/metrics").content.decode()
+
+    def test_request_metrics_by_view_name(self):
+        """Метрики запросов подписаны именем view."""
+        with override_settings(METRICS=True, METRICS_DIR=self.directory.name):
+            self.client.get("/")
+            self.client.get("/unexisting_page/")
+        content = self._scrape()
+        self.assertIn(
+            'http_request_duration_seconds_count{view="posts:index"} 1',
+            content,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="posts:index",'
+            'le="10.0"} 1',
+            content,
+        )
+        self.assertIn(
+            'http_responses_total{status="404",view="unmatched"} 1',
+            content,
+        )
+        self.assertRegex(content, r'db_queries_total\{view="posts:index"\} ')
+        self.assertIn("# TYPE cache_hits_total counter", content)
+
+    def test_processes_are_summed(self):
+        """Значения других процессов берутся из общего каталога."""
+        other = metrics.Registry()
+        other.inc(
+            "http_responses_total", {"view": "posts:index", "status": "200"}
+        )
+        other.flush(self.directory.name, force=True)
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+        with override_settings(METRICS=True, METRICS_DIR=self.directory.name):
+            self.client.get("/")
+        self.assertIn(
+            'http_responses_total{status="200",view="posts:index"} 2',
+            self._scrape(),
+        )
+
+    @skipUnless(hasattr(os, "fork"), "нужен os.fork")
+    def test_forked_worker_has_own_file(self):
+        """Воркер после fork пишет в свой файл и не наследует значения
+        родителя.
+        """
+        metrics.registry.inc(
+            "http_responses_total", {"view": "posts:index", "status": "200"}
+        )
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            os.write(write, json.dumps([
+                metrics.registry.file_name, metrics.registry.snapshot()
+            ]).encode())
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as pipe:
+            file_name, values = json.loads(pipe.read())
+        os.waitpid(pid, 0)
+        self.assertNotEqual(file_name, metrics.registry.file_name)
+        self.assertIn(str(pid), file_name)
+        self.assertEqual(values, {})
+
+    def test_throttled_flush_is_finished_by_timer(self):
+        """Значения, не записанные из-за FLUSH_INTERVAL, попадают в файл
+        без новых запросов.
+        """
+        other = metrics.Registry()
+        labels = {"view": "posts:index", "status": "200"}
+        other.inc("http_responses_total", labels)
+        other.flush(self.directory.name, force=True)
+        other.inc("http_responses_total", labels)
+        with mock.patch.object(metrics, "FLUSH_INTERVAL", 0.05):
+            other.flush(self.directory.name)
+        timer = other.timer
+        self.assertIsNotNone(timer)
+        timer.join()
+        path = os.path.join(self.directory.name, other.file_name)
+        with open(path, encoding="utf-8") as file:
+            self.assertEqual(
+                list(json.load(file)["http_responses_total"].values()), [2]
+            )
+        self.assertFalse(other.dirty)
+        self.assertIsNone(other.timer)
+
+    def test_disabled_by_default(self):
+        """Без настройки эндпоинт недоступен."""
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class SlowQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("Author")
+        Post.objects.create(text="Тестовый текст", author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        rate_limiter.windows.clear()
+
+    def _log(self, **settings):
+        with override_settings(SLOW_QUERY_MS=0, **settings):
+            with self.assertLogs("core.slow_queries") as logs:
+                self.client.get(f"/profile/{self.author.username}/")
+
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_record_with_plan_and_stack(self):
+        """Запись содержит SQL, параметры, view, стек и план запроса."""
+        records = self._log()
+        posts = [
+            record for record in records
+            if '"posts_post"' in record["sql"]
+            and "ORDER BY" in record["sql"]
+        ]
+        self.assertTrue(posts)
+        record = posts[0]
+        self.assertEqual(record["view"], "posts:profile")
+        self.assertIn(self.author.id, record["params"])
+        self.assertTrue(record["plan"])
+        self.assertTrue(
+            any(frame.startswith("posts/") for frame in record["stack"])
+        )
+
+    def test_sensitive_params_are_redacted(self):
+        """Параметры запросов к таблице пользователей не пишутся."""
+        sensitive = [
+            record for record in self._log()
+            if 'FROM "auth_user"' in record["sql"]
+        ]
+        self.assertTrue(sensitive)
+        for record in sensitive:
+            self.assertIsNone(record["params"])
+            self.assertGreater(record["params_count"], 0)
+
+    def test_rate_limit_per_shape(self):
+        """Одна форма запроса пишется не чаще лимита."""
+        records = self._log(SLOW_QUERY_RATE_LIMIT=1)
+        shapes = [record["shape"] for record in records]
+        self.assertEqual(len(shapes), len(set(shapes)))
+
+    def test_sampling(self):
+        """При нулевой доле выборки ничего не пишется."""
+        with override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_SAMPLE_RATE=0):
+            with self.assertRaises(AssertionError):
+                with self.assertLogs("core.slow_queries"):
+                    self.client.get("/")
+
+    def test_normalize(self):
+        """Значения и списки IN заменяются заполнителями."""
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s)\n"
+                      "LIMIT 10"),
+            "SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?",
+        )
+
+    def test_command_top_shapes(self):
+        """Команда выводит формы запросов по суммарному времени."""
+        lines = [
+            {"shape": "A", "duration_ms": 10, "view": "posts:index"},
+            {"shape": "B", "duration_ms": 15, "view": "posts:profile"},
+            {"shape": "A", "duration_ms": 12, "view": "posts:follow_index"},
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".log") as file:
+            file.write("WARNING не JSON\n")
+            for line in lines:
+                file.write(f"WARNING core.slow_queries {json.dumps(line)}\n")
+            file.flush()
+            out = StringIO()
+            call_command("slow_queries", file.name, top=1, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["records"], 3)
+        self.assertEqual(report["shapes"], [{
+            "shape": "A",
+            "count": 2,
+            "total_ms": 22,
+            "max_ms": 12,
+            "avg_ms": 11,
+            "views": ["posts:follow_index", "posts:index"],
+        }])
+
+    def test_logging_writes_file_for_command(self):
+        """LOGGING пишет журнал в файл строками, которые читает
+        команда slow_queries.
+        """
+        handler, = logging.getLogger("core.slow_queries").handlers
+        self.assertIsInstance(handler, logging.FileHandler)
+        with override_settings(SLOW_QUERY_MS=0):
+            with self.assertLogs("core.slow_queries") as logs:
+                self.client.get(f"/profile/{self.author.username}/")
+        record = logs.records[0]
+        self.assertEqual(
+            parse_line(handler.format(record)),
+            json.loads(record.getMessage()),
+        )
+
+    def test_disabled_by_default(self):
+        """Без настройки журнал не ведётся."""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs("core.slow_queries"):
+                self.client.get("/")
+
+
+class SQLiteTests(TransactionTestCase):
+    def setUp(self):
+        author = User.objects.create_user("Author")
+        Post.objects.create(text="Тестовый текст", author=author)
+
+    def test_pragmas_applied(self):
+        """Настройки SQLITE_PRAGMAS действуют в соединении."""
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA temp_store")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_benchmark_report(self):
+        """Отчёт сравнивает чтение без настроек и с ними."""
+        out = StringIO()
+        call_command(
+            "sqlite_benchmark", readers=1, writers=1, seconds=0.2, stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["default"]["pragmas"], DEFAULT_PRAGMAS)
+        self.assertEqual(report["tuned"]["pragmas"]["journal_mode"], "WAL")
+        for name in ("default", "tuned"):
+            self.assertGreater(report[name]["reads"], 0)
+            self.assertGreater(report[name]["writes"], 0)
+
+
+class ReplicaTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        connections.databases["replica"] = {
+            **connections.databases["default"],
+            "NAME": os.path.join(directory.name, "replica.sqlite3"),
+        }
+        self.addCleanup(self._drop_replica)
+        self.author = User.objects.create_user("Author")
+        sync_replicas(["replica"])
+
+    def _drop_replica(self):
+        connections["replica"].close()
+        del connections._connections.replica
+        del connections.databases["replica"]
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_router(self):
+        """Чтение внутри GET-запроса идёт на реплику до первой записи."""
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), "default")
+        with pin_request(primary=False) as pin:
+            self.assertEqual(router.db_for_read(Post), "replica")
+            self.assertIsNone(router.db_for_read(Session))
+            self.assertEqual(router.db_for_write(Post), "default")
+            Post.objects.create(text="Текст", author=self.author)
+            self.assertEqual(router.db_for_read(User), "default")
+        self.assertTrue(pin.wrote)
+        self.assertTrue(pin.replica_read)
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_read_your_writes(self):
+        """Автор сразу видит новый пост, остальные - после репликации."""
+        client = Client()
+        client.force_login(self.author)
+        response = client.post(
+            reverse("posts:post_create"), {"text": "Новый пост"}, follow=True
+        )
+        self.assertContains(response, "Новый пост")
+        self.assertIn(PRIMARY_COOKIE, client.cookies)
+
+        post = Post.objects.get(text="Новый пост")
+        detail = reverse("posts:post_detail", args=[post.pk])
+        self.assertEqual(Client().get(detail).status_code, 404)
+        self.assertEqual(client.get(detail).status_code, 200)
+        sync_replicas()
+        self.assertEqual(Client().get(detail).status_code, 200)
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_cached_page_after_write(self):
+        """Закешированная страница не скрывает запись ни от автора,
+        ни от гостя: промах рендерится с основной базы.
+        """
+        client = Client()
+        client.force_login(self.author)
+        profile = reverse("posts:profile", args=[self.author.username])
+        client.post(reverse("posts:post_create"), {"text": "Новый пост"})
+
+        self.assertContains(Client().get(profile), "Новый пост")
+        self.assertContains(client.get(profile), "Новый пост")
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_pinned_request_skips_cache(self):
+        """После записи, не сменившей версию страниц, автор видит её,
+        хотя в кеше лежит прежняя страница, и обновляет эту страницу.
+        """
+        post = Post.objects.create(text="Старый текст", author=self.author)
+        sync_replicas()
+        profile = reverse("posts:profile", args=[self.author.username])
+        self.assertContains(Client().get(profile), "Старый текст")
+
+        Post.objects.filter(pk=post.pk).update(text="Новый текст")
+        client = Client()
+        client.cookies[PRIMARY_COOKIE] = "1"
+        self.assertContains(client.get(profile), "Новый текст")
+        self.assertContains(Client().get(profile), "Новый текст")
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            "Author", "author@mail.ru", "password"
+        )
+        self.user = User.objects.create_user("User")
+        self.post = Post.objects.create(text="Текст", author=self.author)
+
+    def test_follow_is_queued(self):
+        """Подписка ставит заполнение ленты в очередь, воркер его
+        выполняет и удаляет задачу.
+        """
+        self.client.force_login(self.user)
+        self.client.get(
+            reverse("posts:profile_follow", args=[self.author.username])
+        )
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(queue_stats()["default"]["ready"], 1)
+
+        out = StringIO()
+        call_command("run_workers", "--burst", stdout=out)
+        self.assertIn("Выполнено задач: 2", out.getvalue())
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post=self.post
+        ).exists())
+        self.assertFalse(Task.objects.exists())
+
+    def test_backfill_skipped_after_unfollow(self):
+        """Подписка, отменённая до выполнения задачи, не возвращает
+        посты автора в ленту.
+        """
+        self.client.force_login(self.user)
+        self.client.get(
+            reverse("posts:profile_follow", args=[self.author.username])
+        )
+        self.client.get(
+            reverse("posts:profile_unfollow", args=[self.author.username])
+        )
+        call_command("run_workers", "--burst", stdout=StringIO())
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertNotContains(
+            self.client.get(reverse("posts:follow_index")), "Текст"
+        )
+
+    def test_unfollow_during_backfill(self):
+        """Отписка, зафиксированная во время заполнения ленты, не
+        оставляет в ленте посты автора.
+        """
+        self.client.force_login(self.user)
+        self.client.get(
+            reverse("posts:profile_follow", args=[self.author.username])
+        )
+        backfill = feed.backfill_follow
+
+        def unfollow_then_backfill(user_id, author_id):
+            Follow.objects.filter(
+                user_id=user_id, author_id=author_id
+            ).delete()
+            backfill(user_id, author_id)
+
+        with mock.patch.object(
+            feed, "backfill_follow", side_effect=unfollow_then_backfill
+        ):
+            call_command("run_workers", "--burst", stdout=StringIO())
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_priority(self):
+        """Задачи берутся из очереди с высшим приоритетом."""
+        Task.objects.all().delete()
+        failing.enqueue()
+        succeeding.enqueue()
+        self.assertEqual(claim().name, "core.test.succeeding")
+        self.assertEqual(claim().name, "core.test.failing")
+        self.assertIsNone(claim())
+
+    def test_retry_then_fail(self):
+        """Упавшая задача повторяется с задержкой, после max_attempts
+        попыток остаётся со статусом failed.
+        """
+        Task.objects.all().delete()
+        failing.enqueue()
+        self.assertFalse(execute(claim()))
+        stats = queue_stats()["low"]
+        self.assertEqual((stats["ready"], stats["delayed"]), (0, 1))
+        self.assertIsNone(claim())
+
+        Task.objects.update(run_at=timezone.now())
+        self.assertFalse(execute(claim()))
+        row = Task.objects.get()
+        self.assertEqual(row.status, Task.FAILED)
+        self.assertEqual(row.attempts, 2)
+        self.assertIn("Ошибка задачи", row.last_error)
+        self.assertIsNone(claim())
+
+        out = StringIO()
+        call_command("task_stats", stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["low"]["failed"], 1)
+
+
+@override_settings(
+    EMAIL_BACKEND="core.mail.OutboxBackend",
+    EMAIL_OUTBOX_BACKEND="core.test.CountingBackend",
+    TASKS_ALWAYS_EAGER=False,
+)
+class OutboxTests(TransactionTestCase):
+    """Задача отправки ставится после фиксации транзакции, поэтому
+    TransactionTestCase.
+    """
+    def setUp(self):
+        CountingBackend.opened = 0
+        User.objects.create_user("Author", "author@mail.ru", "password")
+
+    def test_password_reset_email_is_queued(self):
+        """Письмо сброса пароля сохраняется в запросе и отправляется
+        задачей воркера.
+        """
+        self.client.post(
+            reverse("users:reset_form"), {"email": "author@mail.ru"}
+        )
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+        self.assertEqual(Task.objects.get().name, "core.mail.send_outbox")
+
+        call_command("run_workers", "--burst", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["author@mail.ru"])
+        body = mail.outbox[0].message().get_payload(decode=True).decode()
+        self.assertIn("/auth/reset/", body)
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_batch_reuses_connections(self):
+        """Пачка писем уходит через EMAIL_OUTBOX_CONCURRENCY соединений,
+        задача отправки ставится один раз.
+        """
+        for number in range(5):
+            mail.send_mail("Тема", "Текст", None, [f"user{number}@mail.ru"])
+        self.assertEqual(Task.objects.count(), 1)
+
+        out = StringIO()
+        call_command("send_outbox", "--concurrency", "2", stdout=out)
+        self.assertIn("Отправлено писем: 5, ошибок: 0", out.getvalue())
+        self.assertEqual(CountingBackend.opened, 2)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [f"user{number}@mail.ru" for number in range(5)],
+        )
+
+    def test_file_backend_gets_same_message(self):
+        """Файловый бэкенд записывает сохранённое письмо без изменений."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        mail.send_mail("Тема", "Текст письма", None, ["user@mail.ru"])
+        with self.settings(
+            EMAIL_OUTBOX_BACKEND=(
+                "django.core.mail.backends.filebased.EmailBackend"
+            ),
+            EMAIL_FILE_PATH=directory.name,
+        ):
+            call_command("send_outbox", stdout=StringIO())
+        (name,) = os.listdir(directory.name)
+        path = os.path.join(directory.name, name)
+        with open(path, encoding="utf-8") as file:
+            content = file.read()
+        self.assertIn("To: user@mail.ru", content)
+        self.assertIn("Текст письма", content)
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_mode_does_not_send_inline(self):
+        """Даже при TASKS_ALWAYS_EAGER письмо не отправляется в запросе."""
+        mail.send_mail("Тема", "Текст", None, ["user@mail.ru"])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Task.objects.get().name, "core.mail.send_outbox")
+
+    def test_worker_retries_failed_email(self):
+        """Задача отправки ставится заново на время повтора письма."""
+        mail.send_mail("Тема", "Текст", None, ["user@mail.ru"])
+        with self.settings(EMAIL_OUTBOX_BACKEND="core.test.FailingBackend"):
+            call_command("run_workers", "--burst", stdout=StringIO())
+        row = OutboxEmail.objects.get()
+        retry = Task.objects.get()
+        self.assertEqual(row.status, OutboxEmail.QUEUED)
+        self.assertGreaterEqual(retry.run_at, row.run_at)
+
+        OutboxEmail.objects.update(run_at=timezone.now())
+        Task.objects.update(run_at=timezone.now())
+        out = StringIO()
+        call_command("run_workers", "--burst", stdout=out)
+        self.assertIn("Выполнено задач: 1", out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(OutboxEmail.objects.exists())
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(
+        EMAIL_OUTBOX_BACKEND="core.test.FailingBackend",
+        EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+    )
+    def test_retry_then_fail(self):
+        """Неотправленное письмо повторяется, затем получает отказ."""
+        mail.send_mail("Тема", "Текст", None, ["user@mail.ru"])
+        call_command("send_outbox", stdout=StringIO())
+        row = OutboxEmail.objects.get()
+        self.assertEqual(row.status, OutboxEmail.QUEUED)
+        self.assertGreater(row.run_at, timezone.now())
+        self.assertIn("Сервер недоступен", row.last_error)
+
+        OutboxEmail.objects.update(run_at=timezone.now())
+        call_command("send_outbox", stdout=StringIO())
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.FAILED)
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("Author", password="password")
+        self.client.force_login(self.user)
+
+    def _auth_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [
+            query["sql"] for query in queries
+            if 'FROM "auth_user"' in query["sql"]
+        ]
+
+    def test_warm_cache_skips_auth_query(self):
+        """При тёплом кеше пользователь запроса не читается из базы."""
+        url = reverse("posts:follow_index")
+        _, queries = self._auth_queries(url)
+        self.assertTrue(queries)
+        response, queries = self._auth_queries(url)
+        self.assertEqual(queries, [])
+        self.assertEqual(response.context["user"], self.user)
+
+    def test_user_changes_invalidate_cache(self):
+        """Правка профиля видна сразу, смена пароля и блокировка
+        завершают сеанс.
+        """
+        url = reverse("posts:follow_index")
+        self.client.get(url)
+        self.user.username = "Renamed"
+        self.user.save()
+        self.assertContains(self.client.get(url), "Пользователь: Renamed")
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.FOUND)
+
+        self.user.is_active = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.client.get(url)
+        self.user.set_password("new password")
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.FOUND)
+
+
+@override_settings(SESSION_WRITE_BEHIND_SECONDS=3600)
+class SessionTests(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = self.settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": directory.name,
+        }})
+        shared.enable()
+        self.addCleanup(shared.disable)
+        sessions._pending.clear()
+        self.addCleanup(sessions._pending.clear)
+        self.addCleanup(self._stop_timer)
+        self.user = User.objects.create_user("Author", password="password")
+        self.url = reverse("posts:follow_index")
+
+    def test_login_is_written_behind(self):
+        """Вход не пишет в базу, сессия попадает туда пачкой и
+        читается из базы после очистки кеша.
+        """
+        self.client.post(
+            reverse("users:login"),
+            {"username": "Author", "password": "password"},
+        )
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(self.client.get(self.url).status_code, HTTPStatus.OK)
+
+        self.assertEqual(sessions.flush_pending(), 1)
+        cache.clear()
+        self.assertEqual(self.client.get(self.url).status_code, HTTPStatus.OK)
+        self.assertTrue(Session.objects.exists())
+
+    def test_database_session_stays_valid(self):
+        """Сессия, созданная движком db, действует и после перехода."""
+        with self.settings(
+            SESSION_ENGINE="django.contrib.sessions.backends.db"
+        ):
+            self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, HTTPStatus.OK)
+
+    def test_logout_deletes_at_once(self):
+        """Выход удаляет сессию из буфера, кеша и базы."""
+        self.client.force_login(self.user)
+        sessions.flush_pending()
+        self.client.force_login(self.user)
+        self.client.get(reverse("users:logout"))
+        self.assertEqual(sessions._pending, {})
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(
+            self.client.get(self.url).status_code, HTTPStatus.FOUND
+        )
+
+    def _stop_timer(self):
+        if sessions._timer is not None:
+            sessions._timer.cancel()
+            sessions._timer = None
+
+    @override_settings(SESSION_WRITE_BEHIND_SECONDS=0.01)
+    def test_idle_process_flushes_by_timer(self):
+        """Буфер сбрасывается по таймеру и без новых запросов."""
+        sessions.SessionStore().save()
+        timer = sessions._timer
+        self.assertIsNotNone(timer)
+        timer.join()
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(sessions._pending, {})
+        self.assertIsNone(sessions._timer)
+
+    def test_process_cache_writes_through(self):
+        """С кешем процесса сессия пишется в базу сразу, проверка
+        предупреждает об этом.
+        """
+        self.assertEqual(check_session_cache(None), [])
+        with self.settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }}):
+            self.client.force_login(self.user)
+            self.assertEqual(Session.objects.count(), 1)
+            self.assertEqual(sessions._pending, {})
+            self.assertEqual(
+                [warning.id for warning in check_session_cache(None)],
+                ["core.W001"],
+            )
+
+    @override_settings(
+        SESSION_CACHE_MAX_SIZE=10, SESSION_WRITE_BEHIND_MAX_PENDING=2
+    )
+    def test_limits(self):
+        """Большая сессия пишется сразу, полный буфер сбрасывается."""
+        self.client.force_login(self.user)
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(sessions._pending, {})
+
+        with self.settings(SESSION_CACHE_MAX_SIZE=4096):
+            sessions.SessionStore().save()
+            self.assertEqual(Session.objects.count(), 1)
+            sessions.SessionStore().save()
+        self.assertEqual(Session.objects.count(), 3)
+        self.assertEqual(sessions._pending, {})
@@ -0,0 +1,199 @@
+"""Учёт времени запроса: SQL, шаблоны и кеш.
+
+Замеры копятся в RequestTiming текущего запроса, который middleware
+(ServerTimingMiddleware, MetricsMiddleware) кладут в contextvar. Вне
+запроса или при выключенных middleware бэкенды шаблонов и кеша только
+проверяют, что contextvar пуст.
+"""
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from django.core.cache.backends import locmem
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+
+_MISSING = object()
+
+
+class RequestTiming:
+    """Замеры одного запроса в миллисекундах."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.sql_ms = 0.0
+        self.sql_count = 0
+        self.template_ms = 0.0
+        self.cache_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.in_cache = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка выполнения запросов к базе (execute_wrapper)."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - started) * 1000
+            self.sql_count += 1
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_header(self) -> str:
+        """Значение заголовка Server-Timing."""
+        return ", ".join((
+            f'sql;dur={self.sql_ms:.1f};desc="{self.sql_count} queries"',
+            f"tpl;dur={self.template_ms:.1f}",
+            f'cache;dur={self.cache_ms:.1f};desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+            f"total;dur={self.total_ms:.1f}",
+        ))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round(self.total_ms, 1),
+            "sql_ms": round(self.sql_ms, 1),
+            "sql_count": self.sql_count,
+            "template_ms": round(self.template_ms, 1),
+            "cache_ms": round(self.cache_ms, 1),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+
+current_timing = ContextVar("current_timing", default=None)
+
+
+@contextmanager
+def track_request() -> Iterator[RequestTiming]:
+    """Замеры текущего запроса.
+
+    Если замеры уже ведутся (несколько middleware используют их
+    одновременно), возвращается тот же RequestTiming.
+    """
+    timing = current_timing.get()
+    if timing is not None:
+        yield timing
+        return
+
+    timing = RequestTiming()
+    token = current_timing.set(timing)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timing))
+            yield timing
+    finally:
+        current_timing.reset(token)
+
+
+class TimedTemplate(DjangoTemplate):
+    def render(self, context=None, request=None):
+        timing = current_timing.get()
+        if timing is None:
+            return super().render(context, request)
+
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.template_ms += (time.perf_counter() - started) * 1000
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, который учитывает время рендера.
+
+    Учитываются только шаблоны, отрендеренные через бэкенд (render,
+    render_to_string): вложенные include входят в их время.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(
+            self.engine.from_string(template_code), self
+        )
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+
+        return TimedTemplate(template.template, self)
+
+
+class TimedCacheMixin:
+    """Учёт времени, попаданий и промахов для бэкендов кеша.
+
+    Учитывается только внешний вызов: get_many базового класса
+    вызывает get для каждого ключа.
+    """
+
+    def _timed(
+        self,
+        counter: Optional[Callable[[Any], Tuple[int, int]]],
+        method: Callable,
+        *args,
+        **kwargs,
+    ) -> Any:
+        """Вызов метода кеша с учётом времени; counter по результату
+        возвращает число попаданий и промахов.
+        """
+        timing = current_timing.get()
+        if timing is None or timing.in_cache:
+            return method(*args, **kwargs)
+
+        timing.in_cache = True
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            timing.in_cache = False
+            timing.cache_ms += (time.perf_counter() - started) * 1000
+        if counter is not None:
+            hits, misses = counter(result)
+            timing.cache_hits += hits
+            timing.cache_misses += misses
+
+        return result
+
+    def get(self, key, default=None, version=None):
+        value = self._timed(
+            lambda value: (0, 1) if value is _MISSING else (1, 0),
+            super().get,
+            key,
+            _MISSING,
+            version,
+        )
+
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+
+        return self._timed(
+            lambda values: (len(values), len(keys) - len(values)),
+            super().get_many,
+            keys,
+            version,
+        )
+
+    def set(self, *args, **kwargs):
+        return self._timed(None, super().set, *args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self._timed(None, super().set_many, *args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return self._timed(None, super().add, *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._timed(None, super().delete, *args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        return self._timed(None, super().incr, *args, **kwargs)
+
+
+class LocMemCache(TimedCacheMixin, locmem.LocMemCache):
+    pass
@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import metrics as metrics_registry
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +19,16 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Метрики всех процессов в текстовом формате Prometheus."""
+    if not getattr(settings, "METRICS", False):
+        raise Http404
+
+    return HttpResponse(
+        metrics_registry.render(
+            metrics_registry.collect(getattr(settings, "METRICS_DIR", None))
+        ),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
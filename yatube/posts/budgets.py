@@ -0,0 +1,43 @@
+"""Бюджеты страниц приложения posts.
+
+Для каждого имени URL задано, сколько запросов к базе, времени SQL
+и времени остальной обработки (view и шаблоны) допустимо на
+незакешированный запрос при объёме данных BUDGET_DATASET. Бюджеты
+проверяются тестом posts/tests/test_budgets.py: число запросов - всегда,
+время - только с CHECK_TIME_BUDGETS=1 в окружении.
+"""
+from typing import NamedTuple
+
+
+class Budget(NamedTuple):
+    queries: int
+    sql_ms: float
+    render_ms: float
+
+
+# Параметры seed_scale, на которых измеряются бюджеты.
+BUDGET_DATASET = {
+    "users": 60,
+    "groups": 5,
+    "posts": 600,
+    "follows": 8,
+    "comments": 600,
+    "seed": 1,
+}
+
+BUDGETS = {
+    "index": Budget(queries=5, sql_ms=50, render_ms=500),
+    "profile": Budget(queries=9, sql_ms=50, render_ms=500),
+    "post_detail": Budget(queries=7, sql_ms=50, render_ms=300),
+    "post_comments": Budget(queries=3, sql_ms=50, render_ms=300),
+    "group_list": Budget(queries=6, sql_ms=50, render_ms=500),
+    "post_create": Budget(queries=4, sql_ms=50, render_ms=300),
+    "post_edit": Budget(queries=7, sql_ms=50, render_ms=300),
+    "add_comment": Budget(queries=4, sql_ms=50, render_ms=200),
+    "follow_index": Budget(queries=6, sql_ms=50, render_ms=500),
+    # Подписка пересчитывает счётчики и дополняет ленту в транзакции,
+    # точки сохранения тоже считаются запросами. Подписка проверяется
+    # до и после заполнения ленты (posts.tasks.backfill_follow).
+    "profile_follow": Budget(queries=25, sql_ms=100, render_ms=200),
+    "profile_unfollow": Budget(queries=16, sql_ms=100, render_ms=200),
+}
@@ -0,0 +1,59 @@
+import hashlib
+from typing import Iterable, List
+
+from django.core.cache import cache
+from django.template import Context
+
+from .constants import CARD_CACHE_TIMEOUT, CARD_TEMPLATE, CARD_VERSION
+from .models import Post
+
+
+def get_card_key(post: Post, hide_group: bool) -> str:
+    """Ключ карточки поста.
+
+    Версия - хеш всех выводимых в карточке данных: текста, картинки,
+    даты, имени автора и названия/адреса группы. Изменение любого из них
+    даёт новый ключ, поэтому отдельная инвалидация не нужна.
+    """
+    group = post.group
+    version = hashlib.md5(
+        repr((
+            CARD_VERSION,
+            post.text,
+            post.image.name,
+            post.pub_date.isoformat(),
+            post.author.username,
+            post.author.first_name,
+            post.author.last_name,
+            group and (group.title, group.slug),
+            hide_group,
+        )).encode()
+    ).hexdigest()
+
+    return f"card:{post.pk}:{version}"
+
+
+def render_cards(context: Context, posts: Iterable[Post]) -> List[str]:
+    """HTML карточек постов страницы.
+
+    Все карточки запрашиваются из кеша одним get_many, отсутствующие
+    рендерятся и сохраняются одним set_many.
+    """
+    posts = list(posts)
+    hide_group = bool(context.get("group"))
+    keys = [get_card_key(post, hide_group) for post in posts]
+    cached = cache.get_many(keys)
+    missing = {}
+    template = context.template.engine.get_template(CARD_TEMPLATE)
+    cards = []
+    for post, key in zip(posts, keys):
+        card = cached.get(key)
+        if card is None:
+            with context.push(post=post):
+                card = template.render(context)
+            missing[key] = card
+        cards.append(card)
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+
+    return cards
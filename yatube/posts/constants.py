@@ -1,5 +1,50 @@
+from datetime import datetime, timezone
+
 # Общие
 COUNT_OF_POSTS = 10
+PAGE_PARAM = "page"
+CURSOR_PARAM = "cursor"
+PAGINATOR_WINDOW = 2
+COMMENTS_FIRST_PAGE = 20
+COMMENTS_PAGE_SIZE = 50
+FEED_BATCH_SIZE = 500
+FEED_FANOUT_THRESHOLD = 10000
+FEED_PULL_AUTHORS_KEY = "feed:pull_authors"
+FEED_PULL_AUTHORS_TIMEOUT = 60 * 5
+COUNTERS_CHUNK_SIZE = 1000
+POSTS_COUNT_KEY = "count:posts"
+POSTS_COUNT_TIMEOUT = 60 * 60
+POSTS_COUNT_ESTIMATE_FROM = 1000000
+PAGES_CACHE_TIMEOUT = 60 * 60 * 6
+CARD_TEMPLATE = "posts/includes/article.html"
+POST_CARD_FIELDS = (
+    "text",
+    "pub_date",
+    "image",
+    "author__username",
+    "author__first_name",
+    "author__last_name",
+    "group__title",
+    "group__slug",
+)
+CARD_VERSION = 1
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+SEED_BATCH_SIZE = 1000
+SEED_LOCALE = "ru_RU"
+SEED_USERNAME = "seed_{}"
+SEED_END_DATE = datetime(2022, 9, 15, tzinfo=timezone.utc)
+SEED_DAYS = 365
+SEED_AUTHOR_SKEW = 3
+SEED_FOLLOW_SKEW = 4
+SEED_FOLLOW_ALPHA = 1.5
+SEED_COMMENT_SKEW = 4
+SEED_NO_GROUP = 0.3
+SEED_IMAGES = 16
+SHARD_VNODES = 64
+SHARD_MOVE_BATCH_SIZE = 500
+THUMBNAIL_SIZE = "960x339"
+THUMBNAIL_OPTIONS = {"crop": "center", "upscale": True}
+USER_DISPLAY_FIELDS = frozenset(("username", "first_name", "last_name"))
 COUNT_OF_LETTERS = 15
 HEADER_LENGTH = 200
 CREATE_POST = {
@@ -0,0 +1,246 @@
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple, Type
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models import Count, F, Sum
+
+from . import feed
+from .constants import (POSTS_COUNT_ESTIMATE_FROM, POSTS_COUNT_KEY,
+                        POSTS_COUNT_TIMEOUT)
+from .models import Follow, Group, GroupCounter, Post, User, UserCounter
+from .sharding import get_shards, scatter
+
+
+def _change(
+    model: Type[models.Model], pk: int, **deltas: int
+) -> None:
+    """Атомарно изменяет счётчики строки F()-выражением.
+
+    Отсутствующая строка создаётся только при увеличении счётчика:
+    уменьшение для уже удаляемого объекта пропускается.
+    """
+    if pk is None:
+        return
+
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    with transaction.atomic():
+        if model.objects.filter(pk=pk).update(**updates):
+            return
+        if all(delta > 0 for delta in deltas.values()):
+            model.objects.get_or_create(pk=pk)
+            model.objects.filter(pk=pk).update(**updates)
+
+
+def post_added(post: Post) -> None:
+    _change(UserCounter, post.author_id, posts_count=1)
+    _change(GroupCounter, post.group_id, posts_count=1)
+
+
+def post_removed(post: Post) -> None:
+    _change(UserCounter, post.author_id, posts_count=-1)
+    _change(GroupCounter, post.group_id, posts_count=-1)
+
+
+def post_moved(old_group_id: int, new_group_id: int) -> None:
+    _change(GroupCounter, old_group_id, posts_count=-1)
+    _change(GroupCounter, new_group_id, posts_count=1)
+
+
+def follow_added(follow: Follow) -> None:
+    _change(UserCounter, follow.author_id, followers_count=1)
+    _change(UserCounter, follow.user_id, following_count=1)
+
+
+def follow_removed(follow: Follow) -> None:
+    _change(UserCounter, follow.author_id, followers_count=-1)
+    _change(UserCounter, follow.user_id, following_count=-1)
+
+
+def get_user_counter(user: User) -> UserCounter:
+    """Счётчики пользователя; для пользователя без строки - нулевые."""
+    counter = UserCounter.objects.filter(user=user).first()
+
+    return counter or UserCounter(user=user)
+
+
+def get_group_counter(group: Group) -> GroupCounter:
+    """Счётчики группы; для группы без строки - нулевые."""
+    counter = GroupCounter.objects.filter(group=group).first()
+
+    return counter or GroupCounter(group=group)
+
+
+def estimate_rows(
+    model: Type[models.Model], using: str = DEFAULT_DB_ALIAS
+) -> Optional[int]:
+    """Оценка числа строк таблицы из статистики планировщика.
+
+    Для SQLite это sqlite_stat1 (после ANALYZE), для PostgreSQL -
+    pg_class.reltuples. Если статистики нет - None.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "sqlite":
+        # Таблица статистики появляется только после первого ANALYZE.
+        if "sqlite_stat1" not in connection.introspection.table_names():
+            return None
+        sql = (
+            "SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 "
+            "WHERE tbl = %s"
+        )
+    elif connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+    else:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+
+    return row[0] if row and row[0] and row[0] > 0 else None
+
+
+def count_all_posts() -> int:
+    """Число всех постов.
+
+    Для больших таблиц берётся оценка планировщика, иначе точный
+    COUNT(*), закешированный до следующего создания или удаления поста.
+    При шардировании складываются значения всех шардов.
+    """
+    estimates = [estimate_rows(Post, alias) for alias in get_shards()]
+    if None not in estimates and sum(estimates) >= POSTS_COUNT_ESTIMATE_FROM:
+        return sum(estimates)
+
+    total = cache.get(POSTS_COUNT_KEY)
+    if total is None:
+        total = sum(
+            queryset.count() for queryset in scatter(Post.objects.all())
+        )
+        cache.set(POSTS_COUNT_KEY, total, POSTS_COUNT_TIMEOUT)
+
+    return total
+
+
+def posts_count_changed() -> None:
+    cache.delete(POSTS_COUNT_KEY)
+
+
+def count_feed_posts(user: User) -> int:
+    """Число постов ленты - сумма счётчиков авторов из подписок."""
+    return UserCounter.objects.filter(
+        user__following__user=user
+    ).aggregate(total=Sum("posts_count"))["total"] or 0
+
+
+def _grouped_counts(
+    queryset: models.QuerySet, key: str
+) -> Dict[int, int]:
+    """Число строк по значениям key, сложенное по всем шардам."""
+    counts = Counter()
+    for shard_queryset in scatter(queryset):
+        counts.update(dict(
+            shard_queryset.order_by().values(key).annotate(
+                total=Count("pk")
+            ).values_list(key, "total")
+        ))
+
+    return dict(counts)
+
+
+def actual_user_counts(
+    user_ids: Iterable[int]
+) -> Dict[int, Tuple[int, int, int]]:
+    """Фактические (постов, подписчиков, подписок) по пользователям."""
+    user_ids = list(user_ids)
+    posts = _grouped_counts(
+        Post.objects.filter(author_id__in=user_ids), "author_id"
+    )
+    followers = _grouped_counts(
+        Follow.objects.filter(author_id__in=user_ids), "author_id"
+    )
+    following = _grouped_counts(
+        Follow.objects.filter(user_id__in=user_ids), "user_id"
+    )
+
+    return {
+        user_id: (
+            posts.get(user_id, 0),
+            followers.get(user_id, 0),
+            following.get(user_id, 0),
+        ) for user_id in user_ids
+    }
+
+
+def actual_group_counts(group_ids: Iterable[int]) -> Dict[int, int]:
+    """Фактическое число постов по группам."""
+    group_ids = list(group_ids)
+    posts = _grouped_counts(
+        Post.objects.filter(group_id__in=group_ids), "group_id"
+    )
+
+    return {group_id: posts.get(group_id, 0) for group_id in group_ids}
+
+
+def reconcile_users(user_ids: Iterable[int]) -> int:
+    """Пересчитывает счётчики пользователей, возвращает число расхождений.
+    """
+    actual = actual_user_counts(user_ids)
+    stored = {
+        counter.pk: (
+            counter.posts_count,
+            counter.followers_count,
+            counter.following_count,
+        ) for counter in UserCounter.objects.filter(pk__in=actual)
+    }
+    drift = 0
+    for user_id, (posts, followers, following) in actual.items():
+        if stored.get(user_id, (0, 0, 0)) == (posts, followers, following):
+            continue
+        drift += 1
+        UserCounter.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                "posts_count": posts,
+                "followers_count": followers,
+                "following_count": following,
+            },
+        )
+    feed.mark_pull_authors(actual)
+
+    return drift
+
+
+def reconcile_groups(group_ids: Iterable[int]) -> int:
+    """Пересчитывает счётчики групп, возвращает число расхождений."""
+    actual = actual_group_counts(group_ids)
+    stored = dict(
+        GroupCounter.objects.filter(
+            pk__in=actual
+        ).values_list("pk", "posts_count")
+    )
+    drift = 0
+    for group_id, posts in actual.items():
+        if stored.get(group_id, 0) == posts:
+            continue
+        drift += 1
+        GroupCounter.objects.update_or_create(
+            group_id=group_id, defaults={"posts_count": posts}
+        )
+
+    return drift
+
+
+def chunked_ids(model: Type[models.Model], chunk_size: int):
+    """Первичные ключи таблицы порциями по возрастанию."""
+    last_pk = 0
+    while True:
+        chunk = list(
+            model.objects.filter(pk__gt=last_pk).order_by(
+                "pk"
+            ).values_list("pk", flat=True)[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]
@@ -0,0 +1,191 @@
+from datetime import datetime
+from typing import FrozenSet, Iterable, Optional, Union
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.query import QuerySet
+
+from .constants import (FEED_BATCH_SIZE, FEED_FANOUT_THRESHOLD,
+                        FEED_PULL_AUTHORS_KEY, FEED_PULL_AUTHORS_TIMEOUT)
+from .models import FeedEntry, Follow, Post, User, UserCounter
+from .sharding import (POST_ORDERING, ScatterGather, get_author_querysets,
+                       is_sharded)
+from .utils import MergedCursorPaginator
+
+
+def _bulk_insert(entries) -> None:
+    """Пакетная вставка записей ленты без дублей."""
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def mark_pull_authors(author_ids: Optional[Iterable[int]] = None) -> None:
+    """Переводит авторов, у которых по счётчикам больше
+    FEED_FANOUT_THRESHOLD подписчиков, в режим чтения при показе.
+
+    Вызывается там, где меняется followers_count (подписка, пересчёт
+    счётчиков); author_ids=None - проверить всех. Флаг feed_pull не
+    снимается: при обратном переходе посты автора, не разнесённые по
+    лентам, пропали бы из лент подписчиков.
+    """
+    counters = UserCounter.objects.filter(
+        followers_count__gt=FEED_FANOUT_THRESHOLD, feed_pull=False
+    )
+    if author_ids is not None:
+        counters = counters.filter(user_id__in=list(author_ids))
+    if counters.update(feed_pull=True):
+        cache.delete(FEED_PULL_AUTHORS_KEY)
+
+
+def get_pull_author_ids() -> FrozenSet[int]:
+    """Авторы, чьи посты не разносятся по лентам, а читаются при показе
+    (флаг feed_pull, см. mark_pull_authors). Множество кешируется до
+    появления нового такого автора.
+    """
+    author_ids = cache.get(FEED_PULL_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = frozenset(
+            UserCounter.objects.filter(
+                feed_pull=True
+            ).values_list("user_id", flat=True)
+        )
+        cache.set(
+            FEED_PULL_AUTHORS_KEY, author_ids, FEED_PULL_AUTHORS_TIMEOUT
+        )
+
+    return author_ids
+
+
+def fan_out_post(post_id: int, author_id: int, pub_date: datetime) -> None:
+    """Разносит новый пост в ленты всех подписчиков автора.
+
+    При шардировании посты лежат не в основной базе с лентами, поэтому
+    все авторы читаются при показе.
+    """
+    if is_sharded() or author_id in get_pull_author_ids():
+        return
+
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list("user_id", flat=True)
+    with transaction.atomic():
+        _bulk_insert(
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id in followers.iterator()
+        )
+
+
+def backfill_follow(user_id: int, author_id: int) -> None:
+    """Заполняет ленту подписчика постами автора после подписки."""
+    if is_sharded() or author_id in get_pull_author_ids():
+        return
+
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list("id", "pub_date")
+    with transaction.atomic():
+        _bulk_insert(
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator()
+        )
+
+
+def prune_follow(user_id: int, author_id: int) -> None:
+    """Убирает посты автора из ленты после отписки."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def get_feed_queryset(user: User) -> QuerySet:
+    """Посты ленты подписок пользователя.
+
+    Сортировка идёт по продублированным в ленте полям, поэтому страница
+    выбирается по индексу ленты без сортировки во временном B-дереве.
+    """
+    return Post.objects.filter(
+        feed_entries__user=user
+    ).annotate(
+        feed_pub_date=F("feed_entries__pub_date"),
+        feed_post_id=F("feed_entries__post_id"),
+    ).order_by("-feed_pub_date", "-feed_post_id")
+
+
+def get_followed_ids(user: User):
+    return Follow.objects.filter(user=user).values_list(
+        "author_id", flat=True
+    )
+
+
+def get_feed_page_queryset(user: User) -> Union[QuerySet, ScatterGather]:
+    """Посты ленты для постраничной навигации (?page=N).
+
+    Если среди подписок нет популярных авторов, вся лента лежит
+    в таблице ленты и читается по её индексу. Иначе посты выбираются
+    соединением с подписками и сортируются при чтении. При
+    шардировании посты авторов из подписок сливаются со всех шардов.
+    """
+    if is_sharded():
+        return ScatterGather(
+            get_author_querysets(
+                Post.objects.for_list(), list(get_followed_ids(user))
+            ),
+            POST_ORDERING,
+        )
+    if not Follow.objects.filter(
+        user=user, author_id__in=get_pull_author_ids()
+    ).exists():
+        return get_feed_queryset(user).for_list()
+
+    return Post.objects.filter(author__following__user=user).for_list()
+
+
+def get_feed_paginator(user: User, per_page: int) -> MergedCursorPaginator:
+    """Курсорная пагинация ленты: разнесённые посты и посты популярных
+    авторов, на которых подписан пользователь, сливаются при чтении.
+    При шардировании сливаются посты всех авторов из подписок по одному
+    запросу на шард.
+    """
+    if is_sharded():
+        return MergedCursorPaginator(
+            [
+                (queryset, POST_ORDERING)
+                for queryset in get_author_querysets(
+                    Post.objects.for_list(), list(get_followed_ids(user))
+                )
+            ],
+            per_page,
+            POST_ORDERING,
+        )
+
+    pull_author_ids = list(Follow.objects.filter(
+        user=user, author_id__in=get_pull_author_ids()
+    ).values_list("author_id", flat=True))
+    # В ленте могут остаться записи, разнесённые до перехода автора
+    # в режим чтения при показе: его посты берутся только из второго
+    # источника.
+    sources = [
+        (
+            get_feed_queryset(user).exclude(
+                author_id__in=pull_author_ids
+            ).for_list(),
+            ("-feed_pub_date", "-feed_post_id"),
+        ),
+        *(
+            (
+                Post.objects.filter(
+                    author_id=author_id
+                ).for_list(),
+                ("-pub_date", "-id"),
+            ) for author_id in pull_author_ids
+        ),
+    ]
+
+    return MergedCursorPaginator(sources, per_page, ("-pub_date", "-id"))
@@ -0,0 +1,32 @@
+from typing import Any, Dict
+
+from django.http import HttpRequest
+
+from core.holes import register_hole
+
+from .models import Follow, UserCounter
+
+
+@register_hole("posts/includes/follow_button.html")
+def follow_button(
+    request: HttpRequest, author_username: str
+) -> Dict[str, Any]:
+    """Подписан ли текущий пользователь на автора профиля."""
+    following = (
+        request.user.is_authenticated
+        and Follow.objects.filter(
+            user=request.user, author__username=author_username
+        ).exists()
+    )
+
+    return {"following": following}
+
+
+@register_hole("posts/includes/follow_counts.html")
+def follow_counts(request: HttpRequest, author_id: int) -> Dict[str, Any]:
+    """Счётчики подписок автора профиля: подписка и отписка не
+    сбрасывают кеш страниц.
+    """
+    counter = UserCounter.objects.filter(user_id=author_id).first()
+
+    return {"counter": counter or UserCounter()}
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache import bump_pages_version
+from posts.constants import SHARD_MOVE_BATCH_SIZE
+from posts.counters import posts_count_changed
+from posts.sharding import (get_shards, is_sharded, rebalance, register_keys,
+                            sync_reference)
+
+
+class Command(BaseCommand):
+    """Раскладка постов и комментариев по шардам POST_SHARDS."""
+
+    help = (
+        "Копирует пользователей и группы на шарды, регистрирует ключи "
+        "шардирования существующих постов и переносит посты авторов "
+        "на их шарды. Запускается после включения шардирования и после "
+        "изменения списка шардов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только подсчитать, что будет перенесено.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=SHARD_MOVE_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        if not is_sharded():
+            raise CommandError("Шардирование выключено: POST_SHARDS пуст.")
+
+        batch_size = options["batch_size"]
+        self.stdout.write(f"Шарды: {', '.join(get_shards())}")
+        if not options["dry_run"]:
+            copied = sync_reference(batch_size)
+            self.stdout.write(f"Скопировано пользователей и групп: {copied}")
+            keys = register_keys(batch_size)
+            self.stdout.write(f"Зарегистрировано ключей постов: {keys}")
+
+        result = rebalance(options["dry_run"], batch_size)
+        verb = "К переносу" if options["dry_run"] else "Перенесено"
+        self.stdout.write(
+            f"{verb}: авторов {result['authors']}, постов "
+            f"{result['posts']}, комментариев {result['comments']}"
+        )
+        if not options["dry_run"]:
+            posts_count_changed()
+            bump_pages_version()
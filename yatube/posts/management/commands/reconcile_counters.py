@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.constants import COUNTERS_CHUNK_SIZE
+from posts.counters import chunked_ids, reconcile_groups, reconcile_users
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    """Пересчёт денормализованных счётчиков пользователей и групп."""
+
+    help = (
+        "Пересчитывает счётчики постов и подписок порциями "
+        "и сообщает о расхождениях."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=COUNTERS_CHUNK_SIZE,
+            help="Сколько строк пересчитывать за одну транзакцию.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        for model, reconcile in (
+            (User, reconcile_users),
+            (Group, reconcile_groups),
+        ):
+            checked = drift = 0
+            for chunk in chunked_ids(model, chunk_size):
+                with transaction.atomic():
+                    drift += reconcile(chunk)
+                checked += len(chunk)
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: проверено {checked}, "
+                f"исправлено расхождений {drift}"
+            )
@@ -0,0 +1,153 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max, Min
+
+from core.cache import bump_pages_version
+from posts.constants import SEED_BATCH_SIZE, SEED_IMAGES, SEED_USERNAME
+from posts.models import Follow, Post, User
+from posts.seeding import (init_worker, make_groups, make_images,
+                           make_tasks, seed_chunk)
+
+TITLES = {
+    "users": "Пользователи",
+    "follows": "Подписки",
+    "posts": "Посты",
+    "comments": "Комментарии",
+    "feed": "Подписки, разнесённые по лентам",
+}
+
+
+class Command(BaseCommand):
+    """Генерация воспроизводимого набора данных большого объёма."""
+
+    help = (
+        "Создаёт пользователей, группы, посты, подписки и комментарии "
+        "пакетами в нескольких процессах. Например, объём production: "
+        "seed_scale --users 100000 --posts 10000000."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--groups", type=int, default=50)
+        parser.add_argument("--posts", type=int, default=20000)
+        parser.add_argument(
+            "--follows",
+            type=int,
+            default=20,
+            help="Среднее число подписок пользователя.",
+        )
+        parser.add_argument("--comments", type=int, default=50000)
+        parser.add_argument(
+            "--images",
+            type=float,
+            default=0.0,
+            help="Доля постов с картинкой, от 0 до 1.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--password",
+            default=None,
+            help="Общий пароль пользователей; без него войти нельзя.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=SEED_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Число процессов; для SQLite всегда 1.",
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.filter(
+            username__startswith=SEED_USERNAME.format("")
+        ).exists():
+            raise CommandError(
+                "Данные уже сгенерированы, очистите базу перед запуском."
+            )
+        if not 0 <= options["images"] <= 1:
+            raise CommandError("--images задаётся долей от 0 до 1.")
+
+        seed = options["seed"]
+        state = {
+            "seed": seed,
+            "password": make_password(options["password"]),
+            "follows": options["follows"],
+            "images_share": options["images"],
+        }
+        workers = options["workers"]
+        if connection.vendor == "sqlite":
+            workers = 1
+
+        self._run(state, workers, make_tasks(
+            "users", options["users"], options["batch_size"]
+        ))
+        usernames = User.objects.filter(
+            username__startswith=SEED_USERNAME.format("")
+        ).values_list("username", "id")
+        prefix = len(SEED_USERNAME.format(""))
+        state["user_ids"] = [
+            user_id for _, user_id in sorted(
+                (int(username[prefix:]), user_id)
+                for username, user_id in usernames
+            )
+        ]
+        state["group_ids"] = make_groups(options["groups"], seed)
+        self.stdout.write(f"Группы: {len(state['group_ids'])}")
+        state["images"] = (
+            make_images(SEED_IMAGES, seed) if options["images"] else []
+        )
+
+        self._run(state, workers, make_tasks(
+            "follows", len(state["user_ids"]), options["batch_size"]
+        ))
+        self._run(state, workers, make_tasks(
+            "posts", options["posts"], options["batch_size"]
+        ))
+        ids = Post.objects.aggregate(first=Min("id"), last=Max("id"))
+        state["posts_range"] = (
+            (ids["first"], ids["last"] - ids["first"] + 1)
+            if ids["first"] is not None else (0, 0)
+        )
+        if ids["first"] is not None:
+            self._run(state, workers, make_tasks(
+                "comments", options["comments"], options["batch_size"]
+            ))
+
+        # bulk_create не отправляет сигналы: счётчики пересчитываются,
+        # и пересчёт переводит популярных авторов в чтение при показе.
+        call_command("reconcile_counters", stdout=self.stdout)
+        ids = Follow.objects.aggregate(first=Min("id"), last=Max("id"))
+        if ids["first"] is not None:
+            self._run(state, workers, make_tasks(
+                "feed",
+                ids["last"] - ids["first"] + 1,
+                options["batch_size"],
+                ids["first"],
+            ))
+        bump_pages_version()
+
+    def _run(self, state, workers, tasks):
+        """Выполняет порции в пуле процессов или, для одного процесса,
+        в текущем.
+        """
+        if not tasks:
+            return
+
+        if workers > 1:
+            # Дочерние процессы открывают свои соединения с базой.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                workers, initializer=init_worker, initargs=(state,)
+            ) as executor:
+                created = sum(executor.map(seed_chunk, tasks))
+        else:
+            init_worker(state)
+            created = sum(map(seed_chunk, tasks))
+        self.stdout.write(f"{TITLES[tasks[0][0]]}: {created}")
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0019_comment_page_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Ключ шардирования',
+                'verbose_name_plural': 'Ключи шардирования',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_shard_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounter',
+            name='feed_pull',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Лента при показе'),
+        ),
+    ]
@@ -3,7 +3,7 @@ from django.db import models
 from pytils.translit import slugify
 
 from core.models import PubDateModel
-from posts.constants import COUNT_OF_LETTERS, HEADER_LENGTH
+from posts.constants import COUNT_OF_LETTERS, HEADER_LENGTH, POST_CARD_FIELDS
 
 User = get_user_model()
 
@@ -51,6 +51,14 @@ class Group(models.Model):
         super().save(*args, **kwargs)
 
 
+class PostQuerySet(models.QuerySet):
+    def for_list(self) -> "PostQuerySet":
+        """Посты для лент: автор и группа в том же запросе и только
+        поля, которые выводит карточка posts/includes/article.html.
+        """
+        return self.select_related("author", "group").only(*POST_CARD_FIELDS)
+
+
 class Post(PubDateModel, models.Model):
     """Модель таблицы с постами.
 
@@ -84,10 +92,23 @@ class Post(PubDateModel, models.Model):
         help_text="Здесь можно загрузить картинку, объёмом не более 5Мб",
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
         ordering = ("-pub_date", "-id",)
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"], name="post_page_idx"),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="post_author_page_idx",
+            ),
+            models.Index(
+                fields=["group", "-pub_date", "-id"],
+                name="post_group_page_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:COUNT_OF_LETTERS]
@@ -118,7 +139,13 @@ class Comment(PubDateModel, models.Model):
     class Meta:
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
-        ordering = ("-pub_date",)
+        ordering = ("-pub_date", "-id",)
+        indexes = [
+            models.Index(
+                fields=["post", "-pub_date", "-id"],
+                name="comment_post_page_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.text[:COUNT_OF_LETTERS]
@@ -153,3 +180,152 @@ class Follow(models.Model):
                 fields=["user", "author"], name="unique_follow"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["author", "user"], name="follow_author_user_idx"
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Модель таблицы ленты подписок (fan-out-on-write).
+
+    Каждая запись - пост автора, на которого подписан пользователь.
+    Дата публикации продублирована, чтобы страница ленты читалась
+    одним диапазоном по индексу (user, pub_date, post).
+
+    Attributes:
+        user: ForeignKey - ссылка (ID) на объект класса User, владелец ленты
+        post: ForeignKey - ссылка (ID) на объект класса Post
+        pub_date: DateTimeField - дата публикации поста
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name="Пользователь",
+        on_delete=models.CASCADE,
+        related_name="feed",
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name="Пост",
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+    )
+    pub_date = models.DateTimeField(
+        verbose_name="Дата публикации",
+    )
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        ordering = ("-pub_date", "-post",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_feed_entry"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-post"], name="feed_page_idx"
+            )
+        ]
+
+
+class UserCounter(models.Model):
+    """Модель таблицы счётчиков пользователя.
+
+    Attributes:
+        user: OneToOneField - ссылка (ID) на объект класса User
+        posts_count: IntegerField - число постов пользователя
+        followers_count: IntegerField - число подписчиков пользователя
+        following_count: IntegerField - число подписок пользователя
+        feed_pull: BooleanField - посты читаются в ленты при показе;
+        флаг не снимается, когда подписчиков становится меньше порога
+    """
+    user = models.OneToOneField(
+        User,
+        verbose_name="Пользователь",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="counter",
+    )
+    posts_count = models.IntegerField(
+        verbose_name="Постов",
+        default=0,
+    )
+    followers_count = models.IntegerField(
+        verbose_name="Подписчиков",
+        default=0,
+        db_index=True,
+    )
+    following_count = models.IntegerField(
+        verbose_name="Подписок",
+        default=0,
+    )
+    feed_pull = models.BooleanField(
+        verbose_name="Лента при показе",
+        default=False,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = "Счётчики пользователя"
+        verbose_name_plural = "Счётчики пользователей"
+
+    def __str__(self) -> str:
+        return str(self.user_id)
+
+
+class GroupCounter(models.Model):
+    """Модель таблицы счётчиков сообщества.
+
+    Attributes:
+        group: OneToOneField - ссылка (ID) на объект класса Group
+        posts_count: IntegerField - число постов сообщества
+    """
+    group = models.OneToOneField(
+        Group,
+        verbose_name="Группа",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="counter",
+    )
+    posts_count = models.IntegerField(
+        verbose_name="Постов",
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = "Счётчики группы"
+        verbose_name_plural = "Счётчики групп"
+
+    def __str__(self) -> str:
+        return str(self.group_id)
+
+
+class ShardKey(models.Model):
+    """Модель таблицы ключей шардирования постов и комментариев.
+
+    Лежит в основной базе. Строка выдаёт посту или комментарию
+    сквозной id, общий для всех шардов, и хранит автора, по которому
+    выбирается шард: автора поста, для комментария - автора
+    комментируемого поста. Строки без автора резервируют id, занятые
+    до включения шардирования.
+
+    Attributes:
+        author: ForeignKey - ссылка (ID) на объект класса User
+    """
+    author = models.ForeignKey(
+        User,
+        verbose_name="Автор",
+        on_delete=models.CASCADE,
+        null=True,
+        related_name="+",
+    )
+
+    class Meta:
+        verbose_name = "Ключ шардирования"
+        verbose_name_plural = "Ключи шардирования"
+
+    def __str__(self) -> str:
+        return str(self.pk)
@@ -0,0 +1,246 @@
+"""Генерация синтетических данных для проверки производительности.
+
+Данные воспроизводимы: каждая порция строк генерируется своим
+генератором случайных чисел, зерно которого зависит только от общего
+зерна, вида данных и номера первой строки порции, а пользователи
+и посты выбираются по номеру, а не по id. Поэтому строки не зависят
+от числа процессов; при нескольких процессах могут отличаться только
+id постов, к которым привязаны комментарии.
+"""
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Tuple, Type
+
+import django
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from faker import Faker
+from PIL import Image
+
+from .constants import (SEED_AUTHOR_SKEW, SEED_COMMENT_SKEW, SEED_DAYS,
+                        SEED_END_DATE, SEED_FOLLOW_ALPHA, SEED_FOLLOW_SKEW,
+                        SEED_LOCALE, SEED_NO_GROUP, SEED_USERNAME)
+from .feed import backfill_follow
+from .models import Comment, Follow, Group, Post, User
+
+Task = Tuple[str, int, int]
+
+_state: Dict[str, Any] = {}
+
+
+def init_worker(state: Dict[str, Any]) -> None:
+    """Инициализация процесса: общие для всех порций данные
+    (id пользователей, веса групп, параметры генерации).
+    """
+    django.setup()
+    _state.clear()
+    _state.update(state)
+    if state.get("group_ids"):
+        _state["group_weights"] = list(accumulate(
+            1 / rank for rank in range(1, len(state["group_ids"]) + 1)
+        ))
+
+
+def skewed_index(rng: random.Random, size: int, skew: float) -> int:
+    """Индекс из [0, size) со степенным распределением: чем больше skew,
+    тем чаще выпадают первые индексы (популярные авторы и посты).
+    """
+    return min(size - 1, int(size * rng.random() ** skew))
+
+
+def make_images(count: int, seed: int) -> List[str]:
+    """Несколько маленьких картинок, общих для всех постов."""
+    rng = random.Random(f"{seed}:images")
+    names = []
+    for i in range(count):
+        content = io.BytesIO()
+        color = tuple(rng.randrange(256) for _ in range(3))
+        Image.new("RGB", (96, 34), color).save(content, "PNG")
+        names.append(default_storage.save(
+            f"posts/seed/{seed}-{i}.png", ContentFile(content.getvalue())
+        ))
+
+    return names
+
+
+@contextmanager
+def explicit_pub_dates(*model_classes: Type[models.Model]) -> Iterator:
+    """Позволяет задать pub_date при bulk_create, отключая auto_now_add."""
+    fields = [model._meta.get_field("pub_date") for model in model_classes]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _generators(kind: str, start: int) -> Tuple[random.Random, Faker]:
+    key = f"{_state['seed']}:{kind}:{start}"
+    fake = Faker(SEED_LOCALE)
+    fake.seed_instance(key)
+
+    return random.Random(key), fake
+
+
+def _pub_date(rng: random.Random):
+    return SEED_END_DATE - timedelta(seconds=rng.random() * SEED_DAYS * 86400)
+
+
+def _seed_users(start: int, stop: int) -> int:
+    _, fake = _generators("users", start)
+    User.objects.bulk_create(
+        User(
+            username=SEED_USERNAME.format(i),
+            email=f"{SEED_USERNAME.format(i)}@example.com",
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            password=_state["password"],
+        ) for i in range(start, stop)
+    )
+
+    return stop - start
+
+
+def _seed_follows(start: int, stop: int) -> int:
+    rng, _ = _generators("follows", start)
+    user_ids = _state["user_ids"]
+    size = len(user_ids)
+    alpha = SEED_FOLLOW_ALPHA
+    follows = []
+    for user_id in user_ids[start:stop]:
+        count = min(
+            size - 1,
+            int(_state["follows"] * (alpha - 1) / alpha
+                * rng.paretovariate(alpha)),
+        )
+        authors = set()
+        for _ in range(count * 2):
+            if len(authors) >= count:
+                break
+            author_id = user_ids[skewed_index(rng, size, SEED_FOLLOW_SKEW)]
+            if author_id != user_id:
+                authors.add(author_id)
+        follows.extend(
+            Follow(user_id=user_id, author_id=author_id)
+            for author_id in sorted(authors)
+        )
+    Follow.objects.bulk_create(follows, ignore_conflicts=True)
+
+    return len(follows)
+
+
+def _seed_posts(start: int, stop: int) -> int:
+    rng, fake = _generators("posts", start)
+    user_ids = _state["user_ids"]
+    group_ids = _state["group_ids"]
+    images = _state["images"]
+    posts = []
+    for _ in range(start, stop):
+        group_id = None
+        if group_ids and rng.random() >= SEED_NO_GROUP:
+            group_id = rng.choices(
+                group_ids, cum_weights=_state["group_weights"]
+            )[0]
+        image = ""
+        if images and rng.random() < _state["images_share"]:
+            image = rng.choice(images)
+        posts.append(Post(
+            author_id=user_ids[
+                skewed_index(rng, len(user_ids), SEED_AUTHOR_SKEW)
+            ],
+            group_id=group_id,
+            text=fake.paragraph(nb_sentences=rng.randint(1, 8)),
+            pub_date=_pub_date(rng),
+            image=image,
+        ))
+    with explicit_pub_dates(Post):
+        Post.objects.bulk_create(posts)
+
+    return len(posts)
+
+
+def _seed_comments(start: int, stop: int) -> int:
+    rng, fake = _generators("comments", start)
+    user_ids = _state["user_ids"]
+    first_post_id, posts_count = _state["posts_range"]
+    comments = [
+        Comment(
+            post_id=first_post_id + skewed_index(
+                rng, posts_count, SEED_COMMENT_SKEW
+            ),
+            author_id=rng.choice(user_ids),
+            text=fake.sentence(),
+            pub_date=_pub_date(rng),
+        ) for _ in range(start, stop)
+    ]
+    existing = set(Post.objects.filter(
+        id__in={comment.post_id for comment in comments}
+    ).values_list("id", flat=True))
+    comments = [
+        comment for comment in comments if comment.post_id in existing
+    ]
+    with explicit_pub_dates(Comment):
+        Comment.objects.bulk_create(comments)
+
+    return len(comments)
+
+
+def _seed_feed(start: int, stop: int) -> int:
+    follows = Follow.objects.filter(
+        id__gte=start, id__lt=stop
+    ).values_list("user_id", "author_id")
+    count = 0
+    for user_id, author_id in follows:
+        backfill_follow(user_id, author_id)
+        count += 1
+
+    return count
+
+
+SEEDERS = {
+    "users": _seed_users,
+    "follows": _seed_follows,
+    "posts": _seed_posts,
+    "comments": _seed_comments,
+    "feed": _seed_feed,
+}
+
+
+def seed_chunk(task: Task) -> int:
+    """Генерирует одну порцию строк и возвращает число созданных."""
+    kind, start, stop = task
+    with transaction.atomic():
+        return SEEDERS[kind](start, stop)
+
+
+def make_tasks(
+    kind: str, total: int, batch_size: int, first: int = 0
+) -> List[Task]:
+    """Разбивает диапазон [first, first + total) на порции."""
+    return [
+        (kind, start, min(start + batch_size, first + total))
+        for start in range(first, first + total, batch_size)
+    ]
+
+
+def make_groups(count: int, seed: int) -> List[int]:
+    """Группы создаются в основном процессе: их немного."""
+    fake = Faker(SEED_LOCALE)
+    fake.seed_instance(f"{seed}:groups")
+    Group.objects.bulk_create(
+        Group(
+            title=f"{fake.catch_phrase()} {i}",
+            slug=f"seed-{seed}-{i}",
+            description=fake.paragraph(),
+        ) for i in range(count)
+    )
+
+    return list(Group.objects.filter(
+        slug__startswith=f"seed-{seed}-"
+    ).order_by("id").values_list("id", flat=True))
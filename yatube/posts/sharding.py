@@ -0,0 +1,432 @@
+"""Шардирование постов и комментариев по автору.
+
+Базы из настройки POST_SHARDS распределяются по кольцу
+согласованного хеширования, и посты автора вместе с комментариями
+к ним лежат на его шарде. Пользователи и группы копируются на все
+шарды (нужны для внешних ключей и select_related), остальные таблицы
+живут только в основной базе. Сквозные id постов и комментариев
+выдаёт таблица ShardKey основной базы, по ней же находится шард поста.
+
+Без POST_SHARDS всё работает с основной базой как раньше: scatter()
+возвращает исходный запрос, а ShardRouter ничего не решает и передаёт
+выбор следующему маршрутизатору. После включения шардирования или
+добавления шарда данные раскладываются командой rebalance_shards.
+"""
+import bisect
+import copy
+import hashlib
+import heapq
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models.query import QuerySet
+from django.http import HttpRequest
+
+from .constants import COUNT_OF_POSTS, SHARD_MOVE_BATCH_SIZE, SHARD_VNODES
+from .models import Comment, FeedEntry, Group, Post, ShardKey, User
+from .utils import MergedCursorPaginator, get_page_context
+
+SHARDED_MODELS = (Post, Comment)
+POST_ORDERING = ("-pub_date", "-id")
+
+
+class HashRing:
+    """Кольцо согласованного хеширования.
+
+    Каждый шард занимает vnodes точек кольца, ключ принадлежит первой
+    точке по часовой стрелке. При добавлении шарда к нему переходит
+    примерно 1/N ключей, остальные остаются на месте.
+    """
+
+    def __init__(self, shards: Sequence[str], vnodes: int = SHARD_VNODES):
+        points = sorted(
+            (self._hash(f"{shard}#{number}"), shard)
+            for shard in shards
+            for number in range(vnodes)
+        )
+        self.hashes = [point for point, _ in points]
+        self.shards = [shard for _, shard in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int(hashlib.md5(value.encode()).hexdigest()[:16], 16)
+
+    def get(self, key: Any) -> str:
+        index = bisect.bisect(self.hashes, self._hash(str(key)))
+
+        return self.shards[index % len(self.shards)]
+
+
+@lru_cache(maxsize=8)
+def _ring(shards: Tuple[str, ...]) -> HashRing:
+    return HashRing(shards)
+
+
+def get_shards() -> List[str]:
+    """Базы шардов; без шардирования - только основная."""
+    return list(getattr(settings, "POST_SHARDS", [])) or [DEFAULT_DB_ALIAS]
+
+
+def is_sharded() -> bool:
+    return bool(getattr(settings, "POST_SHARDS", []))
+
+
+def shard_for_author(author_id: int) -> str:
+    return _ring(tuple(get_shards())).get(author_id)
+
+
+def shard_for_post(post_id: int) -> str:
+    """Шард поста по ключу шардирования; для неизвестного id - основная
+    база.
+    """
+    author_id = ShardKey.objects.using(DEFAULT_DB_ALIAS).filter(
+        pk=post_id
+    ).values_list("author_id", flat=True).first()
+    if author_id is None:
+        return DEFAULT_DB_ALIAS
+
+    return shard_for_author(author_id)
+
+
+def allocate_id(author_id: int) -> int:
+    """Сквозной id для нового поста или комментария."""
+    return ShardKey.objects.using(DEFAULT_DB_ALIAS).create(
+        author_id=author_id
+    ).pk
+
+
+def sharding_author_id(instance: models.Model) -> int:
+    """Автор, по которому выбирается шард поста или комментария."""
+    if isinstance(instance, Post):
+        return instance.author_id
+    post = Comment._meta.get_field("post").get_cached_value(instance, None)
+    if post is not None:
+        return post.author_id
+
+    return ShardKey.objects.using(DEFAULT_DB_ALIAS).filter(
+        pk=instance.post_id
+    ).values_list("author_id", flat=True).first()
+
+
+def post_lookup(post_id: int) -> QuerySet:
+    """Посты базы, в которой лежит пост post_id."""
+    if not is_sharded():
+        return Post.objects.all()
+
+    return Post.objects.using(shard_for_post(post_id))
+
+
+def author_posts(author_id: int) -> QuerySet:
+    """Посты базы, в которой лежат посты автора."""
+    if not is_sharded():
+        return Post.objects.all()
+
+    return Post.objects.using(shard_for_author(author_id))
+
+
+def scatter(queryset: QuerySet) -> List[QuerySet]:
+    """Копии запроса постов или комментариев для каждого шарда; без
+    шардирования и для остальных моделей - сам запрос, чтобы базу
+    по-прежнему выбирали маршрутизаторы.
+    """
+    if not is_sharded() or not issubclass(queryset.model, SHARDED_MODELS):
+        return [queryset]
+
+    return [queryset.using(alias) for alias in get_shards()]
+
+
+class ScatterGather:
+    """Срезы по слиянию одинаково отсортированных запросов к шардам.
+
+    Для среза [start:stop] с каждого шарда берётся stop первых записей,
+    поэтому подходит для первых страниц (`?page=N` в CountedPaginator);
+    дальние страницы листаются курсором (MergedCursorPaginator).
+    """
+
+    def __init__(
+        self, querysets: Sequence[QuerySet], ordering: Sequence[str]
+    ) -> None:
+        self.querysets = [
+            queryset.order_by(*ordering) for queryset in querysets
+        ]
+        self.ordering = tuple(ordering)
+        self.descending = ordering[0].startswith("-")
+
+    def _key(self, item: models.Model) -> List[Any]:
+        return [getattr(item, name.lstrip("-")) for name in self.ordering]
+
+    def count(self) -> int:
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, key: slice) -> List[models.Model]:
+        if not isinstance(key, slice) or key.stop is None:
+            raise TypeError("Поддерживаются только срезы с концом.")
+        merged = heapq.merge(
+            *(list(queryset[:key.stop]) for queryset in self.querysets),
+            key=self._key,
+            reverse=self.descending,
+        )
+
+        return list(merged)[key]
+
+
+def get_sharded_page_context(
+    queryset: QuerySet, request: HttpRequest, count=None
+) -> Dict[str, Any]:
+    """get_page_context для постов со всех шардов, отсортированных
+    по (pub_date, id).
+    """
+    querysets = scatter(queryset)
+    if len(querysets) == 1:
+        return get_page_context(querysets[0], request, count=count)
+
+    return get_page_context(
+        ScatterGather(querysets, POST_ORDERING),
+        request,
+        MergedCursorPaginator(
+            [(queryset, POST_ORDERING) for queryset in querysets],
+            COUNT_OF_POSTS,
+            POST_ORDERING,
+        ),
+        count=count,
+    )
+
+
+def get_author_querysets(
+    queryset: QuerySet, author_ids: Sequence[int]
+) -> List[QuerySet]:
+    """Посты авторов из запроса, по одному запросу на шард."""
+    if not is_sharded():
+        return [queryset.filter(author_id__in=author_ids)]
+
+    by_shard: Dict[str, List[int]] = {}
+    for author_id in author_ids:
+        by_shard.setdefault(shard_for_author(author_id), []).append(
+            author_id
+        )
+
+    return [
+        queryset.using(alias).filter(author_id__in=ids)
+        for alias, ids in by_shard.items()
+    ] or [queryset.none()]
+
+
+def replicate(instance: models.Model) -> None:
+    """Копия пользователя или группы на остальных шардах."""
+    for alias in get_shards():
+        if alias == DEFAULT_DB_ALIAS:
+            continue
+        # У копии своё состояние: save(using=...) меняет базу объекта.
+        replica = copy.copy(instance)
+        replica._state = copy.copy(instance._state)
+        replica.save(using=alias)
+
+
+def replicate_delete(instance: models.Model) -> None:
+    """Удаление пользователя или группы на остальных шардах."""
+    for alias in get_shards():
+        if alias != DEFAULT_DB_ALIAS:
+            type(instance).objects.using(alias).filter(
+                pk=instance.pk
+            ).delete()
+
+
+def _batches(items: Sequence[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _sources() -> List[str]:
+    """Базы, где могут лежать посты: шарды и основная база."""
+    return list(dict.fromkeys([*get_shards(), DEFAULT_DB_ALIAS]))
+
+
+def sync_reference(batch_size: int = SHARD_MOVE_BATCH_SIZE) -> int:
+    """Копирует на шарды пользователей и группы, которых там нет."""
+    copied = 0
+    for alias in get_shards():
+        if alias == DEFAULT_DB_ALIAS:
+            continue
+        for model in (User, Group):
+            existing = set(
+                model.objects.using(alias).values_list("pk", flat=True)
+            )
+            missing = [
+                instance
+                for instance in model.objects.using(
+                    DEFAULT_DB_ALIAS
+                ).order_by("pk").iterator()
+                if instance.pk not in existing
+            ]
+            model.objects.using(alias).bulk_create(
+                missing, batch_size=batch_size
+            )
+            copied += len(missing)
+
+    return copied
+
+
+def register_keys(batch_size: int = SHARD_MOVE_BATCH_SIZE) -> int:
+    """Добавляет в ShardKey посты, созданные до шардирования, и
+    резервирует занятые id, чтобы новые id были больше.
+    """
+    known = set(ShardKey.objects.using(DEFAULT_DB_ALIAS).values_list(
+        "pk", flat=True
+    ))
+    keys, top = [], 0
+    for alias in _sources():
+        for post_id, author_id in Post.objects.using(alias).values_list(
+            "id", "author_id"
+        ).order_by().iterator():
+            if post_id not in known:
+                keys.append(ShardKey(pk=post_id, author_id=author_id))
+                known.add(post_id)
+        for model in SHARDED_MODELS:
+            top = max(top, model.objects.using(alias).aggregate(
+                top=models.Max("pk")
+            )["top"] or 0)
+    ShardKey.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        keys, batch_size=batch_size
+    )
+    if top and not ShardKey.objects.using(DEFAULT_DB_ALIAS).filter(
+        pk__gte=top
+    ).exists():
+        ShardKey.objects.using(DEFAULT_DB_ALIAS).create(pk=top)
+
+    connection = connections[DEFAULT_DB_ALIAS]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [ShardKey]):
+            cursor.execute(sql)
+
+    return len(keys)
+
+
+_moving = ContextVar("moving_posts", default=False)
+
+
+@contextmanager
+def moving_posts() -> Iterator[None]:
+    """Удаление постов внутри блока - перенос на другой шард: обработчики
+    post_delete (posts.signals) не меняют счётчики.
+    """
+    token = _moving.set(True)
+    try:
+        yield
+    finally:
+        _moving.reset(token)
+
+
+def is_moving() -> bool:
+    """Удаляются ли посты при переносе на другой шард."""
+    return _moving.get()
+
+
+def _move(
+    post_ids: List[int], source: str, target: str, batch_size: int
+) -> int:
+    """Переносит посты с комментариями; возвращает число комментариев.
+
+    Сначала строки копируются (повторный запуск после сбоя пропускает
+    уже скопированные), затем удаляются с прежнего шарда. Перенос не
+    меняет счётчики, поэтому удаление идёт в moving_posts().
+    """
+    posts = list(Post.objects.using(source).filter(pk__in=post_ids))
+    comments = list(
+        Comment.objects.using(source).filter(post_id__in=post_ids)
+    )
+    with transaction.atomic(using=target):
+        Post.objects.using(target).bulk_create(
+            posts, batch_size=batch_size, ignore_conflicts=True
+        )
+        Comment.objects.using(target).bulk_create(
+            comments, batch_size=batch_size, ignore_conflicts=True
+        )
+    with transaction.atomic(using=source):
+        FeedEntry.objects.using(source).filter(post_id__in=post_ids).delete()
+        Comment.objects.using(source).filter(post_id__in=post_ids).delete()
+        with moving_posts():
+            Post.objects.using(source).filter(pk__in=post_ids).delete()
+
+    return len(comments)
+
+
+def rebalance(
+    dry_run: bool = False, batch_size: int = SHARD_MOVE_BATCH_SIZE
+) -> Dict[str, int]:
+    """Переносит посты авторов, чей шард по кольцу изменился."""
+    result = {"posts": 0, "comments": 0, "authors": 0}
+    for source in _sources():
+        author_ids = list(Post.objects.using(source).order_by().values_list(
+            "author_id", flat=True
+        ).distinct())
+        for author_id in author_ids:
+            target = shard_for_author(author_id)
+            if target == source:
+                continue
+            result["authors"] += 1
+            post_ids = list(Post.objects.using(source).filter(
+                author_id=author_id
+            ).values_list("pk", flat=True))
+            result["posts"] += len(post_ids)
+            for batch in _batches(post_ids, batch_size):
+                if dry_run:
+                    result["comments"] += Comment.objects.using(
+                        source
+                    ).filter(post_id__in=batch).count()
+                else:
+                    result["comments"] += _move(
+                        batch, source, target, batch_size
+                    )
+
+    return result
+
+
+class ShardRouter:
+    """Маршрутизатор постов и комментариев по шардам.
+
+    Запись идёт на шард автора. Чтение выбирается по подсказке
+    связанного объекта: посты автора (author.posts) - с его шарда,
+    комментарии поста (post.comments) - с шарда поста. Запросы без
+    подсказки не маршрутизируются: поиск по id идёт через post_lookup(),
+    а ленты - через scatter().
+    """
+
+    def _db_for_instance(self, instance: Any) -> Optional[str]:
+        if isinstance(instance, SHARDED_MODELS):
+            author_id = sharding_author_id(instance)
+            return None if author_id is None else shard_for_author(author_id)
+        if isinstance(instance, User):
+            return shard_for_author(instance.pk)
+
+        return None
+
+    def db_for_read(self, model, instance=None, **hints) -> Optional[str]:
+        if not is_sharded() or not issubclass(model, SHARDED_MODELS):
+            return None
+        if isinstance(instance, Post) and instance._state.db:
+            return instance._state.db
+
+        return self._db_for_instance(instance)
+
+    def db_for_write(self, model, instance=None, **hints) -> Optional[str]:
+        if not is_sharded() or not issubclass(model, SHARDED_MODELS):
+            return None
+
+        return self._db_for_instance(instance)
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        if not is_sharded():
+            return None
+        databases = {DEFAULT_DB_ALIAS, *get_shards()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+
+        return None
@@ -0,0 +1,128 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache import bump_pages_version
+
+from . import counters, feed, sharding, tasks
+from .constants import USER_DISPLAY_FIELDS
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    """Запоминает прежнюю группу редактируемого поста."""
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous_group_id = sharding.author_posts(
+            instance.author_id
+        ).filter(pk=instance.pk).values_list("group_id", flat=True).first()
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def sharded_id(sender, instance, **kwargs):
+    """При шардировании id нового поста или комментария выдаёт
+    основная база, чтобы id не повторялись на разных шардах.
+    """
+    if sharding.is_sharded() and instance.pk is None:
+        instance.pk = sharding.allocate_id(
+            sharding.sharding_author_id(instance)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    """Новый пост попадает в счётчики, разнос по лентам подписчиков
+    и миниатюра ставятся в очередь задач.
+    """
+    if created:
+        counters.post_added(instance)
+        counters.posts_count_changed()
+        # isoformat() без округления до миллисекунд (DjangoJSONEncoder):
+        # дата в ленте должна совпадать с датой поста.
+        tasks.fan_out.enqueue(
+            instance.pk, instance.author_id, instance.pub_date.isoformat()
+        )
+        if instance.image:
+            tasks.make_thumbnail.enqueue(instance.image.name)
+        return
+
+    previous_group_id = getattr(instance, "_previous_group_id", None)
+    if previous_group_id != instance.group_id:
+        counters.post_moved(previous_group_id, instance.group_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Удалённый пост уходит из счётчиков; перенос поста на другой шард
+    (sharding.moving_posts) их не меняет.
+    """
+    if sharding.is_moving():
+        return
+    counters.post_removed(instance)
+    counters.posts_count_changed()
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    """После подписки лента дополняется постами автора (в очереди
+    задач), а автор с числом подписчиков выше порога переходит в режим
+    чтения при показе.
+    """
+    if created:
+        counters.follow_added(instance)
+        feed.mark_pull_authors([instance.author_id])
+        tasks.backfill_follow.enqueue(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """После отписки посты автора убираются из ленты."""
+    counters.follow_removed(instance)
+    feed.prune_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def pages_changed(sender, **kwargs):
+    """Изменение постов и групп сбрасывает кеш страниц. Подписки кеш
+    не сбрасывают: счётчики подписок в профиле - фрагмент
+    пользователя (posts.holes).
+    """
+    bump_pages_version()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, update_fields=None, **kwargs):
+    """Сбрасывает кеш страниц, если изменились выводимые поля
+    пользователя: вход в систему обновляет только last_login.
+    """
+    if update_fields is None or USER_DISPLAY_FIELDS & set(update_fields):
+        bump_pages_version()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+def reference_saved(sender, instance, using, update_fields=None, **kwargs):
+    """Пользователи и группы копируются на шарды постов. Вход в систему
+    (только last_login) не копируется.
+    """
+    if not sharding.is_sharded() or using != DEFAULT_DB_ALIAS:
+        return
+    if (
+        sender is User
+        and update_fields is not None
+        and not USER_DISPLAY_FIELDS & set(update_fields)
+    ):
+        return
+    sharding.replicate(instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+def reference_deleted(sender, instance, using, **kwargs):
+    if sharding.is_sharded() and using == DEFAULT_DB_ALIAS:
+        sharding.replicate_delete(instance)
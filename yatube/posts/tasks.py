@@ -0,0 +1,48 @@
+"""Фоновые задачи постов (core.tasks)."""
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from sorl.thumbnail import get_thumbnail
+
+from core.tasks import task
+
+from . import feed
+from .constants import THUMBNAIL_OPTIONS, THUMBNAIL_SIZE
+from .models import Follow, Post
+
+
+@task(queue="high")
+def fan_out(post_id: int, author_id: int, pub_date: str) -> None:
+    """Разносит новый пост в ленты подписчиков, если пост ещё не
+    удалён.
+    """
+    if not Post.objects.filter(pk=post_id).exists():
+        return
+    feed.fan_out_post(post_id, author_id, parse_datetime(pub_date))
+
+
+@task()
+def backfill_follow(user_id: int, author_id: int) -> None:
+    """Заполняет ленту после подписки. Если до выполнения задачи
+    подписку отменили, prune_follow уже очистил ленту и заполнять её
+    нельзя.
+
+    Подписка блокируется до конца транзакции, поэтому отписка ждёт
+    заполнения и очищает ленту после него. SQLite строки не блокирует:
+    там подписка проверяется ещё раз после вставки, когда транзакция
+    уже держит блокировку записи и видит последние данные.
+    """
+    follow = Follow.objects.filter(user_id=user_id, author_id=author_id)
+    with transaction.atomic():
+        if not follow.select_for_update().exists():
+            return
+        feed.backfill_follow(user_id, author_id)
+        if not follow.exists():
+            feed.prune_follow(user_id, author_id)
+
+
+@task(queue="low")
+def make_thumbnail(image: str) -> None:
+    """Заранее готовит миниатюру карточки поста, чтобы первый показ
+    не нарезал картинку.
+    """
+    get_thumbnail(image, THUMBNAIL_SIZE, **THUMBNAIL_OPTIONS)
@@ -0,0 +1,14 @@
+from typing import List
+
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def article_cards(context: template.Context, page_obj) -> List[str]:
+    """Карточки постов страницы из кеша фрагментов."""
+    return [mark_safe(card) for card in render_cards(context, page_obj)]
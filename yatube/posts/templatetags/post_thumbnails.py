@@ -0,0 +1,31 @@
+import logging
+from typing import Any, Optional
+
+from django import template
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from posts.constants import THUMBNAIL_OPTIONS, THUMBNAIL_SIZE
+
+logger = logging.getLogger("posts.thumbnails")
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image) -> Optional[Any]:
+    """Миниатюра картинки поста с параметрами THUMBNAIL_SIZE и
+    THUMBNAIL_OPTIONS, теми же, что у задачи make_thumbnail: заранее
+    нарезанная миниатюра берётся из кеша sorl.
+
+    Как и тег thumbnail, при ошибке без THUMBNAIL_DEBUG возвращает None.
+    """
+    if not image:
+        return None
+    try:
+        return get_thumbnail(image, THUMBNAIL_SIZE, **THUMBNAIL_OPTIONS)
+    except Exception:
+        if getattr(settings, "THUMBNAIL_DEBUG", False):
+            raise
+        logger.exception("Миниатюра %s не создана", image)
+        return None
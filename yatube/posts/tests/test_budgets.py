@@ -0,0 +1,130 @@
+import time
+from collections import Counter
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import urls
+from ..budgets import BUDGET_DATASET, BUDGETS
+from ..models import Group, Post, User
+
+
+class QueryTimer:
+    """Обёртка выполнения запросов: текст и время каждого запроса."""
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def duplicates(self):
+        """Запросы, выполненные больше одного раза с разными значениями
+        параметров, - признак N+1.
+        """
+        counts = Counter(sql for sql, _ in self.queries)
+        return [
+            f"{count} x {sql}" for sql, count in counts.most_common()
+            if count > 1
+        ]
+
+
+class BudgetsTests(TestCase):
+    """Страницы posts укладываются в бюджеты запросов и времени."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            "seed_scale", workers=1, stdout=StringIO(), **BUDGET_DATASET
+        )
+        cls.post = Post.objects.filter(
+            comments__isnull=False, group__isnull=False
+        ).first()
+        cls.author = cls.post.author
+        reader = User.objects.exclude(id=cls.author.id).first()
+        cls.kwargs = {
+            "post_id": cls.post.id,
+            "username": cls.author.username,
+            "slug": Group.objects.first().slug,
+        }
+
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(reader)
+
+    def _measure(self, name, url):
+        """Запросы к базе, время SQL и время остальной обработки.
+
+        Редактировать пост может только автор, остальные маршруты
+        запрашивает другой пользователь.
+        """
+        client = self.reader_client
+        if name == "post_edit":
+            client = self.author_client
+        cache.clear()
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            client.get(url)
+            total_ms = (time.perf_counter() - started) * 1000
+        sql_ms = sum(elapsed for _, elapsed in timer.queries) * 1000
+
+        return timer, sql_ms, total_ms - sql_ms
+
+    def test_every_route_has_budget(self):
+        """У каждого маршрута posts есть бюджет."""
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names - BUDGETS.keys(), set())
+
+    def _routes(self):
+        """Имя, адрес и бюджет каждого маршрута posts."""
+        for pattern in urls.urlpatterns:
+            url = reverse(
+                f"{urls.app_name}:{pattern.name}",
+                kwargs={
+                    name: self.kwargs[name]
+                    for name in pattern.pattern.converters
+                },
+            )
+            yield pattern.name, url, BUDGETS[pattern.name]
+
+    def test_routes_fit_budgets(self):
+        """Незакешированный запрос каждого маршрута укладывается
+        в бюджет запросов; при превышении выводятся повторяющиеся
+        запросы.
+        """
+        for name, url, budget in self._routes():
+            timer, _, _ = self._measure(name, url)
+            duplicates = "\n".join(timer.duplicates())
+            with self.subTest(url=url):
+                self.assertLessEqual(
+                    len(timer.queries),
+                    budget.queries,
+                    f"Лишние запросы, повторы:\n{duplicates}",
+                )
+
+    @skipUnless(
+        settings.CHECK_TIME_BUDGETS, "бюджеты времени: CHECK_TIME_BUDGETS=1"
+    )
+    def test_routes_fit_time_budgets(self):
+        """Бюджеты времени SQL и обработки. Время зависит от загрузки
+        машины, поэтому проверка включается только по запросу.
+        """
+        for name, url, budget in self._routes():
+            timer, sql_ms, render_ms = self._measure(name, url)
+            duplicates = "\n".join(timer.duplicates())
+            with self.subTest(url=url):
+                self.assertLessEqual(
+                    sql_ms, budget.sql_ms, f"Повторы:\n{duplicates}"
+                )
+                self.assertLessEqual(render_ms, budget.render_ms)
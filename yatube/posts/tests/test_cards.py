@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..cards import get_card_key
+from ..models import Follow, Group, Post, User
+
+
+class CardsCacheTests(TestCase):
+    """Тестирование кеша карточек постов."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            "Author", "author@example.com", "qwerty123"
+        )
+        cls.follower = User.objects.create_user(
+            "Follower", "follower@example.com", "qwerty123"
+        )
+        cls.group = Group.objects.create(
+            title="Тест",
+            description="Тестовое описание"
+        )
+        cls.post = Post.objects.create(
+            text="Тестовый текст", author=cls.author, group=cls.group
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rendered_card_is_cached(self):
+        """Отрисованная карточка сохраняется в кеше."""
+        self.follower_client.get(reverse("posts:follow_index"))
+        card = cache.get(get_card_key(self.post, False))
+        self.assertIn("Тестовый текст", card)
+
+    def test_warm_card_is_served_from_cache(self):
+        """Тёплая карточка берётся из кеша, а не рендерится заново."""
+        cache.set(get_card_key(self.post, False), "<p>из кеша</p>")
+        response = self.follower_client.get(reverse("posts:follow_index"))
+        self.assertContains(response, "из кеша")
+        self.assertNotContains(response, "Тестовый текст")
+
+    def test_card_key_follows_displayed_data(self):
+        """Ключ карточки меняется вместе с выводимыми данными."""
+        post = Post.objects.select_related("author", "group").get(
+            pk=self.post.pk
+        )
+        key = get_card_key(post, False)
+        self.assertNotEqual(key, get_card_key(post, True))
+        post.author.first_name = "Лев"
+        first_name_key = get_card_key(post, False)
+        self.assertNotEqual(key, first_name_key)
+        post.group.slug = "new-slug"
+        self.assertNotEqual(first_name_key, get_card_key(post, False))
@@ -0,0 +1,73 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..constants import CURSOR_PARAM
+from ..models import Comment, Post, User
+
+COMMENTS_COUNT = 5
+
+
+@override_settings(COMMENTS_FIRST_PAGE=2, COMMENTS_PAGE_SIZE=2)
+class CommentsPaginationTests(TestCase):
+    """Тестирование постраничного вывода комментариев."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            "Author", "author@example.com", "qwerty123"
+        )
+        cls.post = Post.objects.create(
+            text="Тестовый текст", author=cls.author
+        )
+        for i in range(COMMENTS_COUNT):
+            commentator = User.objects.create_user(
+                f"user{i}", f"user{i}@example.com", "qwerty123"
+            )
+            Comment.objects.create(
+                post=cls.post, author=commentator, text=f"Комментарий {i}"
+            )
+        cls.comments = list(cls.post.comments.all())
+
+    def test_post_detail_shows_first_page(self):
+        """На странице поста только первая страница комментариев."""
+        response = self.client.get(
+            reverse("posts:post_detail", args=[self.post.id])
+        )
+        page = response.context["comments"]
+        self.assertEqual(list(page), self.comments[:2])
+        self.assertIsNotNone(page.next_cursor)
+        self.assertContains(response, "Показать ещё комментарии")
+
+    def test_fragment_loads_next_pages(self):
+        """Фрагмент отдаёт следующие страницы до последней."""
+        url = reverse("posts:post_comments", args=[self.post.id])
+        cursor = self.client.get(
+            reverse("posts:post_detail", args=[self.post.id])
+        ).context["comments"].next_cursor
+        loaded = []
+        while cursor:
+            response = self.client.get(url, {CURSOR_PARAM: cursor})
+            page = response.context["comments"]
+            loaded.extend(page)
+            cursor = page.next_cursor
+        self.assertEqual(loaded, self.comments[2:])
+
+    def test_fragment_queries_do_not_depend_on_authors(self):
+        """Авторы комментариев загружаются в том же запросе."""
+        url = reverse("posts:post_comments", args=[self.post.id])
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    def test_json_format(self):
+        """С format=json фрагмент отдаётся в JSON."""
+        response = self.client.get(
+            reverse("posts:post_comments", args=[self.post.id]),
+            {"format": "json"},
+        )
+        data = response.json()
+        self.assertEqual(
+            [comment["id"] for comment in data["comments"]],
+            [comment.id for comment in self.comments[:2]],
+        )
+        self.assertEqual(data["comments"][0]["author"], "user4")
+        self.assertIsNotNone(data["next_cursor"])
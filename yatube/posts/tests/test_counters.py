@@ -0,0 +1,158 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.cache import get_pages_version
+
+from ..constants import ALL_COUNT_OF_POSTS
+from ..counters import count_all_posts, count_feed_posts
+from ..models import Follow, Group, GroupCounter, Post, User, UserCounter
+
+
+class CountersTests(TestCase):
+    """Тестирование денормализованных счётчиков."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            "Author", "author@example.com", "qwerty123"
+        )
+        cls.follower = User.objects.create_user(
+            "Follower", "follower@example.com", "qwerty123"
+        )
+        cls.group = Group.objects.create(
+            title="Тест",
+            description="Тестовое описание"
+        )
+        cls.another_group = Group.objects.create(
+            title="Другой тест",
+            description="Другое тестовое описание"
+        )
+
+        cls.auth_client = Client()
+        cls.auth_client.force_login(cls.author)
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def setUp(self):
+        cache.clear()
+
+    def _counts(self, user):
+        counter = UserCounter.objects.get(user=user)
+        return (
+            counter.posts_count,
+            counter.followers_count,
+            counter.following_count,
+        )
+
+    def test_post_create_and_delete_update_counters(self):
+        """Создание и удаление поста меняют счётчики автора и группы."""
+        self.auth_client.post(
+            reverse("posts:post_create"),
+            data={"text": "Тестовый текст", "group": self.group.id},
+        )
+        self.assertEqual(self._counts(self.author), (1, 0, 0))
+        self.assertEqual(
+            GroupCounter.objects.get(group=self.group).posts_count, 1
+        )
+        Post.objects.get(author=self.author).delete()
+        self.assertEqual(self._counts(self.author), (0, 0, 0))
+        self.assertEqual(
+            GroupCounter.objects.get(group=self.group).posts_count, 0
+        )
+
+    def test_post_edit_moves_group_counter(self):
+        """Перенос поста в другую группу переносит счётчик."""
+        post = Post.objects.create(
+            text="Тестовый текст", author=self.author, group=self.group
+        )
+        self.auth_client.post(
+            reverse("posts:post_edit", args=[post.id]),
+            data={"text": "Другой текст", "group": self.another_group.id},
+        )
+        self.assertEqual(
+            GroupCounter.objects.get(group=self.group).posts_count, 0
+        )
+        self.assertEqual(
+            GroupCounter.objects.get(group=self.another_group).posts_count, 1
+        )
+
+    def test_follow_updates_counters(self):
+        """Подписка и отписка меняют счётчики обоих пользователей."""
+        self.follower_client.get(
+            reverse("posts:profile_follow", args=[self.author])
+        )
+        self.assertEqual(self._counts(self.author), (0, 1, 0))
+        self.assertEqual(self._counts(self.follower), (0, 0, 1))
+        self.follower_client.get(
+            reverse("posts:profile_unfollow", args=[self.author])
+        )
+        self.assertEqual(self._counts(self.author), (0, 0, 0))
+        self.assertEqual(self._counts(self.follower), (0, 0, 0))
+
+    def test_profile_shows_counters(self):
+        """Профиль выводит счётчики без подсчёта строк."""
+        Post.objects.create(text="Тестовый текст", author=self.author)
+        response = self.client.get(
+            reverse("posts:profile", args=[self.author])
+        )
+        self.assertEqual(response.context["counter"].posts_count, 1)
+        self.assertContains(response, "Всего постов: 1")
+
+    def test_follow_keeps_pages_cache(self):
+        """Подписка не сбрасывает кеш страниц, а счётчики подписок
+        в закешированном профиле свежие.
+        """
+        profile = reverse("posts:profile", args=[self.author])
+        self.assertContains(self.client.get(profile), "Всего подписчиков: 0")
+        version = get_pages_version()
+        self.follower_client.get(
+            reverse("posts:profile_follow", args=[self.author])
+        )
+        self.assertEqual(get_pages_version(), version)
+        response = self.client.get(profile)
+        self.assertContains(response, "Всего подписчиков: 1")
+        self.assertContains(response, "Всего подписок: 0")
+
+    def test_reconcile_fixes_drift(self):
+        """Команда пересчёта исправляет расхождения и сообщает о них."""
+        Post.objects.bulk_create(
+            Post(
+                text=f"text{i}",
+                author=self.author,
+                group=self.group,
+            ) for i in range(ALL_COUNT_OF_POSTS)
+        )
+        out = StringIO()
+        call_command("reconcile_counters", chunk_size=1, stdout=out)
+        self.assertEqual(
+            self._counts(self.author), (ALL_COUNT_OF_POSTS, 0, 0)
+        )
+        self.assertEqual(
+            GroupCounter.objects.get(group=self.group).posts_count,
+            ALL_COUNT_OF_POSTS,
+        )
+        self.assertEqual(
+            out.getvalue().count("проверено 2, исправлено расхождений 1"), 2
+        )
+
+    def test_count_all_posts_cached_until_change(self):
+        """Число постов кешируется и сбрасывается при создании поста."""
+        Post.objects.create(text="Тестовый текст", author=self.author)
+        self.assertEqual(count_all_posts(), 1)
+        Post.objects.all().update(text="Другой текст")
+        with self.assertNumQueries(1):
+            self.assertEqual(count_all_posts(), 1)
+        Post.objects.create(text="Тестовый текст", author=self.author)
+        self.assertEqual(count_all_posts(), 2)
+
+    def test_count_feed_posts(self):
+        """Число постов ленты складывается из счётчиков авторов."""
+        Post.objects.create(text="Тестовый текст", author=self.author)
+        Post.objects.create(text="Тестовый текст", author=self.follower)
+        self.assertEqual(count_feed_posts(self.follower), 0)
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(count_feed_posts(self.follower), 1)
@@ -0,0 +1,196 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import feed
+from ..constants import ALL_COUNT_OF_POSTS, FIRST_PAGE_POSTS, NEXT_PAGE_POSTS
+from ..models import FeedEntry, Follow, Post, User
+
+
+class FeedTests(TestCase):
+    """Тестирование ленты подписок."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            "Author", "author@example.com", "qwerty123"
+        )
+        cls.follower = User.objects.create_user(
+            "Follower", "follower@example.com", "qwerty123"
+        )
+        Post.objects.bulk_create(
+            Post(
+                text=f"text{i}",
+                author=cls.author,
+            ) for i in range(ALL_COUNT_OF_POSTS)
+        )
+
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def setUp(self):
+        cache.clear()
+
+    def _follow(self):
+        self.follower_client.get(
+            reverse("posts:profile_follow", args=[FeedTests.author])
+        )
+
+    def test_follow_backfills_feed(self):
+        """Подписка переносит в ленту все посты автора."""
+        self._follow()
+        self.assertEqual(
+            FeedEntry.objects.filter(user=FeedTests.follower).count(),
+            ALL_COUNT_OF_POSTS,
+        )
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост автора попадает в ленту подписчика."""
+        self._follow()
+        post = Post.objects.create(text="Новый пост", author=FeedTests.author)
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=FeedTests.follower, post=post, pub_date=post.pub_date
+            ).exists()
+        )
+
+    def test_unfollow_prunes_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        self._follow()
+        self.follower_client.get(
+            reverse("posts:profile_unfollow", args=[FeedTests.author])
+        )
+        self.assertFalse(
+            FeedEntry.objects.filter(user=FeedTests.follower).exists()
+        )
+        self.assertFalse(Follow.objects.exists())
+
+    def test_feed_pages_follow_post_order(self):
+        """Страницы ленты идут в порядке публикации постов."""
+        self._follow()
+        url = reverse("posts:follow_index")
+        first_page = self.follower_client.get(url).context["page_obj"]
+        next_page = self.follower_client.get(
+            url, {"cursor": first_page.next_cursor}
+        ).context["page_obj"]
+        self.assertEqual(len(first_page), FIRST_PAGE_POSTS)
+        self.assertEqual(len(next_page), NEXT_PAGE_POSTS)
+        self.assertEqual(
+            [*first_page, *next_page],
+            list(Post.objects.filter(author=FeedTests.author)),
+        )
+
+
+class HybridFeedTests(TestCase):
+    """Тестирование ленты с популярными авторами, посты которых
+    читаются при показе ленты.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.star = User.objects.create_user(
+            "Star", "star@example.com", "qwerty123"
+        )
+        cls.author = User.objects.create_user(
+            "Author", "author@example.com", "qwerty123"
+        )
+        cls.follower = User.objects.create_user(
+            "Follower", "follower@example.com", "qwerty123"
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        Follow.objects.create(user=cls.follower, author=cls.star)
+        Follow.objects.create(user=cls.author, author=cls.star)
+
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("posts.feed.FEED_FANOUT_THRESHOLD", 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        feed.mark_pull_authors()
+
+    def test_star_posts_are_not_fanned_out(self):
+        """Посты автора выше порога не разносятся по лентам."""
+        post = Post.objects.create(text="Звёздный пост", author=self.star)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Лента сливает разнесённые посты и посты популярного автора
+        в порядке публикации.
+        """
+        for i in range(ALL_COUNT_OF_POSTS):
+            Post.objects.create(
+                text=f"text{i}",
+                author=self.star if i % 2 else self.author,
+            )
+        url = reverse("posts:follow_index")
+        first_page = self.follower_client.get(url).context["page_obj"]
+        next_page = self.follower_client.get(
+            url, {"cursor": first_page.next_cursor}
+        ).context["page_obj"]
+        self.assertEqual(
+            [*first_page, *next_page],
+            list(Post.objects.all()),
+        )
+        previous_page = self.follower_client.get(
+            url, {"cursor": next_page.previous_cursor}
+        ).context["page_obj"]
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_pull_author_stays_pull(self):
+        """Автор, перешедший в режим чтения при показе, остаётся в нём,
+        и его посты не пропадают из ленты, когда подписчиков становится
+        меньше порога.
+        """
+        post = Post.objects.create(text="Звёздный пост", author=self.star)
+        url = reverse("posts:follow_index")
+        with mock.patch("posts.feed.FEED_FANOUT_THRESHOLD", 10000):
+            cache.clear()
+            for params in ({}, {"page": 1}):
+                with self.subTest(params=params):
+                    page = self.follower_client.get(
+                        url, params
+                    ).context["page_obj"]
+                    self.assertIn(post, list(page))
+
+    def test_no_duplicates_after_switch_to_pull(self):
+        """Посты, разнесённые до перехода автора в режим чтения при
+        показе, не повторяются в ленте.
+        """
+        post = Post.objects.create(text="Пост", author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(post=post).exists())
+        with mock.patch("posts.feed.FEED_FANOUT_THRESHOLD", 0):
+            feed.mark_pull_authors([self.author.pk])
+        page = self.follower_client.get(
+            reverse("posts:follow_index")
+        ).context["page_obj"]
+        self.assertEqual([item for item in page if item == post], [post])
+
+    def test_follow_switches_author_to_pull(self):
+        """Подписка, после которой подписчиков больше порога, сразу
+        переводит автора в режим чтения при показе, а показ ленты
+        ничего не пишет.
+        """
+        reader = User.objects.create_user("Reader")
+        self.assertNotIn(self.author.pk, feed.get_pull_author_ids())
+        Follow.objects.create(user=reader, author=self.author)
+        self.assertIn(self.author.pk, feed.get_pull_author_ids())
+        post = Post.objects.create(text="Пост", author=self.author)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            page = self.follower_client.get(
+                reverse("posts:follow_index")
+            ).context["page_obj"]
+        self.assertIn(post, list(page))
+        self.assertFalse([
+            query for query in queries
+            if query["sql"].startswith(("UPDATE", "INSERT", "DELETE"))
+        ])
@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..constants import ALL_COUNT_OF_POSTS, NEXT_PAGE_POSTS, PAGE_PARAM
+from ..models import Follow, Group, Post, User
+
+
+class ListQueriesTests(TestCase):
+    """Число запросов страниц со списками постов не зависит
+    от числа постов и их авторов.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(
+            "Follower", "follower@example.com", "qwerty123"
+        )
+        cls.author = User.objects.create_user(
+            "Author", "author@example.com", "qwerty123"
+        )
+        cls.group = Group.objects.create(
+            title="Тест",
+            slug="slug",
+            description="Тестовое описание",
+        )
+
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def _create_posts(self, count):
+        """Посты в группе: половина у одного автора, остальные -
+        у отдельных авторов, на всех из них подписан пользователь.
+        """
+        for i in range(Post.objects.count(), Post.objects.count() + count):
+            author = self.author
+            if i % 2:
+                author = User.objects.create_user(
+                    f"user{i}", f"user{i}@example.com", "qwerty123"
+                )
+                Follow.objects.get_or_create(
+                    user=self.follower, author=author
+                )
+            Post.objects.create(
+                text=f"text{i}", author=author, group=self.group
+            )
+        Follow.objects.get_or_create(user=self.follower, author=self.author)
+
+    def _count_queries(self):
+        """Число запросов каждой страницы со списком постов."""
+        urls = (
+            reverse("posts:index"),
+            reverse("posts:group_list", args=[self.group.slug]),
+            reverse("posts:profile", args=[self.author]),
+            reverse("posts:follow_index"),
+        )
+        counts = {}
+        for url in (*urls, *(f"{url}?{PAGE_PARAM}=1" for url in urls)):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = self.follower_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts[url] = len(context.captured_queries)
+
+        return counts
+
+    def test_query_count_does_not_depend_on_posts(self):
+        """Страница с несколькими постами и полная страница делают
+        одинаковое число запросов.
+        """
+        self._create_posts(NEXT_PAGE_POSTS)
+        few = self._count_queries()
+        self._create_posts(ALL_COUNT_OF_POSTS)
+        many = self._count_queries()
+        for url, count in many.items():
+            with self.subTest(url=url):
+                self.assertEqual(count, few[url])
@@ -0,0 +1,88 @@
+import re
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..constants import ALL_COUNT_OF_POSTS, CURSOR_PARAM, PAGE_PARAM
+from ..models import Comment, Follow, Group, Post, User
+
+FULL_SCAN = re.compile(r"\bSCAN (TABLE )?\w+(?! USING)( AS \w+)?$")
+TEMP_B_TREE = "USE TEMP B-TREE"
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN SQLite")
+class QueryPlanTests(TestCase):
+    """Запросы страниц читаются по индексам: без полного просмотра
+    таблиц и сортировки во временном B-дереве.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            "Author", "author@example.com", "qwerty123"
+        )
+        cls.follower = User.objects.create_user(
+            "Follower", "follower@example.com", "qwerty123"
+        )
+        cls.group = Group.objects.create(
+            title="Тест",
+            slug="slug",
+            description="Тестовое описание",
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        for i in range(ALL_COUNT_OF_POSTS):
+            Post.objects.create(
+                text=f"text{i}", author=cls.author, group=cls.group
+            )
+        cls.post = Post.objects.first()
+        Comment.objects.create(
+            post=cls.post, author=cls.follower, text="Комментарий"
+        )
+
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.follower)
+
+    def setUp(self):
+        cache.clear()
+
+    def _explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    def _assert_plans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.follower_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT") or "sqlite_" in sql:
+                continue
+            for step in self._explain(sql):
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertNotRegex(step, FULL_SCAN)
+                    self.assertNotIn(TEMP_B_TREE, step)
+
+        return response
+
+    def test_views_use_indexes(self):
+        """Страницы со списками и пост читаются по индексам."""
+        urls = (
+            reverse("posts:index"),
+            reverse("posts:group_list", args=[self.group.slug]),
+            reverse("posts:profile", args=[self.author]),
+            reverse("posts:follow_index"),
+            reverse("posts:post_detail", args=[self.post.id]),
+        )
+        for url in urls:
+            response = self._assert_plans(url)
+            self._assert_plans(f"{url}?{PAGE_PARAM}=2")
+            page_obj = response.context.get("page_obj")
+            if page_obj is not None and page_obj.next_cursor:
+                self._assert_plans(
+                    f"{url}?{CURSOR_PARAM}={page_obj.next_cursor}"
+                )
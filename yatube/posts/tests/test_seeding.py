@@ -0,0 +1,61 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, FeedEntry, Follow, Group, Post, User
+
+SEED_OPTIONS = {
+    "users": 30,
+    "groups": 3,
+    "posts": 120,
+    "follows": 4,
+    "comments": 60,
+    "seed": 7,
+    "batch_size": 25,
+    "workers": 1,
+}
+
+
+class SeedScaleTests(TestCase):
+    """Тестирование генератора синтетических данных."""
+    def _seed(self):
+        call_command("seed_scale", stdout=StringIO(), **SEED_OPTIONS)
+
+    def _snapshot(self):
+        return (
+            list(User.objects.order_by("username").values_list(
+                "username", "first_name", "last_name"
+            )),
+            list(Post.objects.order_by("pub_date").values_list(
+                "text", "pub_date", "author__username", "group__slug"
+            )),
+            sorted(Follow.objects.values_list(
+                "user__username", "author__username"
+            )),
+        )
+
+    def test_creates_requested_volume(self):
+        """Создаётся заданный объём данных, ленты и счётчики заполнены."""
+        self._seed()
+        self.assertEqual(User.objects.count(), SEED_OPTIONS["users"])
+        self.assertEqual(Group.objects.count(), SEED_OPTIONS["groups"])
+        self.assertEqual(Post.objects.count(), SEED_OPTIONS["posts"])
+        self.assertEqual(Comment.objects.count(), SEED_OPTIONS["comments"])
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            FeedEntry.objects.count(),
+            Post.objects.filter(author__following__isnull=False).count(),
+        )
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertEqual(out.getvalue().count("исправлено расхождений 0"), 2)
+
+    def test_same_seed_gives_same_data(self):
+        """Повторный запуск с тем же зерном даёт те же данные."""
+        self._seed()
+        snapshot = self._snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self._seed()
+        self.assertEqual(self._snapshot(), snapshot)
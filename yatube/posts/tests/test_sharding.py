@@ -0,0 +1,164 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, ShardKey, User, UserCounter
+from ..sharding import HashRing, shard_for_author
+
+SHARDS = ["default", "shard"]
+
+
+class HashRingTests(TestCase):
+    """Тестирование кольца согласованного хеширования."""
+    def test_adding_shard_moves_keys_only_to_it(self):
+        """Новый шард забирает часть ключей, остальные не двигаются."""
+        before = HashRing(["a", "b", "c"])
+        after = HashRing(["a", "b", "c", "d"])
+        moved = 0
+        for key in range(3000):
+            old, new = before.get(key), after.get(key)
+            if old != new:
+                moved += 1
+                self.assertEqual(new, "d")
+        self.assertGreater(moved, 3000 * 0.15)
+        self.assertLess(moved, 3000 * 0.35)
+
+    def test_keys_spread_over_shards(self):
+        ring = HashRing(SHARDS)
+        shards = [ring.get(key) for key in range(1000)]
+        for shard in SHARDS:
+            self.assertGreater(shards.count(shard), 300)
+
+
+class ShardingTests(TransactionTestCase):
+    """Тестирование шардирования постов на двух базах SQLite."""
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        connections.databases["shard"] = {
+            **connections.databases["default"],
+            "NAME": os.path.join(directory.name, "shard.sqlite3"),
+        }
+        self.addCleanup(self._drop_shard)
+        with override_settings(POST_SHARDS=SHARDS):
+            call_command("migrate", database="shard", verbosity=0)
+            self.group = Group.objects.create(title="Группа", slug="group")
+
+    def _drop_shard(self):
+        connections["shard"].close()
+        del connections._connections.shard
+        del connections.databases["shard"]
+
+    def _authors(self):
+        """Пользователи, чьи посты лежат на каждом из шардов."""
+        authors = {}
+        for number in range(50):
+            user = User.objects.create_user(f"author_{number}")
+            with override_settings(POST_SHARDS=SHARDS):
+                authors.setdefault(shard_for_author(user.pk), user)
+            if len(authors) == len(SHARDS):
+                return authors[SHARDS[0]], authors[SHARDS[1]]
+
+    def _publish(self, author, text):
+        self.client.force_login(author)
+        self.client.post(
+            reverse("posts:post_create"),
+            {"text": text, "group": self.group.pk},
+        )
+
+        return Post.objects.using(shard_for_author(author.pk)).get(text=text)
+
+    def test_posts_and_comments_on_author_shard(self):
+        """Посты и комментарии лежат на шарде автора и видны на всех
+        страницах.
+        """
+        with override_settings(POST_SHARDS=SHARDS):
+            local, remote = self._authors()
+            first = self._publish(local, "Пост с основной базы")
+            second = self._publish(remote, "Пост с шарда")
+            self.assertFalse(Post.objects.filter(pk=second.pk).exists())
+            self.assertNotEqual(first.pk, second.pk)
+            self.assertEqual(
+                User.objects.using("shard").get(pk=remote.pk).username,
+                remote.username,
+            )
+
+            self.client.post(
+                reverse("posts:add_comment", args=[second.pk]),
+                {"text": "Комментарий"},
+            )
+            self.assertTrue(Comment.objects.using("shard").filter(
+                post=second, text="Комментарий"
+            ).exists())
+
+            index = self.client.get(reverse("posts:index"))
+            self.assertEqual(
+                [post.pk for post in index.context["page_obj"]],
+                [second.pk, first.pk],
+            )
+            page = self.client.get(reverse("posts:index"), {"page": 1})
+            self.assertEqual(page.context["page_obj"].paginator.count, 2)
+            for url in (
+                reverse("posts:group_list", args=[self.group.slug]),
+                reverse("posts:profile", args=[remote.username]),
+            ):
+                self.assertContains(self.client.get(url), "Пост с шарда")
+            detail = self.client.get(
+                reverse("posts:post_detail", args=[second.pk])
+            )
+            self.assertEqual(detail.context["post"], second)
+            self.assertContains(detail, "Комментарий")
+
+            self.client.force_login(local)
+            self.client.get(
+                reverse("posts:profile_follow", args=[remote.username])
+            )
+            feed = self.client.get(reverse("posts:follow_index"))
+            self.assertEqual(
+                [post.pk for post in feed.context["page_obj"]], [second.pk]
+            )
+
+    def test_rebalance_moves_existing_posts(self):
+        """После включения шардирования посты переносятся на шард
+        автора, счётчики не меняются, новые id не повторяют старые.
+        """
+        local, remote = self._authors()
+        posts = [
+            Post.objects.create(text=f"Пост {number}", author=author)
+            for number, author in enumerate((local, remote, remote))
+        ]
+        Comment.objects.create(post=posts[1], author=local, text="Текст")
+
+        with override_settings(POST_SHARDS=SHARDS):
+            call_command("rebalance_shards", stdout=StringIO())
+            self.assertEqual(
+                set(Post.objects.using("shard").values_list(
+                    "pk", flat=True
+                )),
+                {posts[1].pk, posts[2].pk},
+            )
+            self.assertEqual(
+                list(Post.objects.values_list("pk", flat=True)),
+                [posts[0].pk],
+            )
+            self.assertEqual(Comment.objects.using("shard").count(), 1)
+            self.assertEqual(
+                UserCounter.objects.get(pk=remote.pk).posts_count, 2
+            )
+            self.assertEqual(
+                ShardKey.objects.get(pk=posts[2].pk).author_id, remote.pk
+            )
+            response = self.client.get(
+                reverse("posts:post_detail", args=[posts[1].pk])
+            )
+            self.assertContains(response, "Текст")
+
+            new = self._publish(remote, "Новый пост")
+            self.assertGreater(new.pk, max(post.pk for post in posts))
@@ -0,0 +1,65 @@
+from django.core.paginator import Paginator
+from django.test import SimpleTestCase
+
+from ..constants import PAGINATOR_WINDOW
+from ..utils import CountedPaginator, get_page_window
+
+
+class PageWindowTests(SimpleTestCase):
+    """Тестирование окна навигации по страницам."""
+    def setUp(self):
+        self.paginator = Paginator(range(1000), 10)
+
+    def test_window_in_the_middle(self):
+        """Окно вокруг текущей страницы с первой и последней."""
+        window = get_page_window(self.paginator.page(50))
+        self.assertEqual(
+            window,
+            [
+                1,
+                None,
+                *range(50 - PAGINATOR_WINDOW, 50 + PAGINATOR_WINDOW + 1),
+                None,
+                100,
+            ],
+        )
+
+    def test_window_at_the_edges(self):
+        """У краёв пропуск не выводится."""
+        self.assertEqual(
+            get_page_window(self.paginator.page(1)),
+            [*range(1, PAGINATOR_WINDOW + 2), None, 100],
+        )
+        self.assertEqual(
+            get_page_window(self.paginator.page(100)),
+            [1, None, *range(100 - PAGINATOR_WINDOW, 101)],
+        )
+
+    def test_window_of_few_pages(self):
+        """Для нескольких страниц выводятся все номера."""
+        paginator = Paginator(range(30), 10)
+        self.assertEqual(get_page_window(paginator.page(2)), [1, 2, 3])
+
+
+class CountedPaginatorTests(SimpleTestCase):
+    """Тестирование пагинатора с внешним счётчиком."""
+    def test_count_from_provider(self):
+        """Число записей берётся у поставщика."""
+        paginator = CountedPaginator(range(100), 10, lambda: 55)
+        self.assertEqual(paginator.count, 55)
+        self.assertEqual(paginator.num_pages, 6)
+
+    def test_stale_count_does_not_hide_pages(self):
+        """Отставший счётчик не прячет последние записи."""
+        paginator = CountedPaginator(range(25), 10, lambda: 5)
+        page = paginator.get_page(3)
+        self.assertEqual(list(page), [20, 21, 22, 23, 24])
+        self.assertEqual(paginator.count, 25)
+        self.assertFalse(page.has_next())
+
+    def test_overstated_count_falls_back(self):
+        """Завышенный счётчик не приводит к пустой странице."""
+        paginator = CountedPaginator(range(15), 10, lambda: 100)
+        page = paginator.get_page(5)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(list(page), list(range(10, 15)))
@@ -1,5 +1,7 @@
+import base64
 import shutil
 import tempfile
+from http import HTTPStatus
 
 from django import forms
 from django.conf import settings
@@ -7,8 +9,11 @@ from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
 
-from ..constants import ALL_COUNT_OF_POSTS, FIRST_PAGE_POSTS, NEXT_PAGE_POSTS
+from .. import tasks
+from ..constants import (ALL_COUNT_OF_POSTS, FIRST_PAGE_POSTS,
+                         NEXT_PAGE_POSTS, THUMBNAIL_OPTIONS, THUMBNAIL_SIZE)
 from ..models import HEADER_LENGTH, Comment, Follow, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -244,8 +249,9 @@ class PostsPagesTests(TestCase):
                 "posts:post_detail", args=[PostsPagesTests.post.pk]
             )
         )
-        comment_object = response.context["comments"].get(
-            pk=PostsPagesTests.comment.pk
+        comment_object = next(
+            comment for comment in response.context["comments"]
+            if comment.pk == PostsPagesTests.comment.pk
         )
         self._assert_post_has_attrs(response.context["post"])
         self.assertEqual(
@@ -302,23 +308,72 @@ class PostsPagesTests(TestCase):
         self._assert_post_has_attrs(response.context["post"])
         self.assert_post_response(response)
 
+    def test_pages_use_prepared_thumbnail(self):
+        """Страницы выводят ту же миниатюру, что готовит задача
+        make_thumbnail.
+        """
+        image = PostsPagesTests.post.image.name
+        tasks.make_thumbnail(image)
+        thumbnail = get_thumbnail(image, THUMBNAIL_SIZE, **THUMBNAIL_OPTIONS)
+        for url in (
+            reverse("posts:index"),
+            reverse("posts:post_detail", args=[PostsPagesTests.post.pk]),
+        ):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), thumbnail.url)
+
     def test_index_cache(self):
-        """Проверяем кеширование страницы index."""
+        """Проверяем кеширование страницы index и его сброс
+        при создании поста.
+        """
         cache_data = {
             "text": "Проверка кэша",
         }
+        PostsPagesTests.auth_client.get(reverse("posts:index"))
+        Post.objects.filter(pk=PostsPagesTests.post.pk).update(
+            text=cache_data["text"]
+        )
         response = PostsPagesTests.auth_client.get(reverse("posts:index"))
+        self.assertNotContains(response, cache_data["text"])
         PostsPagesTests.auth_client.post(
             reverse("posts:post_create"),
-            data=cache_data,
+            data={"text": "Новый пост"},
             follow=True
         )
         response = PostsPagesTests.auth_client.get(reverse("posts:index"))
-        self.assertNotContains(response, cache_data["text"])
-        cache.clear()
-        response = PostsPagesTests.auth_client.get(reverse("posts:index"))
+        self.assertContains(response, "Новый пост")
         self.assertContains(response, cache_data["text"])
 
+    def test_cached_pages_shared_between_users(self):
+        """Закешированная страница общая для всех пользователей,
+        а меню каждый видит своё.
+        """
+        url = reverse("posts:index")
+        PostsPagesTests.auth_client.get(url)
+        response = PostsPagesTests.auth_follower_client.get(url)
+        self.assertTemplateNotUsed(response, "posts/index.html")
+        self.assertContains(response, "Пользователь: Follower")
+        self.assertNotContains(response, "Пользователь: Author")
+        response = self.client.get(url)
+        self.assertTemplateNotUsed(response, "posts/index.html")
+        self.assertContains(response, "Регистрация")
+        self.assertNotContains(response, "Избранные авторы")
+
+    def test_cached_profile_follow_button(self):
+        """Кнопка подписки в закешированном профиле своя у каждого."""
+        Follow.objects.create(
+            user=PostsPagesTests.follower, author=PostsPagesTests.author
+        )
+        url = reverse("posts:profile", args=[PostsPagesTests.author])
+        response = PostsPagesTests.auth_client.get(url)
+        self.assertNotContains(response, "Подписаться")
+        self.assertNotContains(response, "Отписаться")
+        response = PostsPagesTests.auth_follower_client.get(url)
+        self.assertTemplateNotUsed(response, "posts/profile.html")
+        self.assertContains(response, "Отписаться")
+        response = PostsPagesTests.auth_another_client.get(url)
+        self.assertContains(response, "Подписаться")
+
     def test_follow(self):
         """Проверяем возможность подписки на автора."""
         self.assertFalse(
@@ -482,3 +537,50 @@ class PaginatorsTest(TestCase):
     def test_second_page_contains_three_records(self):
         """Тестируем работу пагинатора на второй странице."""
         self._test_pagination("?page=2", NEXT_PAGE_POSTS)
+
+    def test_cursor_pages_cover_all_records(self):
+        """Курсорная пагинация проходит все записи вперёд и назад."""
+        for reverse_name, args in PaginatorsTest.url_names:
+            with self.subTest(reverse_name=reverse_name, args=args):
+                url = reverse(f"posts:{reverse_name}", args=args)
+                first_page = self.client.get(url).context["page_obj"]
+                self.assertIsNone(first_page.previous_cursor)
+                next_page = self.client.get(
+                    url, {"cursor": first_page.next_cursor}
+                ).context["page_obj"]
+                self.assertEqual(len(next_page), NEXT_PAGE_POSTS)
+                self.assertIsNone(next_page.next_cursor)
+                self.assertEqual(
+                    [*first_page, *next_page],
+                    list(Post.objects.all()),
+                )
+                previous_page = self.client.get(
+                    url, {"cursor": next_page.previous_cursor}
+                ).context["page_obj"]
+                self.assertEqual(list(previous_page), list(first_page))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Повреждённый токен курсора возвращает первую страницу."""
+        for reverse_name, args in PaginatorsTest.url_names:
+            with self.subTest(reverse_name=reverse_name, args=args):
+                response = self.client.get(
+                    reverse(f"posts:{reverse_name}", args=args),
+                    {"cursor": "не-токен"},
+                )
+                self.assertEqual(
+                    len(response.context["page_obj"]), FIRST_PAGE_POSTS
+                )
+
+    def test_cursor_with_nulls_returns_first_page(self):
+        """Токен с пустыми значениями полей возвращает первую страницу."""
+        token = base64.urlsafe_b64encode(b"[1, [null, null]]").decode()
+        for reverse_name, args in PaginatorsTest.url_names:
+            with self.subTest(reverse_name=reverse_name, args=args):
+                response = self.client.get(
+                    reverse(f"posts:{reverse_name}", args=args),
+                    {"cursor": token},
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(
+                    len(response.context["page_obj"]), FIRST_PAGE_POSTS
+                )
@@ -20,6 +20,11 @@ urlpatterns = [
         views.post_detail,
         name="post_detail",
     ),
+    path(
+        "posts/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments",
+    ),
     path(
         "group/<slug:slug>/",
         views.group_posts,
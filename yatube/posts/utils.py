@@ -1,18 +1,333 @@
-from typing import Any, Dict, Type
+import base64
+import heapq
+import json
+from datetime import datetime
+from typing import (Any, Callable, Dict, List, Optional, Sequence, Tuple,
+                    Type)
 
-from django.core.paginator import Paginator
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import (EmptyPage, Page, PageNotAnInteger,
+                                   Paginator)
+from django.db.models import Field, Q
 from django.db.models.query import QuerySet
 from django.http import HttpRequest
+from django.utils.functional import cached_property
 
-from .constants import COUNT_OF_POSTS
+from .constants import (COMMENTS_FIRST_PAGE, COMMENTS_PAGE_SIZE,
+                        COUNT_OF_POSTS, CURSOR_PARAM, PAGE_PARAM,
+                        PAGINATOR_WINDOW)
+from .models import Post
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу сортировки (keyset).
+
+    Вместо OFFSET и COUNT(*) каждая страница выбирается одним
+    ограниченным диапазоном по индексу: следующая страница начинается
+    строго после последней записи текущей, предыдущая - строго перед
+    первой. Позиция передаётся непрозрачным токеном `?cursor=`.
+
+    Attributes:
+        ordering: поля сортировки, по умолчанию Meta.ordering модели
+    """
+
+    def __init__(
+        self,
+        object_list: QuerySet,
+        per_page: int,
+        ordering: Optional[Sequence[str]] = None,
+    ) -> None:
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(
+            ordering
+            or object_list.query.order_by
+            or object_list.model._meta.ordering
+        )
+
+    def _field(self, name: str) -> Field:
+        """Поле модели или аннотации, по которому идёт сортировка."""
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+
+        return self.object_list.model._meta.get_field(name)
+
+    def _key(self, item: Any) -> List[Any]:
+        """Значения полей сортировки записи."""
+        return [
+            getattr(item, name.lstrip("-")) for name in self.ordering
+        ]
+
+    def encode_cursor(self, item: Any, forward: bool) -> str:
+        """Токен позиции сразу после/перед записью."""
+        values = [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in self._key(item)
+        ]
+        payload = json.dumps([int(forward), values])
+        token = base64.urlsafe_b64encode(payload.encode()).decode()
+        return token.rstrip("=")
+
+    def decode_cursor(self, token: str) -> Optional[Tuple[bool, list]]:
+        """Разбор токена; для повреждённого токена - None."""
+        try:
+            forward, values = json.loads(
+                base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            )
+            if len(values) != len(self.ordering):
+                return None
+            values = [
+                self._field(name.lstrip("-")).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, FieldDoesNotExist, ValidationError):
+            return None
+        # Поля сортировки не бывают пустыми, а с None условие позиции
+        # не построить.
+        if any(value is None for value in values):
+            return None
+
+        return bool(forward), values
+
+    def _keyset_filter(self, values: list, forward: bool) -> Q:
+        """Условие "строго после" (или "строго перед") позиции."""
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            descending = name.startswith("-")
+            lookup = "lt" if descending == forward else "gt"
+            step = Q(**{f"{name.lstrip('-')}__{lookup}": values[index]})
+            for prev_name, prev_value in zip(
+                self.ordering[:index], values[:index]
+            ):
+                step &= Q(**{prev_name.lstrip("-"): prev_value})
+            condition |= step
+
+        return condition
+
+    def _reversed_ordering(self) -> Tuple[str, ...]:
+        return tuple(
+            name[1:] if name.startswith("-") else f"-{name}"
+            for name in self.ordering
+        )
+
+    def _fetch(
+        self, values: Optional[list], forward: bool, limit: int
+    ) -> list:
+        """Не более limit записей после/перед позицией в порядке выдачи."""
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values, forward))
+        if forward:
+            return list(queryset.order_by(*self.ordering)[:limit])
+
+        items = list(queryset.order_by(*self._reversed_ordering())[:limit])
+        items.reverse()
+        return items
+
+    def get_cursor_page(self, token: Optional[str]) -> Page:
+        """Страница по токену; без токена или с битым токеном - первая."""
+        cursor = self.decode_cursor(token) if token else None
+        forward, values = cursor if cursor else (True, None)
+        items = self._fetch(values, forward, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        if forward:
+            items = items[:self.per_page]
+            has_next, has_previous = has_more, values is not None
+        else:
+            items = items[-self.per_page:]
+            has_next, has_previous = True, has_more
+
+        page = self._get_page(items, 1, self)
+        page.is_cursor = True
+        page.next_cursor = (
+            self.encode_cursor(items[-1], True)
+            if has_next and items else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(items[0], False)
+            if has_previous and items else None
+        )
+
+        return page
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорная пагинация по слиянию нескольких источников.
+
+    Каждый источник - QuerySet со своими полями сортировки, значения
+    которых совпадают с ordering пагинатора (например, дата и id поста
+    из ленты и из постов автора). Со страницы каждого источника берётся
+    не больше limit записей, и они сливаются k-путевым слиянием на куче,
+    поэтому стоимость страницы зависит от её размера, а не от объёма
+    источников.
+
+    Attributes:
+        sources: пары (QuerySet, поля сортировки источника)
+    """
+
+    def __init__(
+        self,
+        sources: Sequence[Tuple[QuerySet, Sequence[str]]],
+        per_page: int,
+        ordering: Sequence[str],
+    ) -> None:
+        directions = {name.startswith("-") for name in ordering}
+        if len(directions) != 1:
+            raise ValueError("Поля сортировки должны иметь одно направление.")
+        super().__init__(sources[0][0], per_page, ordering)
+        self.sources = [
+            CursorPaginator(queryset, per_page, source_ordering)
+            for queryset, source_ordering in sources
+        ]
+        self.descending = directions.pop()
+
+    def _fetch(
+        self, values: Optional[list], forward: bool, limit: int
+    ) -> list:
+        merged = heapq.merge(
+            *(
+                source._fetch(values, forward, limit)
+                for source in self.sources
+            ),
+            key=self._key,
+            reverse=self.descending,
+        )
+        items, seen = [], set()
+        for item in merged:
+            if item.pk not in seen:
+                seen.add(item.pk)
+                items.append(item)
+
+        return items[:limit] if forward else items[-limit:]
+
+
+class CountedPaginator(Paginator):
+    """Paginator, который берёт число записей у поставщика счётчика
+    (кеш, денормализованный счётчик или оценка) вместо COUNT(*).
+    """
+
+    def __init__(
+        self,
+        object_list: QuerySet,
+        per_page: int,
+        count: Optional[Callable[[], int]] = None,
+    ) -> None:
+        super().__init__(object_list, per_page)
+        self.count_provider = count
+
+    @cached_property
+    def count(self) -> int:
+        if self.count_provider is None:
+            return super().count
+
+        return self.count_provider()
+
+    def validate_number(self, number: Any) -> int:
+        """Верхняя граница не проверяется: счётчик может отставать
+        от таблицы, пустая страница отсекается в page().
+        """
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("Номер страницы должен быть числом")
+        if number < 1:
+            raise EmptyPage("Номер страницы меньше 1")
+
+        return number
+
+    def get_page(self, number: Any) -> Page:
+        """Как Paginator.get_page, но пустая страница определяется
+        в page(), а не по счётчику.
+        """
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            return self.page(self.num_pages)
+
+    def page(self, number: Any) -> Page:
+        """Страница с проверкой счётчика по фактическим строкам.
+
+        Запрашивается на одну запись больше, и если строк оказалось
+        больше, чем по счётчику, число записей поправляется, чтобы
+        отставший счётчик не прятал последние страницы. Для пустой
+        страницы число записей пересчитывается точно.
+        """
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            # Счётчик завышен: get_page() откроет последнюю страницу
+            # по точному числу записей.
+            self.__dict__["count"] = super().count
+            self.__dict__.pop("num_pages", None)
+            raise EmptyPage("На этой странице нет результатов")
+
+        self.__dict__["count"] = max(self.count, bottom + len(rows))
+        self.__dict__.pop("num_pages", None)
+
+        return self._get_page(rows[:self.per_page], number, self)
+
+
+def get_page_window(page_obj: Page) -> List[Optional[int]]:
+    """Номера страниц для навигации: первая, последняя и окно вокруг
+    текущей. Пропуски обозначены None. Полный page_range не строится.
+    """
+    last = page_obj.paginator.num_pages
+    start = max(page_obj.number - PAGINATOR_WINDOW, 1)
+    end = min(page_obj.number + PAGINATOR_WINDOW, last)
+    window = list(range(start, end + 1))
+    if start > 1:
+        window[:0] = [1] if start == 2 else [1, None]
+    if end < last:
+        window += [last] if end == last - 1 else [None, last]
+
+    return window
 
 
 def get_page_context(
-    queryset: Type[QuerySet], request: HttpRequest
+    queryset: Type[QuerySet],
+    request: HttpRequest,
+    cursor_paginator: Optional[CursorPaginator] = None,
+    count: Optional[Callable[[], int]] = None,
 ) -> Dict[str, Any]:
-    """Возвраящает микс пагинациии и QuerySet модели."""
-    paginator = Paginator(queryset, COUNT_OF_POSTS)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    """Возвраящает микс пагинациии и QuerySet модели.
+
+    Ссылки вида `?page=N` обслуживаются обычным Paginator, все остальные
+    запросы - курсорной пагинацией без COUNT(*) и OFFSET. Вместо
+    курсорной пагинации по queryset можно передать свою, а вместо
+    COUNT(*) для `?page=N` - поставщика числа записей.
+    """
+    page_number = request.GET.get(PAGE_PARAM)
+    if page_number is not None:
+        paginator = CountedPaginator(queryset, COUNT_OF_POSTS, count)
+        page_obj = paginator.get_page(page_number)
+        return {"page_obj": page_obj, "page_window": get_page_window(page_obj)}
+
+    paginator = cursor_paginator or CursorPaginator(queryset, COUNT_OF_POSTS)
+    page_obj = paginator.get_cursor_page(request.GET.get(CURSOR_PARAM))
 
     return {"page_obj": page_obj, }
+
+
+def get_comments_page(
+    post: Post, request: HttpRequest, first: bool = False
+) -> Page:
+    """Страница комментариев поста по курсору из запроса.
+
+    Размер первой страницы (на странице поста) и следующих (подгрузка)
+    задаётся настройками COMMENTS_FIRST_PAGE и COMMENTS_PAGE_SIZE.
+    """
+    if first:
+        per_page = getattr(
+            settings, "COMMENTS_FIRST_PAGE", COMMENTS_FIRST_PAGE
+        )
+    else:
+        per_page = getattr(settings, "COMMENTS_PAGE_SIZE", COMMENTS_PAGE_SIZE)
+    paginator = CursorPaginator(
+        post.comments.select_related("author"), per_page
+    )
+
+    return paginator.get_cursor_page(request.GET.get(CURSOR_PARAM))
@@ -1,41 +1,59 @@
 from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest, HttpResponse
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render, reverse
-from django.views.decorators.cache import cache_page
+from django.utils.functional import SimpleLazyObject
 
-from .constants import CREATE_POST, EDIT_POST
+from core.cache import versioned_cache_page
+
+from .constants import (COUNT_OF_POSTS, CREATE_POST, EDIT_POST,
+                        PAGES_CACHE_TIMEOUT)
+from .counters import (count_all_posts, count_feed_posts, get_group_counter,
+                       get_user_counter)
+from .feed import get_feed_page_queryset, get_feed_paginator
 from .forms import CommentForm, PostForm
+from .holes import follow_button
 from .models import Follow, Group, Post, User
-from .utils import get_page_context
+from .sharding import get_sharded_page_context, post_lookup
+from .utils import get_comments_page, get_page_context
 
 
-@cache_page(60 * 20)
+@versioned_cache_page(PAGES_CACHE_TIMEOUT)
 def index(request: HttpRequest) -> HttpResponse:
     """Главная страница."""
     template = "posts/index.html"
-    context = get_page_context(
-        Post.objects.select_related("author", "group"), request
+    context = get_sharded_page_context(
+        Post.objects.for_list(),
+        request,
+        count=count_all_posts,
     )
 
     return render(request, template, context)
 
 
+@versioned_cache_page(PAGES_CACHE_TIMEOUT)
 def profile(request: HttpRequest, username: str) -> HttpResponse:
     """Профиль пользователя."""
     template = "posts/profile.html"
     author = get_object_or_404(User, username=username)
-    following = (
-        request.user.is_authenticated
-        and Follow.objects.filter(
-            user=request.user, author=author
-        ).exists()
+    # Кнопку подписки в кешируемой странице рисует фрагмент
+    # (posts.holes), поэтому подписка проверяется, только если шаблон
+    # выводит кнопку сам.
+    following = SimpleLazyObject(
+        lambda: follow_button(request, author.username)["following"]
     )
+    counter = get_user_counter(author)
     context = {
         "author": author,
-        "following": following
+        "following": following,
+        "counter": counter,
     }
     context.update(
-        get_page_context(author.posts.select_related("group"), request)
+        get_page_context(
+            author.posts.for_list(),
+            request,
+            count=lambda: counter.posts_count,
+        )
     )
 
     return render(request, template, context)
@@ -44,18 +62,50 @@ def profile(request: HttpRequest, username: str) -> HttpResponse:
 def post_detail(request: HttpRequest, post_id: int) -> HttpResponse:
     """Обзор поста."""
     template = "posts/post_detail.html"
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        post_lookup(post_id).select_related("author", "group"), id=post_id
+    )
     form = CommentForm()
-    comments = post.comments.all()
+    comments = get_comments_page(post, request, first=True)
     context = {
         "post": post,
         "form": form,
         "comments": comments,
+        "counter": get_user_counter(post.author),
     }
 
     return render(request, template, context)
 
 
+def post_comments(request: HttpRequest, post_id: int) -> HttpResponse:
+    """Следующая страница комментариев поста для подгрузки.
+
+    По умолчанию отдаёт HTML-фрагмент, с `?format=json` - JSON.
+    """
+    post = get_object_or_404(post_lookup(post_id).only("id"), id=post_id)
+    comments = get_comments_page(post, request)
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "comments": [
+                {
+                    "id": comment.id,
+                    "author": comment.author.username,
+                    "text": comment.text,
+                    "pub_date": comment.pub_date,
+                } for comment in comments
+            ],
+            "next_cursor": comments.next_cursor,
+        })
+
+    context = {
+        "post": post,
+        "comments": comments,
+    }
+
+    return render(request, "posts/includes/comments.html", context)
+
+
+@versioned_cache_page(PAGES_CACHE_TIMEOUT)
 def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
     """Страница сообщества."""
     template = "posts/group_list.html"
@@ -64,7 +114,11 @@ def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
         "group": group,
     }
     context.update(
-        get_page_context(group.posts.select_related("author"), request)
+        get_sharded_page_context(
+            group.posts.for_list(),
+            request,
+            count=lambda: get_group_counter(group).posts_count,
+        )
     )
 
     return render(request, template, context)
@@ -78,7 +132,8 @@ def post_create(request: HttpRequest) -> HttpResponse:
     if request.method == "POST" and form.is_valid():
         post_form = form.save(commit=False)
         post_form.author = request.user
-        post_form.save()
+        with transaction.atomic():
+            post_form.save()
 
         return redirect("posts:profile", username=request.user.username)
 
@@ -94,7 +149,7 @@ def post_create(request: HttpRequest) -> HttpResponse:
 def post_edit(request: HttpRequest, post_id: int) -> HttpResponse:
     """Редактирование поста."""
     template = "posts/create_post.html"
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(post_lookup(post_id), pk=post_id)
     if post.author != request.user:
         return redirect(reverse("posts:post_detail", args=[post_id]))
 
@@ -106,7 +161,8 @@ def post_edit(request: HttpRequest, post_id: int) -> HttpResponse:
     if request.method == "POST" and form.is_valid():
         form = form.save(commit=False)
         form.author = request.user
-        form.save()
+        with transaction.atomic():
+            form.save()
 
         return redirect(reverse("posts:post_detail", args=[post_id]))
 
@@ -122,7 +178,7 @@ def post_edit(request: HttpRequest, post_id: int) -> HttpResponse:
 @login_required
 def add_comment(request: HttpRequest, post_id: int) -> HttpResponse:
     """Добавить комментарий."""
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(post_lookup(post_id), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -138,7 +194,10 @@ def follow_index(request: HttpRequest) -> HttpResponse:
     """Страница вывода постов авторов на которых подписан пользователь."""
     template = "posts/follow.html"
     context = get_page_context(
-        Post.objects.filter(author__following__user=request.user), request
+        get_feed_page_queryset(request.user),
+        request,
+        get_feed_paginator(request.user, COUNT_OF_POSTS),
+        count=lambda: count_feed_posts(request.user),
     )
 
     return render(request, template, context)
@@ -149,7 +208,8 @@ def profile_follow(request: HttpRequest, username: str) -> HttpResponse:
     """Подписаться на интересного автора."""
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
 
     return redirect(reverse("posts:profile", args=[author]))
 
@@ -158,6 +218,7 @@ def profile_follow(request: HttpRequest, username: str) -> HttpResponse:
 def profile_unfollow(request: HttpRequest, username: str) -> HttpResponse:
     """Отписаться от автора."""
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user, author=author).delete()
 
     return redirect(reverse("posts:profile", args=[author]))
@@ -34,16 +34,80 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.ServerTimingMiddleware",
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.SlowQueryMiddleware",
+    "core.middleware.PrimaryStickinessMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.CachedAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# Server-Timing header and request timing log (core.middleware)
+SERVER_TIMING = False
+
+# Prometheus metrics at /metrics (core.metrics); METRICS_DIR is a directory
+# shared by worker processes, without it only the current process reports
+METRICS = False
+METRICS_DIR = None
+
+# Log queries slower than SLOW_QUERY_MS with their plan to the
+# core.slow_queries logger (None disables it); a share of SAMPLE_RATE of
+# slow queries is logged, at most RATE_LIMIT per query shape per minute
+SLOW_QUERY_MS = None
+SLOW_QUERY_SAMPLE_RATE = 1.0
+SLOW_QUERY_RATE_LIMIT = 10
+
+# Wall-clock budgets of posts pages (posts.budgets) depend on the load of
+# the machine, so the test checks them only with CHECK_TIME_BUDGETS=1 in
+# the environment; query budgets are always checked
+CHECK_TIME_BUDGETS = os.environ.get("CHECK_TIME_BUDGETS") == "1"
+# Parameters of queries on these tables (password hashes, session data,
+# emails) are never logged, only their count
+SLOW_QUERY_REDACTED_TABLES = ("auth_user", "django_session", "core_outboxemail")
+
+# Request timing (core.timing) goes to the console at INFO; slow queries
+# (core.slow_queries) go to SLOW_QUERY_LOG as bare JSON lines for the
+# slow_queries command. The file is created on the first record.
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, "slow_queries.log")
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+            "formatter": "message",
+        },
+        "slow_queries": {
+            "class": "logging.FileHandler",
+            "filename": SLOW_QUERY_LOG,
+            "formatter": "message",
+            "encoding": "utf-8",
+            "delay": True,
+        },
+    },
+    "loggers": {
+        "core.timing": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "core.slow_queries": {
+            "handlers": ["slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
 ROOT_URLCONF = "yatube.urls"
 
 # Paths to templates
@@ -53,7 +117,7 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, "static"),)
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "core.timing.TimedDjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -76,9 +140,71 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        # Keep connections between requests, pragmas run once per connection
+        "CONN_MAX_AGE": 600,
     }
 }
 
+# Read replicas: aliases from DATABASES that serve reads of GET requests
+# (core.routers). After a write the browser reads from the primary for
+# REPLICA_LAG_SECONDS. Locally add e.g.
+#   "replica": {"ENGINE": ..., "NAME": "replica.sqlite3",
+#               "TEST": {"MIRROR": "default"}}
+# and keep it in sync with the sync_replicas command.
+DATABASE_REPLICAS = []
+REPLICA_LAG_SECONDS = 5
+DATABASE_ROUTERS = [
+    "posts.sharding.ShardRouter",
+    "core.routers.ReplicaRouter",
+]
+
+# Shard posts and comments by author over these DATABASES aliases
+# (posts.sharding); "default" may be one of them. Migrate every shard and
+# run rebalance_shards after enabling sharding or changing the list.
+POST_SHARDS = []
+
+# Applied to every new SQLite connection (core.signals). WAL lets readers
+# work while post_create/add_comment write; busy_timeout makes writers wait
+# for the lock instead of failing; cache_size < 0 is in KiB.
+# Compare settings with the sqlite_benchmark command.
+SQLITE_PRAGMAS = {
+    "busy_timeout": 5000,
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 ** 2,
+    "cache_size": -64 * 1024,
+}
+
+# Background tasks (core.tasks) are stored in the database and run by the
+# run_workers command, so post_create and profile_follow return without
+# fan-out and backfill. TASKS_ALWAYS_EAGER runs tasks right away inside the
+# request and is for development only (it follows DEBUG): production must
+# run with it off and with run_workers started. A task claimed by a worker
+# is hidden for TASK_VISIBILITY_TIMEOUT seconds and retried after
+# TASK_RETRY_DELAY * 2 ** (attempt - 1) seconds on failure.
+TASKS_ALWAYS_EAGER = DEBUG
+TASK_VISIBILITY_TIMEOUT = 300
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+
+# Authenticated users are loaded from the cache (core.auth) for up to
+# USER_CACHE_TIMEOUT seconds; saving or deleting a user invalidates it.
+USER_CACHE_TIMEOUT = 60 * 60
+
+# Sessions live in the cache and reach the database in batches
+# (core.sessions): at most every SESSION_WRITE_BEHIND_SECONDS or once
+# SESSION_WRITE_BEHIND_MAX_PENDING sessions are waiting. Sessions larger
+# than SESSION_CACHE_MAX_SIZE bytes skip the cache and are written at once.
+# Existing database sessions stay valid. Write-behind needs a cache shared
+# between processes: with LocMemCache sessions are written at once, like
+# cached_db (check --deploy warns). An idle process flushes on a timer and
+# at exit.
+SESSION_ENGINE = "core.sessions"
+SESSION_WRITE_BEHIND_SECONDS = 5
+SESSION_WRITE_BEHIND_MAX_PENDING = 100
+SESSION_CACHE_MAX_SIZE = 4096
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -98,7 +224,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.timing.LocMemCache',
     }
 }
 
@@ -130,7 +256,17 @@ LOGIN_REDIRECT_URL = "posts:index"
 
 # Sending emails
 
-EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+# Emails are stored in the outbox table in the request's transaction and
+# sent after commit by the send_outbox task (never inside the request, even
+# with TASKS_ALWAYS_EAGER: run run_workers or the send_outbox command
+# locally too) through EMAIL_OUTBOX_BACKEND:
+# batches of EMAIL_OUTBOX_BATCH_SIZE over at most EMAIL_OUTBOX_CONCURRENCY
+# connections, retried with backoff up to EMAIL_OUTBOX_MAX_ATTEMPTS times.
+EMAIL_BACKEND = "core.mail.OutboxBackend"
+EMAIL_OUTBOX_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_CONCURRENCY = 2
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -16,7 +16,14 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics
+
 urlpatterns = [
+    path(
+        "metrics",
+        metrics,
+        name="metrics",
+    ),
     path(
         "about/",
         include("about.urls", namespace="about"),